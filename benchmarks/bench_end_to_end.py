@@ -0,0 +1,320 @@
+"""End-to-end controller benchmark against the in-process fake apiserver.
+
+Each fleet size runs in its own subprocess (clean peak RSS, fresh client
+singletons): the controller LISTs and WATCHes a synthetic fleet, then every
+application drifts at once (a drift storm) one or more times. Reported per
+size: watch events/s handled by the controller, p50/p99 time from the drift
+being seen by the informer to the remediation PATCH reaching the apiserver,
+DriftAnalyzer reports/s, NotificationHandler deliveries/s, peak RSS and the
+fewest applications remediated in any storm (out of those that should be).
+The apiserver shares the process, so absolute numbers include its cost.
+
+Usage: python benchmarks/bench_end_to_end.py [--apps 100,1000,10000] [--runtime threaded|asyncio]
+           [--storms 2] [--workers 16] [--latency 0.0] [--error-rate 0.0] [--sync-delay 0.5]
+           [--max-operations 1000]
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from fake_apiserver import FakeApiServer
+
+NAMESPACE = 'argocd'
+# Resource kinds chosen so that drift is classified low (auto_sync) or high (immediate_rollback)
+LOW_KINDS = ['Pod', 'ReplicaSet']
+HIGH_KINDS = ['Deployment', 'Service']
+
+
+def make_application(i, rng, high_ratio=0.2):
+    kinds = HIGH_KINDS if rng.random() < high_ratio else LOW_KINDS
+    return {
+        'metadata': {'name': f'app-{i}', 'namespace': NAMESPACE,
+                     'labels': {'drift-severity': 'high' if kinds is HIGH_KINDS else 'low'}},
+        'spec': {'destination': {'namespace': f'team-{i % 50}'},
+                 'source': {'repoURL': 'https://git.example.com/apps.git', 'path': f'apps/app-{i}'}},
+        'status': {
+            'sync': {'status': 'Synced', 'revision': 'rev-1'},
+            'health': {'status': 'Healthy'},
+            'history': [{'id': 0, 'revision': 'rev-0'}, {'id': 1, 'revision': 'rev-1'}],
+            'resources': [{'kind': kind, 'name': f'app-{i}-{j}', 'namespace': f'team-{i % 50}',
+                           'status': 'Synced'} for j, kind in enumerate(kinds * 2)]
+        }
+    }
+
+
+def drift(app):
+    app['status']['sync']['status'] = 'OutOfSync'
+    app['status']['reconciledAt'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    for resource_status in app['status']['resources'][::2]:
+        resource_status['status'] = 'OutOfSync'
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def wait_for(predicate, timeout, interval=0.01):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+def wait_for_count(count, target, stall_seconds=10.0, interval=0.01):
+    """Wait until count() reaches target, giving up once it stops growing for stall_seconds"""
+    last, last_change = count(), time.monotonic()
+    while last < target:
+        time.sleep(interval)
+        current = count()
+        if current != last:
+            last, last_change = current, time.monotonic()
+        elif time.monotonic() - last_change > stall_seconds:
+            return False
+    return True
+
+
+def bench_analyzer(apps):
+    from drift_analyzer import DriftAnalyzer
+    analyzer = DriftAnalyzer()
+    for app in apps:
+        drift(app)
+    started = time.perf_counter()
+    reports = list(analyzer.analyze_many(apps))
+    elapsed = time.perf_counter() - started
+    return len(reports) / elapsed
+
+
+def bench_notifications(server, count):
+    from notification_handler import NotificationHandler
+    handler = NotificationHandler(async_delivery=True, workers=8, pool_size=8)
+    handler.channels['slack']['webhook_url'] = f'{server.url}/hooks/slack'
+    before = len(server.webhooks)
+    started = time.perf_counter()
+    for i in range(count):
+        handler.send_notification(f'app-{i}', 'Configuration drift detected', severity='low', channels=['slack'])
+    handler.flush()
+    elapsed = time.perf_counter() - started
+    dropped = handler.pipeline.dropped
+    handler.close()
+    return (len(server.webhooks) - before) / elapsed, dropped
+
+
+def write_benchmark_policies(path):
+    """Write the repo policies without cooldowns or retry limits.
+
+    Remediation state outlives the sync that ends a storm, so with the real
+    policies every storm after the first would be suppressed.
+    """
+    import yaml
+    from remediation_policy import DEFAULT_POLICY_PATH, parse_policy_document
+
+    with open(DEFAULT_POLICY_PATH) as f:
+        document = parse_policy_document(f.read())
+    for policy in document['remediation_matrix'].values():
+        policy['cooldown_minutes'] = 0
+        policy.pop('max_retries', None)
+    with open(path, 'w') as f:
+        yaml.safe_dump(document, f)
+
+
+def start_controller(runtime, workers, n_apps, on_event, max_operations, policy_path):
+    """Start the controller in a background thread; returns (controller, informer, stop)"""
+    from auto_remediation_controller import AutoRemediationController, health_response
+
+    controller = AutoRemediationController(workers=workers, qps=1e6, burst=10 ** 6,
+                                           report_cache_size=max(4096, n_apps), max_operations=max_operations,
+                                           policy_path=policy_path)
+    if runtime == 'asyncio':
+        import asyncio
+        from async_runtime import AsyncControllerRuntime, AsyncKubeClient
+
+        kube = AsyncKubeClient(qps=1e6, burst=10 ** 6, max_connections=workers)
+        async_runtime = AsyncControllerRuntime(controller, kube, health_response,
+                                               concurrency=workers, health_port=0)
+        informer = async_runtime.informer
+        target = lambda: asyncio.run(async_runtime.run())
+    else:
+        informer = controller.informer
+        target = controller.watch_applications
+    informer.add_event_handler(on_event)
+    thread = threading.Thread(target=target, name='controller')
+    thread.daemon = True
+    thread.start()
+
+    def stop():
+        informer.stop()
+        thread.join(timeout=10)
+
+    return controller, informer, stop
+
+
+def run_fleet(n_apps, runtime='threaded', storms=2, workers=16, latency=0.0, error_rate=0.0,
+              sync_delay=0.5, max_operations=1000, seed=42):
+    rng = random.Random(seed)
+    # A non-zero sync_delay keeps the Synced event after the controller has recorded its
+    # remediation, as with a real ArgoCD sync
+    server = FakeApiServer(latency=latency, error_rate=error_rate, sync_delay=sync_delay, seed=seed).start()
+    os.environ['KUBECONFIG'] = server.write_kubeconfig()
+    # Client-side throttles would otherwise dominate what is being measured
+    os.environ.setdefault('KUBE_CLIENT_QPS', '1000000')
+    os.environ.setdefault('KUBE_CLIENT_BURST', '1000000')
+    os.environ.setdefault('KUBE_CLIENT_POOL_SIZE', str(workers))
+    os.environ.setdefault('AUDIT_SINK', 'configmap')
+    # Every run starts from a fresh fake apiserver; a checkpoint from an earlier run would
+    # resume its watch at a resourceVersion this server never issued
+    os.environ.setdefault('CHECKPOINT_BACKEND', 'none')
+
+    apps = [make_application(i, rng) for i in range(n_apps)]
+    for app in apps:
+        server.put_object('applications', app)
+
+    detected = {}
+    events = [0]
+    lock = threading.Lock()
+
+    def on_event(event_type, app):
+        with lock:
+            events[0] += 1
+            if app.get('status', {}).get('sync', {}).get('status') == 'OutOfSync':
+                detected.setdefault(app['metadata']['name'], time.monotonic())
+
+    fd, policy_path = tempfile.mkstemp(suffix='.yaml')
+    os.close(fd)
+    write_benchmark_policies(policy_path)
+    started = time.perf_counter()
+    controller, informer, stop = start_controller(runtime, workers, n_apps, on_event, max_operations,
+                                                  policy_path)
+    if not wait_for(lambda: informer.has_synced and len(informer) == n_apps, timeout=120):
+        raise RuntimeError(f'informer did not sync {n_apps} applications')
+    initial_sync = time.perf_counter() - started
+
+    from drift_analyzer import DriftAnalyzer
+    analyzer = DriftAnalyzer()
+    drifted = copy.deepcopy(apps)
+    for app in drifted:
+        drift(app)
+    expected = sum(analyzer.analyze_report(app)['severity'] in ('low', 'high') for app in drifted)
+
+    latencies = []
+    storm_results = []
+    for storm in range(storms):
+        with lock:
+            detected.clear()
+            events[0] = 0
+        first_patch = len(server.patches)
+        storm_started = time.monotonic()
+        for app in apps:
+            server.update_object('applications', NAMESPACE, app['metadata']['name'], drift)
+        remediated = lambda: len({patch[3] for patch in server.patches[first_patch:]})
+        completed = wait_for_count(remediated, expected)
+        first_patches = {}
+        for patched_at, _, _, name, _ in server.patches[first_patch:]:
+            first_patches.setdefault(name, patched_at)
+        # Let the informer observe the Synced transitions that close the remediated episodes
+        synced = lambda: sum(informer.get(name)['status']['sync']['status'] == 'Synced' for name in first_patches)
+        wait_for_count(synced, len(first_patches))
+        storm_elapsed = time.monotonic() - storm_started
+
+        with lock:
+            storm_latencies = [first_patches[name] - seen for name, seen in detected.items()
+                               if name in first_patches]
+            storm_events = events[0]
+        latencies.extend(storm_latencies)
+        storm_results.append({'storm': storm, 'completed': completed, 'remediated': len(first_patches),
+                              'seconds': round(storm_elapsed, 3),
+                              'events_per_sec': round(storm_events / storm_elapsed, 1)})
+
+    stop()
+    server.disconnect_watchers()
+
+    analyzer_rate = bench_analyzer([make_application(i, rng) for i in range(n_apps)])
+    notification_rate, dropped = bench_notifications(server, min(n_apps, 2000))
+    server.stop()
+    os.unlink(os.environ['KUBECONFIG'])
+    os.unlink(policy_path)
+
+    return {
+        'apps': n_apps,
+        'runtime': runtime,
+        'initial_sync_seconds': round(initial_sync, 3),
+        'expected_remediations': expected,
+        'storms': storm_results,
+        'events_per_sec': round(sum(s['events_per_sec'] for s in storm_results) / len(storm_results), 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'analyzer_reports_per_sec': round(analyzer_rate, 1),
+        'notifications_per_sec': round(notification_rate, 1),
+        'notifications_dropped': dropped,
+        'apiserver_requests': server.requests,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apps', default='100,1000,10000')
+    parser.add_argument('--runtime', choices=['threaded', 'asyncio'], default='threaded')
+    parser.add_argument('--storms', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every apiserver request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 500')
+    parser.add_argument('--sync-delay', type=float, default=0.5, help='seconds until a sync operation completes')
+    parser.add_argument('--max-operations', type=int, default=1000,
+                        help='ArgoCD operations the controller keeps in flight')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        logging.getLogger().setLevel(logging.WARNING)
+        result = run_fleet(int(args.apps), runtime=args.runtime, storms=args.storms, workers=args.workers,
+                           latency=args.latency, error_rate=args.error_rate, sync_delay=args.sync_delay,
+                           max_operations=args.max_operations)
+        print(json.dumps(result))
+        return
+
+    print(f"runtime={args.runtime} workers={args.workers} latency={args.latency}s "
+          f"error_rate={args.error_rate} sync_delay={args.sync_delay}s max_operations={args.max_operations} "
+          f"storms={args.storms}")
+    print(f"{'apps':>7} {'sync s':>7} {'events/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'reports/s':>10} {'notif/s':>9} {'RSS MB':>8} {'remediated':>14}")
+    for n_apps in (int(value) for value in args.apps.split(',')):
+        with tempfile.TemporaryDirectory() as audit_dir:
+            env = dict(os.environ, AUDIT_LOG_DIR=audit_dir)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--single', '--apps', str(n_apps),
+                 '--runtime', args.runtime, '--storms', str(args.storms), '--workers', str(args.workers),
+                 '--latency', str(args.latency), '--error-rate', str(args.error_rate),
+                 '--sync-delay', str(args.sync_delay), '--max-operations', str(args.max_operations)],
+                env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        remediated = min(s['remediated'] for s in result['storms'])
+        print(f"{n_apps:>7} {result['initial_sync_seconds']:>7.2f} {result['events_per_sec']:>10.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['analyzer_reports_per_sec']:>10.1f} "
+              f"{result['notifications_per_sec']:>9.1f} {result['peak_rss_mb']:>8.1f} "
+              f"{remediated:>7}/{result['expected_remediations']}")
+
+
+if __name__ == '__main__':
+    main()
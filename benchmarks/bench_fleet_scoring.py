@@ -0,0 +1,76 @@
+"""Compare scalar and vectorized fleet risk scoring.
+
+Usage: python benchmarks/bench_fleet_scoring.py [apps] [max_resources_per_app]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from drift_analyzer import DriftAnalyzer
+from fleet_scoring import score_fleet, score_fleet_scalar
+
+KINDS = ['Deployment', 'Service', 'Secret', 'ConfigMap', 'Ingress', 'StatefulSet', 'Job',
+         'CronJob', 'PersistentVolumeClaim', 'ServiceAccount', 'ClusterRoleBinding', 'Pod']
+STATUSES = ['Synced', 'Synced', 'Synced', 'OutOfSync', 'Degraded', 'Missing']
+NAMESPACES = ['prod-payments', 'production', 'staging', 'dev', 'team-a']
+
+
+def make_fleet(n_apps, max_resources, seed=42):
+    rng = random.Random(seed)
+    fleet = []
+    for i in range(n_apps):
+        labels = {}
+        if rng.random() < 0.05:
+            labels['drift-severity'] = rng.choice(['low', 'medium', 'high'])
+        if rng.random() < 0.2:
+            labels['criticality'] = 'high'
+        fleet.append({
+            'metadata': {'name': f'app-{i}', 'labels': labels},
+            'spec': {'destination': {'namespace': rng.choice(NAMESPACES)}},
+            'status': {
+                'sync': {'status': rng.choice(['Synced', 'OutOfSync'])},
+                'health': {'status': rng.choice(['Healthy', 'Healthy', 'Degraded'])},
+                'resources': [
+                    {'kind': rng.choice(KINDS), 'name': f'res-{j}', 'namespace': 'default',
+                     'status': rng.choice(STATUSES)}
+                    for j in range(rng.randint(0, max_resources))
+                ]
+            }
+        })
+    return fleet
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    n_apps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    max_resources = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    analyzer = DriftAnalyzer()
+    fleet = make_fleet(n_apps, max_resources)
+    total_resources = sum(len(app['status']['resources']) for app in fleet)
+
+    scalar_time, scalar = timed(score_fleet_scalar, analyzer, fleet)
+    vector_time, vector = timed(score_fleet, analyzer, fleet)
+
+    assert scalar == vector, "vectorized scoring diverged from the scalar path"
+
+    print(f"apps={n_apps} resources={total_resources}")
+    print(f"scalar:     {scalar_time * 1000:8.1f} ms")
+    print(f"vectorized: {vector_time * 1000:8.1f} ms  ({scalar_time / vector_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
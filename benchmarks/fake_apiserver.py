@@ -0,0 +1,493 @@
+"""In-process fake Kubernetes/ArgoCD apiserver for benchmarks and local runs.
+
+Serves ArgoCD Applications, Deployments, Services and ConfigMaps with LIST
+(label selectors, limit/continue), WATCH (resourceVersion resume, 410 Gone
+once history is compacted), GET, POST, PUT (optimistic concurrency), PATCH
+(merge and JSON patch) and DELETE. A sync operation PATCHed onto an
+Application is picked up like ArgoCD would (operationState phase Running) and
+completed after sync_delay seconds.
+
+Latency and errors are injectable per server (latency, error_rate) or one-off
+(fail_next). A Slack-style webhook sink is served at /hooks/<name>.
+
+Usage:
+    server = FakeApiServer(latency=0.002, error_rate=0.01).start()
+    os.environ['KUBECONFIG'] = server.write_kubeconfig()
+    ...
+    server.stop()
+"""
+import bisect
+import copy
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# (api prefix, plural) -> kind
+RESOURCES = {
+    ('/apis/argoproj.io/v1alpha1', 'applications'): ('argoproj.io/v1alpha1', 'Application'),
+    ('/apis/apps/v1', 'deployments'): ('apps/v1', 'Deployment'),
+    ('/api/v1', 'services'): ('v1', 'Service'),
+    ('/api/v1', 'configmaps'): ('v1', 'ConfigMap'),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, reason, message=''):
+        super().__init__(message or reason)
+        self.status = status
+        self.reason = reason
+
+
+def _match_selector(labels, selector):
+    """Equality-based label selector: 'a', '!a', 'a=b', 'a!=b', comma-separated"""
+    for term in filter(None, (part.strip() for part in (selector or '').split(','))):
+        if '!=' in term:
+            key, value = term.split('!=', 1)
+            if labels.get(key) == value:
+                return False
+        elif '=' in term:
+            key, value = term.split('=', 1)
+            if labels.get(key) != value.lstrip('='):
+                return False
+        elif term.startswith('!'):
+            if term[1:] in labels:
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+
+def _merge_patch(target, patch):
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_patch(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def _json_patch(target, operations):
+    for operation in operations:
+        parts = [part.replace('~1', '/').replace('~0', '~') for part in operation['path'].split('/')[1:]]
+        parent = target
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent.setdefault(part, {})
+        last = parts[-1]
+        if operation['op'] in ('add', 'replace'):
+            if isinstance(parent, list):
+                index = len(parent) if last == '-' else int(last)
+                if operation['op'] == 'add':
+                    parent.insert(index, copy.deepcopy(operation['value']))
+                else:
+                    parent[index] = copy.deepcopy(operation['value'])
+            else:
+                parent[last] = copy.deepcopy(operation['value'])
+        elif operation['op'] == 'remove':
+            if isinstance(parent, list):
+                del parent[int(last)]
+            else:
+                parent.pop(last, None)
+    return target
+
+
+class FakeApiServer:
+    def __init__(self, latency=0.0, error_rate=0.0, sync_delay=0.0, history_limit=50000,
+                 host='127.0.0.1', port=0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sync_delay = sync_delay
+        self.history_limit = history_limit
+        self._random = random.Random(seed)
+        self._address = (host, port)
+        self._lock = threading.Condition()
+        self._objects = {}      # (plural, namespace, name) -> object
+        self._events = []       # (resourceVersion, plural, namespace, labels, JSON line) - watch history
+        self._compacted_rv = 0
+        self._rv = 1
+        self._fail_next = []
+        self._watch_generation = 0
+        self._server = None
+        self._thread = None
+
+        self.requests = 0
+        self.patches = []       # (monotonic time, plural, namespace, name, body)
+        self.webhooks = []      # (monotonic time, name, body)
+        self.events_sent = 0
+        # Application names whose sync operations end Failed instead of Succeeded
+        self.failing_syncs = set()
+
+    # Lifecycle -------------------------------------------------------------
+
+    def start(self):
+        handler = type('FakeApiHandler', (_Handler,), {'api': self})
+        ThreadingHTTPServer.request_queue_size = 1024
+        self._server = ThreadingHTTPServer(self._address, handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-apiserver')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.disconnect_watchers()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def write_kubeconfig(self, path=None):
+        """Write a kubeconfig pointing at this server and return its path"""
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix='fake-apiserver-', suffix='.kubeconfig')
+            os.close(handle)
+        with open(path, 'w') as f:
+            json.dump({
+                'apiVersion': 'v1',
+                'kind': 'Config',
+                'clusters': [{'name': 'fake', 'cluster': {'server': self.url}}],
+                'users': [{'name': 'fake', 'user': {'token': 'fake-token'}}],
+                'contexts': [{'name': 'fake', 'context': {'cluster': 'fake', 'user': 'fake'}}],
+                'current-context': 'fake'
+            }, f)
+        return path
+
+    # Fault injection -------------------------------------------------------
+
+    def fail_next(self, count=1, status=500):
+        """Answer the next count non-watch requests with status"""
+        with self._lock:
+            self._fail_next.extend([status] * count)
+
+    def disconnect_watchers(self):
+        """End every open WATCH (clients see a normal stream end and resume)"""
+        with self._lock:
+            self._watch_generation += 1
+            self._lock.notify_all()
+
+    def compact(self):
+        """Drop all watch history so resuming clients get 410 Gone"""
+        with self._lock:
+            self._compacted_rv = self._rv
+            self._events.clear()
+
+    def _inject(self):
+        if self.latency:
+            time.sleep(self.latency() if callable(self.latency) else self.latency)
+        with self._lock:
+            self.requests += 1
+            if self._fail_next:
+                status = self._fail_next.pop(0)
+                raise ApiError(status, 'InjectedFailure')
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise ApiError(500, 'InjectedFailure')
+
+    # Object store ----------------------------------------------------------
+
+    def _emit(self, plural, event_type, obj):
+        # Caller holds the lock; events are serialized once and shared by every watcher
+        metadata = obj['metadata']
+        line = json.dumps({'type': event_type, 'object': obj}).encode() + b'\n'
+        self._events.append((self._rv, plural, metadata.get('namespace'), dict(metadata.get('labels') or {}), line))
+        if len(self._events) > self.history_limit:
+            dropped = len(self._events) - self.history_limit
+            self._compacted_rv = self._events[dropped - 1][0]
+            del self._events[:dropped]
+        self._lock.notify_all()
+
+    def _bump(self, obj):
+        self._rv += 1
+        obj['metadata']['resourceVersion'] = str(self._rv)
+
+    def put_object(self, plural, obj):
+        """Create or replace an object directly (no injection), emitting a watch event"""
+        api_version, kind = next(value for (prefix, name), value in RESOURCES.items() if name == plural)
+        obj = copy.deepcopy(obj)
+        obj.setdefault('apiVersion', api_version)
+        obj.setdefault('kind', kind)
+        metadata = obj.setdefault('metadata', {})
+        metadata.setdefault('namespace', 'default')
+        key = (plural, metadata['namespace'], metadata['name'])
+        with self._lock:
+            existed = key in self._objects
+            self._bump(obj)
+            self._objects[key] = obj
+            self._emit(plural, 'MODIFIED' if existed else 'ADDED', obj)
+        return obj
+
+    def update_object(self, plural, namespace, name, mutate):
+        """Apply mutate(obj) in place and emit MODIFIED; returns the new object"""
+        with self._lock:
+            obj = self._objects[(plural, namespace, name)]
+            mutate(obj)
+            self._bump(obj)
+            self._emit(plural, 'MODIFIED', obj)
+            return copy.deepcopy(obj)
+
+    def get_object(self, plural, namespace, name):
+        with self._lock:
+            obj = self._objects.get((plural, namespace, name))
+            return copy.deepcopy(obj) if obj is not None else None
+
+    def list_objects(self, plural, namespace=None):
+        with self._lock:
+            return [copy.deepcopy(obj) for (kind, ns, _), obj in self._objects.items()
+                    if kind == plural and (namespace is None or ns == namespace)]
+
+    def _start_sync(self, namespace, name):
+        """Pick up an ArgoCD sync operation: moved into status.operationState, phase Running"""
+        def start(app):
+            operation = app.pop('operation', None) or {}
+            app.setdefault('status', {})['operationState'] = {
+                'operation': operation, 'phase': 'Running', 'startedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ')}
+        self.update_object('applications', namespace, name, start)
+
+    def _complete_sync(self, namespace, name):
+        """Finish an ArgoCD sync operation: Synced, history appended, operationState Succeeded
+        (or only operationState Failed for names in failing_syncs)"""
+        def complete(app):
+            status = app.setdefault('status', {})
+            state = status.get('operationState') or {}
+            if name in self.failing_syncs:
+                status['operationState'] = dict(state, phase='Failed', message='one or more objects failed to apply',
+                                                finishedAt=time.strftime('%Y-%m-%dT%H:%M:%SZ'))
+                return
+            operation = state.get('operation') or {}
+            revision = (operation.get('sync') or {}).get('revision') or \
+                (status.get('sync') or {}).get('revision') or 'HEAD'
+            status.setdefault('sync', {})['status'] = 'Synced'
+            status['operationState'] = dict(state, phase='Succeeded',
+                                            finishedAt=time.strftime('%Y-%m-%dT%H:%M:%SZ'))
+            history = status.setdefault('history', [])
+            history.append({'id': history[-1]['id'] + 1 if history else 0, 'revision': revision})
+            del history[:-10]  # ArgoCD keeps revisionHistoryLimit (10) entries
+            for resource in status.get('resources', []):
+                resource['status'] = 'Synced'
+        try:
+            self.update_object('applications', namespace, name, complete)
+        except KeyError:
+            pass
+
+    # Request handling ------------------------------------------------------
+
+    def handle(self, method, path, query, body, content_type):
+        self._inject()
+        parts = path.rstrip('/').split('/')
+        if parts[:2] == ['', 'hooks']:
+            with self._lock:
+                self.webhooks.append((time.monotonic(), parts[-1], body))
+            return 200, {'ok': True}
+
+        plural, namespace, name, subresource = self._route(parts)
+        if name is None:
+            if method == 'GET':
+                return 200, self._list(plural, namespace, query)
+            if method == 'POST':
+                return 201, self._create(plural, namespace, body)
+            raise ApiError(405, 'MethodNotAllowed')
+        if method == 'GET':
+            obj = self.get_object(plural, namespace, name)
+            if obj is None:
+                raise ApiError(404, 'NotFound')
+            return 200, obj
+        if method == 'PUT':
+            return 200, self._replace(plural, namespace, name, body)
+        if method == 'PATCH':
+            return 200, self._patch(plural, namespace, name, body, content_type)
+        if method == 'DELETE':
+            return 200, self._delete(plural, namespace, name)
+        raise ApiError(405, 'MethodNotAllowed')
+
+    @staticmethod
+    def _route(parts):
+        # /api/v1/namespaces/{ns}/{plural}[/{name}[/{sub}]] or /apis/{g}/{v}/namespaces/...
+        prefix_length = 3 if parts[1] == 'api' else 4
+        prefix = '/'.join(parts[:prefix_length])
+        rest = parts[prefix_length:]
+        if len(rest) < 3 or rest[0] != 'namespaces' or (prefix, rest[2]) not in RESOURCES:
+            raise ApiError(404, 'NotFound')
+        namespace, plural = rest[1], rest[2]
+        name = rest[3] if len(rest) > 3 else None
+        subresource = rest[4] if len(rest) > 4 else None
+        return plural, namespace, name, subresource
+
+    def _list(self, plural, namespace, query):
+        selector = query.get('labelSelector')
+        limit = int(query.get('limit') or 0)
+        offset = int(query.get('continue') or 0)
+        with self._lock:
+            items = [copy.deepcopy(obj) for (kind, ns, _), obj in sorted(self._objects.items())
+                     if kind == plural and ns == namespace
+                     and _match_selector(obj['metadata'].get('labels') or {}, selector)]
+            rv = str(self._rv)
+        metadata = {'resourceVersion': rv}
+        if limit:
+            page = items[offset:offset + limit]
+            if offset + limit < len(items):
+                metadata['continue'] = str(offset + limit)
+            items = page
+        return {'kind': 'List', 'apiVersion': 'v1', 'metadata': metadata, 'items': items}
+
+    def _create(self, plural, namespace, body):
+        name = body['metadata']['name']
+        with self._lock:
+            if (plural, namespace, name) in self._objects:
+                raise ApiError(409, 'AlreadyExists')
+        body['metadata']['namespace'] = namespace
+        return self.put_object(plural, body)
+
+    def _replace(self, plural, namespace, name, body):
+        with self._lock:
+            current = self._objects.get((plural, namespace, name))
+            if current is None:
+                raise ApiError(404, 'NotFound')
+            expected = body.get('metadata', {}).get('resourceVersion')
+            if expected and expected != current['metadata']['resourceVersion']:
+                raise ApiError(409, 'Conflict')
+            obj = copy.deepcopy(body)
+            obj.setdefault('apiVersion', current['apiVersion'])
+            obj.setdefault('kind', current['kind'])
+            obj['metadata']['namespace'] = namespace
+            obj['metadata']['name'] = name
+            self._bump(obj)
+            self._objects[(plural, namespace, name)] = obj
+            self._emit(plural, 'MODIFIED', obj)
+            return copy.deepcopy(obj)
+
+    def _patch(self, plural, namespace, name, body, content_type):
+        with self._lock:
+            self.patches.append((time.monotonic(), plural, namespace, name, body))
+        if isinstance(body, list) or 'json-patch' in (content_type or ''):
+            mutate = lambda obj: _json_patch(obj, body)
+        else:
+            mutate = lambda obj: _merge_patch(obj, body)
+        try:
+            patched = self.update_object(plural, namespace, name, mutate)
+        except KeyError:
+            raise ApiError(404, 'NotFound')
+        if plural == 'applications' and 'operation' in patched:
+            self._start_sync(namespace, name)
+            if self.sync_delay:
+                timer = threading.Timer(self.sync_delay, self._complete_sync, (namespace, name))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._complete_sync(namespace, name)
+        return patched
+
+    def _delete(self, plural, namespace, name):
+        with self._lock:
+            obj = self._objects.pop((plural, namespace, name), None)
+            if obj is None:
+                raise ApiError(404, 'NotFound')
+            self._bump(obj)
+            self._emit(plural, 'DELETED', obj)
+            return {'kind': 'Status', 'status': 'Success'}
+
+    def watch(self, plural, namespace, query, write):
+        """Stream events after resourceVersion until timeoutSeconds or disconnect_watchers()"""
+        selector = query.get('labelSelector')
+        deadline = time.monotonic() + float(query.get('timeoutSeconds') or 300)
+        since = int(query.get('resourceVersion') or 0)
+        with self._lock:
+            generation = self._watch_generation
+            if not since:
+                since = self._rv
+        while True:
+            with self._lock:
+                if since < self._compacted_rv:
+                    write(json.dumps({'type': 'ERROR', 'object': {
+                        'kind': 'Status', 'code': 410, 'reason': 'Expired',
+                        'message': 'too old resource version'}}).encode() + b'\n')
+                    return
+                position = bisect.bisect_right(self._events, since, key=lambda event: event[0])
+                if position == len(self._events):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or generation != self._watch_generation:
+                        return
+                    self._lock.wait(min(remaining, 1.0))
+                    continue
+                pending = self._events[position:]
+            for rv, kind, event_namespace, labels, line in pending:
+                since = rv
+                if kind != plural or event_namespace != namespace or not _match_selector(labels, selector):
+                    continue
+                write(line)
+                self.events_sent += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; Nagle would hold the body back for the ACK
+    disable_nagle_algorithm = True
+    api = None
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        try:
+            if method == 'GET' and query.get('watch', '').lower() in ('true', '1'):
+                self._watch(url.path, query)
+                return
+            status, payload = self.api.handle(method, url.path, query, body, self.headers.get('Content-Type'))
+        except ApiError as e:
+            status, payload = e.status, {'kind': 'Status', 'status': 'Failure', 'code': e.status,
+                                         'reason': e.reason, 'message': str(e)}
+        self._respond(status, payload)
+
+    def _watch(self, path, query):
+        self.api._inject()
+        plural, namespace, _, _ = self.api._route(path.rstrip('/').split('/'))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write(line):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+            self.wfile.flush()
+
+        try:
+            self.api.watch(plural, namespace, query, write)
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
@@ -1,20 +1,19 @@
 import os
 import json
+import time
 from datetime import datetime
-from kubernetes import client, config
+from kubernetes import client
+from kube_client import get_api_client, load_kube_config
+from audit_sink import create_audit_sink, make_audit_entry
 
 def create_audit_log():
     """Create comprehensive audit log for drift remediation"""
-    try:
-        config.load_incluster_config()
-    except:
-        try:
-            config.load_kube_config()
-        except:
-            print("Demo mode: Audit log would be created")
-            return
+    started = time.monotonic()
+    if not load_kube_config():
+        print("Demo mode: Audit log would be created")
+        return
     
-    v1 = client.CoreV1Api()
+    v1 = client.CoreV1Api(get_api_client())
     app_name = os.getenv('APP_NAME', 'unknown')
     namespace = os.getenv('ARGOCD_APP_NAMESPACE', 'default')
     severity = os.getenv('SEVERITY', 'low')
@@ -22,47 +21,27 @@ def create_audit_log():
     # Load analysis results if available
     analysis_data = load_analysis_results()
     
-    audit_entry = {
-        'metadata': {
-            'name': f'audit-{app_name}-{int(datetime.now().timestamp())}',
-            'namespace': 'argocd',
-            'labels': {
-                'app': app_name,
-                'audit-type': 'drift-remediation',
-                'severity': severity,
-                'timestamp': datetime.now().strftime('%Y%m%d-%H%M%S')
-            },
-            'annotations': {
-                'drift-detection.argocd.io/app-name': app_name,
-                'drift-detection.argocd.io/remediation-time': datetime.now().isoformat()
-            }
-        },
-        'data': {
-            'application': app_name,
-            'namespace': namespace,
-            'severity': severity,
-            'action': 'sync_completed',
-            'timestamp': datetime.now().isoformat(),
-            'remediation_status': 'success',
-            'analysis_results': json.dumps(analysis_data) if analysis_data else 'N/A',
-            'operator': 'argocd-drift-controller',
-            'compliance_status': 'compliant'
-        }
-    }
+    audit_entry = make_audit_entry(
+        app_name, 'drift-remediation', severity,
+        namespace=namespace,
+        action='sync_completed',
+        remediation_status='success',
+        analysis_results=analysis_data,
+        operator='argocd-drift-controller',
+        compliance_status='compliant'
+    )
     
-    try:
-        result = v1.create_namespaced_config_map(
-            namespace='argocd',
-            body=audit_entry
-        )
-        print(f"✅ Audit log created: {result.metadata.name}")
-        
-        # Create metrics entry
-        create_metrics_entry(app_name, severity, 'success')
-        
-    except Exception as e:
-        print(f"❌ Failed to create audit log: {e}")
-        create_metrics_entry(app_name, severity, 'failed')
+    # Batched, size-capped audit segments instead of one ConfigMap per event
+    sink = create_audit_sink(v1, namespace='argocd')
+    sink.write(audit_entry)
+    sink.close()
+    
+    if sink.entries_written:
+        print(f"✅ Audit log entry recorded for {app_name}")
+        create_metrics_entry(app_name, severity, 'success', time.monotonic() - started)
+    else:
+        print(f"❌ Failed to record audit log for {app_name}")
+        create_metrics_entry(app_name, severity, 'failed', time.monotonic() - started)
 
 def load_analysis_results():
     """Load analysis results from PreSync hook"""
@@ -72,14 +51,14 @@ def load_analysis_results():
     except:
         return None
 
-def create_metrics_entry(app_name, severity, status):
+def create_metrics_entry(app_name, severity, status, duration_seconds):
     """Create metrics entry for monitoring"""
     metrics_data = {
         'app_name': app_name,
         'severity': severity,
         'status': status,
         'timestamp': datetime.now().isoformat(),
-        'duration_seconds': 30  # Placeholder
+        'duration_seconds': round(duration_seconds, 3)
     }
     
     print(f"📊 Metrics: {metrics_data}")
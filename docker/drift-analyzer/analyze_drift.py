@@ -1,19 +1,35 @@
 import os
 import json
-import yaml
+import threading
+import time
 from datetime import datetime
-from kubernetes import client, config
+from kubernetes import client
+from drift_analyzer import SEVERITY_RANK, DriftAnalyzer
+from kube_client import get_api_client, iter_list_json, load_kube_config
+from manifest_diff import diff_resources, load_desired_manifests, resource_key
+
+PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '500'))
+SCAN_BUDGET_SECONDS = float(os.getenv('SCAN_BUDGET_SECONDS', '20'))
+DESIRED_MANIFESTS_DIR = os.getenv('DESIRED_MANIFESTS_DIR')
+
+TRACKING_LABEL = 'app.kubernetes.io/instance'
+TRACKING_ANNOTATION = 'argocd.argoproj.io/tracking-id'
+
+# kind -> {'api', 'method', 'project', 'check'}; check returns a drift_type or None
+KIND_CHECKERS = {}
+
+class ScanBudgetExceeded(Exception):
+    pass
+
+def register_checker(kind, api, method, project, check):
+    """Register a per-kind drift checker scanned by analyze_drift"""
+    KIND_CHECKERS[kind] = {'api': api, 'method': method, 'project': project, 'check': check}
 
 def analyze_drift():
     """Analyze drift severity and recommend actions"""
-    try:
-        config.load_incluster_config()
-    except:
-        try:
-            config.load_kube_config()
-        except:
-            print("Running in demo mode - no Kubernetes config")
-            return simulate_analysis()
+    if not load_kube_config():
+        print("Running in demo mode - no Kubernetes config")
+        return simulate_analysis()
     
     app_name = os.getenv('APP_NAME', 'unknown')
     severity = os.getenv('SEVERITY', 'low')
@@ -21,10 +37,6 @@ def analyze_drift():
     
     print(f"🔍 Analyzing drift for {app_name} with severity {severity}")
     
-    # Get application resources
-    v1 = client.AppsV1Api()
-    core_v1 = client.CoreV1Api()
-    
     drift_analysis = {
         'app_name': app_name,
         'severity': severity,
@@ -33,33 +45,39 @@ def analyze_drift():
         'drift_detected': True,
         'affected_resources': [],
         'recommended_action': get_recommended_action(severity),
-        'risk_score': calculate_risk_score(severity)
+        'risk_score': calculate_risk_score(severity),
+        'partial': False
     }
     
-    try:
-        # Analyze deployments
-        deployments = v1.list_namespaced_deployment(namespace)
-        for deployment in deployments.items:
-            if check_deployment_drift(deployment):
-                drift_analysis['affected_resources'].append({
-                    'kind': 'Deployment',
-                    'name': deployment.metadata.name,
-                    'drift_type': 'replica_count'
-                })
-        
-        # Analyze services
-        services = core_v1.list_namespaced_service(namespace)
-        for service in services.items:
-            if check_service_drift(service):
-                drift_analysis['affected_resources'].append({
-                    'kind': 'Service',
-                    'name': service.metadata.name,
-                    'drift_type': 'service_type'
-                })
-                
-    except Exception as e:
-        print(f"Error analyzing resources: {e}")
-        drift_analysis['error'] = str(e)
+    # Scan every registered kind concurrently; the scan and the field diff share one time budget
+    deadline = time.monotonic() + SCAN_BUDGET_SECONDS
+    scan = scan_kinds(namespace, KIND_CHECKERS, deadline)
+    drift_analysis['affected_resources'] = scan['affected_resources']
+    drift_analysis['scanned_kinds'] = scan['scanned_kinds']
+    if scan['incomplete_kinds']:
+        drift_analysis['partial'] = True
+        drift_analysis['incomplete_kinds'] = scan['incomplete_kinds']
+        print(f"⏱️  Partial analysis - not finished within {SCAN_BUDGET_SECONDS}s: "
+              f"{', '.join(scan['incomplete_kinds'])}")
+    errors = dict(scan['errors'])
+    
+    # Field-level comparison against the rendered manifests, when they are mounted
+    if DESIRED_MANIFESTS_DIR:
+        try:
+            field_drift, unfinished = diff_desired_state(namespace, DESIRED_MANIFESTS_DIR, deadline)
+            drift_analysis['field_drift'] = field_drift
+            print(f"🧬 {len(field_drift)} resources differ from {DESIRED_MANIFESTS_DIR}")
+            if field_drift:
+                classify_field_drift(drift_analysis, field_drift)
+            if unfinished:
+                drift_analysis['partial'] = True
+                drift_analysis['field_drift_incomplete_kinds'] = unfinished
+                print(f"⏱️  Field diff not finished within {SCAN_BUDGET_SECONDS}s: {', '.join(unfinished)}")
+        except Exception as e:
+            print(f"Error diffing against {DESIRED_MANIFESTS_DIR}: {e}")
+            errors['field_drift'] = str(e)
+    if errors:
+        drift_analysis['error'] = '; '.join(f"{kind}: {error}" for kind, error in errors.items())
     
     # Save analysis results
     save_analysis_results(drift_analysis)
@@ -67,15 +85,221 @@ def analyze_drift():
     print(f"✅ Analysis complete: {len(drift_analysis['affected_resources'])} resources affected")
     return drift_analysis
 
+def scan_kinds(namespace, checkers, deadline):
+    """Scan each kind on its own thread; kinds not finished by the deadline (time.monotonic())
+    are reported as incomplete"""
+    api_client = get_api_client()
+    apis = {}
+    outcomes = {}
+    
+    def scan_kind(kind, checker):
+        try:
+            api = apis.setdefault(checker['api'], getattr(client, checker['api'])(api_client))
+            affected = []
+            for item in iter_list_json(getattr(api, checker['method']), namespace, page_size=PAGE_SIZE,
+                                       project=checker['project'], deadline=deadline):
+                if time.monotonic() > deadline:
+                    raise ScanBudgetExceeded()
+                drift_type = checker['check'](item)
+                if drift_type:
+                    affected.append({'kind': kind, 'name': item['name'], 'drift_type': drift_type})
+            outcomes[kind] = ('done', affected)
+        except (ScanBudgetExceeded, TimeoutError):
+            outcomes[kind] = ('timeout', None)
+        except Exception as e:
+            # A request cut off by its timeout surfaces as a urllib3 error right at the deadline
+            outcomes[kind] = ('timeout', None) if time.monotonic() >= deadline else ('error', e)
+    
+    # Daemon threads: a straggler stuck in a request cannot keep the hook alive past its budget
+    threads = []
+    for kind, checker in checkers.items():
+        thread = threading.Thread(target=scan_kind, args=(kind, checker), name=f'scan-{kind}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+    
+    result = {'affected_resources': [], 'scanned_kinds': [], 'incomplete_kinds': [], 'errors': {}}
+    for kind in checkers:
+        status, value = outcomes.get(kind, ('timeout', None))
+        if status == 'done':
+            result['affected_resources'].extend(value)
+            result['scanned_kinds'].append(kind)
+        elif status == 'timeout':
+            result['incomplete_kinds'].append(kind)
+        else:
+            print(f"Error analyzing {kind} resources: {value}")
+            result['errors'][kind] = str(value)
+    return result
+
+def diff_desired_state(namespace, directory, deadline):
+    """Diff live objects of every kind present in the desired manifests against them.
+
+    Returns (diffs, unfinished_kinds); kinds whose LIST did not finish by the
+    deadline are left out of the diff rather than reported as missing.
+    """
+    desired = load_desired_manifests(directory, namespace=namespace)
+    api_client = get_api_client()
+    live = {}
+    unfinished = []
+    # LIST responses omit kind/apiVersion on items; take them from the manifests
+    api_versions = {obj['kind']: obj.get('apiVersion', '') for obj in desired.values()}
+    for kind, api_version in sorted(api_versions.items()):
+        checker = KIND_CHECKERS.get(kind)
+        if checker is None:
+            print(f"Skipping field diff for unsupported kind {kind}")
+            desired = {key: obj for key, obj in desired.items() if key[1] != kind}
+            continue
+        api = getattr(client, checker['api'])(api_client)
+        listed = {}
+        try:
+            for item in iter_list_json(getattr(api, checker['method']), namespace, page_size=PAGE_SIZE,
+                                       deadline=deadline):
+                item.setdefault('kind', kind)
+                item.setdefault('apiVersion', api_version)
+                listed[resource_key(item)] = item
+        except Exception:
+            if time.monotonic() < deadline:
+                raise
+            unfinished.append(kind)
+            desired = {key: obj for key, obj in desired.items() if key[1] != kind}
+            continue
+        live.update(listed)
+    return diff_resources(desired, live), unfinished
+
+def classify_field_drift(drift_analysis, field_drift):
+    """Grade field drift by kind and raise the analysis severity if it is worse than reported"""
+    field_severity, details, resources = DriftAnalyzer().analyze_field_drift(field_drift)
+    drift_analysis['field_drift_severity'] = field_severity
+    drift_analysis['field_drift_details'] = details
+    drift_analysis['field_drift_resources'] = resources
+    print(f"🧬 Field drift severity {field_severity}: {details}")
+    if SEVERITY_RANK[field_severity] > SEVERITY_RANK.get(drift_analysis['severity'], 0):
+        drift_analysis['severity'] = field_severity
+        drift_analysis['recommended_action'] = get_recommended_action(field_severity)
+        drift_analysis['risk_score'] = calculate_risk_score(field_severity)
+
+def project_metadata(item):
+    """Fields shared by all kinds: name plus what is needed to tell managed from hand-made objects"""
+    metadata = item.get('metadata') or {}
+    return {
+        'name': metadata.get('name'),
+        'owned': bool(metadata.get('ownerReferences')),
+        'tracked': TRACKING_LABEL in (metadata.get('labels') or {}) or
+                   TRACKING_ANNOTATION in (metadata.get('annotations') or {})
+    }
+
+def check_unmanaged(item):
+    """Objects neither tracked by ArgoCD nor owned by another object were created out-of-band"""
+    if not item['tracked'] and not item['owned']:
+        return 'unmanaged_resource'
+    return None
+
+def project_secret(item):
+    projected = project_metadata(item)
+    projected['type'] = item.get('type')
+    return projected
+
+def check_secret_drift(secret):
+    # Token and Helm release secrets are written by controllers, not by Git
+    if secret['type'] in ('kubernetes.io/service-account-token', 'helm.sh/release.v1'):
+        return None
+    return check_unmanaged(secret)
+
+def check_service_account_drift(service_account):
+    if service_account['name'] == 'default':
+        return None
+    return check_unmanaged(service_account)
+
+def check_config_map_drift(config_map):
+    if config_map['name'] == 'kube-root-ca.crt':
+        return None
+    return check_unmanaged(config_map)
+
+def project_stateful_set(item):
+    projected = project_metadata(item)
+    projected['spec_replicas'] = (item.get('spec') or {}).get('replicas', 1)
+    projected['ready_replicas'] = (item.get('status') or {}).get('readyReplicas', 0)
+    return projected
+
+def check_stateful_set_drift(stateful_set):
+    if stateful_set['ready_replicas'] != stateful_set['spec_replicas']:
+        return 'replica_count'
+    return check_unmanaged(stateful_set)
+
+def project_pvc(item):
+    projected = project_metadata(item)
+    projected['phase'] = (item.get('status') or {}).get('phase')
+    return projected
+
+def check_pvc_drift(pvc):
+    if pvc['phase'] != 'Bound':
+        return 'unbound_claim'
+    return check_unmanaged(pvc)
+
+def project_job(item):
+    projected = project_metadata(item)
+    projected['failed'] = (item.get('status') or {}).get('failed', 0)
+    return projected
+
+def check_job_drift(job):
+    if job['failed']:
+        return 'failed_job'
+    return check_unmanaged(job)
+
+def project_cron_job(item):
+    projected = project_metadata(item)
+    projected['suspend'] = (item.get('spec') or {}).get('suspend', False)
+    return projected
+
+def check_cron_job_drift(cron_job):
+    if cron_job['suspend']:
+        return 'suspended'
+    return check_unmanaged(cron_job)
+
+def project_deployment(item):
+    """Keep only the Deployment fields check_deployment_drift reads"""
+    return {
+        'name': item['metadata']['name'],
+        'spec_replicas': (item.get('spec') or {}).get('replicas'),
+        'status_replicas': (item.get('status') or {}).get('replicas')
+    }
+
+def project_service(item):
+    """Keep only the Service fields check_service_drift reads"""
+    return {
+        'name': item['metadata']['name'],
+        'type': (item.get('spec') or {}).get('type')
+    }
+
 def check_deployment_drift(deployment):
     """Check if deployment has drifted"""
     # Simple drift detection - in production, compare with Git state
-    return deployment.status.replicas != deployment.spec.replicas
+    return deployment['status_replicas'] != deployment['spec_replicas']
 
 def check_service_drift(service):
     """Check if service has drifted"""
     # Check for unexpected service type changes
-    return service.spec.type != 'ClusterIP'
+    return service['type'] != 'ClusterIP'
+
+register_checker('Deployment', 'AppsV1Api', 'list_namespaced_deployment',
+                 project_deployment, lambda d: 'replica_count' if check_deployment_drift(d) else None)
+register_checker('Service', 'CoreV1Api', 'list_namespaced_service',
+                 project_service, lambda s: 'service_type' if check_service_drift(s) else None)
+register_checker('Secret', 'CoreV1Api', 'list_namespaced_secret', project_secret, check_secret_drift)
+register_checker('ServiceAccount', 'CoreV1Api', 'list_namespaced_service_account',
+                 project_metadata, check_service_account_drift)
+register_checker('Role', 'RbacAuthorizationV1Api', 'list_namespaced_role', project_metadata, check_unmanaged)
+register_checker('RoleBinding', 'RbacAuthorizationV1Api', 'list_namespaced_role_binding',
+                 project_metadata, check_unmanaged)
+register_checker('Ingress', 'NetworkingV1Api', 'list_namespaced_ingress', project_metadata, check_unmanaged)
+register_checker('StatefulSet', 'AppsV1Api', 'list_namespaced_stateful_set',
+                 project_stateful_set, check_stateful_set_drift)
+register_checker('ConfigMap', 'CoreV1Api', 'list_namespaced_config_map', project_metadata, check_config_map_drift)
+register_checker('PersistentVolumeClaim', 'CoreV1Api', 'list_namespaced_persistent_volume_claim',
+                 project_pvc, check_pvc_drift)
+register_checker('Job', 'BatchV1Api', 'list_namespaced_job', project_job, check_job_drift)
+register_checker('CronJob', 'BatchV1Api', 'list_namespaced_cron_job', project_cron_job, check_cron_job_drift)
 
 def calculate_risk_score(severity):
     """Calculate risk score based on severity"""
@@ -1,19 +1,18 @@
 import os
 import requests
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from kubernetes import client, config
+from kubernetes import client
+from kube_client import get_api_client, load_kube_config
+from audit_sink import create_audit_sink, make_audit_entry
 
 def execute_emergency_rollback():
     """Execute emergency rollback for high-severity drift"""
-    try:
-        config.load_incluster_config()
-    except:
-        try:
-            config.load_kube_config()
-        except:
-            print("Demo mode: Emergency rollback would be executed")
-            return simulate_rollback()
+    if not load_kube_config():
+        print("Demo mode: Emergency rollback would be executed")
+        return simulate_rollback()
     
     app_name = os.getenv('APP_NAME', 'unknown')
     severity = os.getenv('SEVERITY', 'low')
@@ -59,61 +58,126 @@ def trigger_argocd_rollback(app_name):
         print(f"❌ ArgoCD rollback failed: {e}")
         return False
 
-def execute_kubernetes_rollback(namespace):
-    """Fallback: Direct Kubernetes rollback"""
+REVISION_ANNOTATION = 'deployment.kubernetes.io/revision'
+
+def _revision(obj):
     try:
-        apps_v1 = client.AppsV1Api()
+        return int((obj.metadata.annotations or {}).get(REVISION_ANNOTATION, 0))
+    except ValueError:
+        return 0
+
+def index_replicasets_by_owner(replicasets):
+    """Map Deployment UID -> its ReplicaSets sorted by revision (newest first)"""
+    index = {}
+    for rs in replicasets:
+        for owner in rs.metadata.owner_references or []:
+            if owner.kind == 'Deployment' and owner.controller:
+                index.setdefault(owner.uid, []).append(rs)
+    for owned in index.values():
+        owned.sort(key=_revision, reverse=True)
+    return index
+
+def plan_deployment_rollback(deployment, owned_replicasets):
+    """Return (previous ReplicaSet, current revision) or (None, current revision)"""
+    current = _revision(deployment)
+    for rs in owned_replicasets:
+        revision = _revision(rs)
+        if 0 < revision < current:
+            return rs, current
+    return None, current
+
+def rollback_deployment(apps_v1, api_client, deployment, previous_rs, namespace, timeout_seconds):
+    """Roll a Deployment back to previous_rs's pod template (kubectl rollout undo semantics)"""
+    template = api_client.sanitize_for_serialization(previous_rs.spec.template)
+    labels = template.get('metadata', {}).get('labels', {})
+    labels.pop('pod-template-hash', None)
+    
+    # JSON patch replaces the whole template so removed containers/volumes do not linger
+    apps_v1.patch_namespaced_deployment(
+        name=deployment.metadata.name,
+        namespace=namespace,
+        body=[{'op': 'replace', 'path': '/spec/template', 'value': template}],
+        _request_timeout=timeout_seconds
+    )
+
+def execute_kubernetes_rollback(namespace, max_parallel=None, timeout_seconds=None):
+    """Fallback: roll every Deployment in the namespace back to its previous ReplicaSet revision.
+
+    Deployments and ReplicaSets are fetched with one LIST each, ReplicaSets are
+    indexed by owner UID, and the patches run concurrently with bounded
+    parallelism and a per-object request timeout.
+    """
+    max_parallel = max_parallel or int(os.getenv('ROLLBACK_PARALLELISM', '16'))
+    timeout_seconds = timeout_seconds or float(os.getenv('ROLLBACK_TIMEOUT_SECONDS', '10'))
+    started = time.monotonic()
+    results = []
+    
+    try:
+        apps_v1 = client.AppsV1Api(get_api_client())
+        api_client = get_api_client()
         
-        # Get deployments in namespace
-        deployments = apps_v1.list_namespaced_deployment(namespace)
+        deployments = apps_v1.list_namespaced_deployment(namespace).items
+        owned = index_replicasets_by_owner(apps_v1.list_namespaced_replica_set(namespace).items)
         
-        for deployment in deployments.items:
-            deployment_name = deployment.metadata.name
-            print(f"🔄 Rolling back deployment: {deployment_name}")
-            
-            # Trigger rollback
-            apps_v1.create_namespaced_deployment_rollback(
-                name=deployment_name,
-                namespace=namespace,
-                body={'kind': 'DeploymentRollback', 'apiVersion': 'apps/v1'}
-            )
-            
+        def rollback_one(deployment):
+            name = deployment.metadata.name
+            object_started = time.monotonic()
+            previous_rs, current = plan_deployment_rollback(deployment, owned.get(deployment.metadata.uid, []))
+            result = {'name': name, 'from_revision': current, 'to_revision': None}
+            if previous_rs is None:
+                result['status'] = 'skipped'
+                result['reason'] = 'no previous revision'
+            else:
+                result['to_revision'] = _revision(previous_rs)
+                try:
+                    rollback_deployment(apps_v1, api_client, deployment, previous_rs, namespace, timeout_seconds)
+                    result['status'] = 'rolled_back'
+                except Exception as e:
+                    result['status'] = 'failed'
+                    result['error'] = str(e)
+            result['duration_seconds'] = round(time.monotonic() - object_started, 3)
+            return result
+        
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            for result in executor.map(rollback_one, deployments):
+                icon = {'rolled_back': '🔄', 'skipped': '⏭️ ', 'failed': '❌'}[result['status']]
+                print(f"{icon} {result['name']}: {result['status']} "
+                      f"(revision {result['from_revision']} -> {result['to_revision']})")
+                results.append(result)
+    
     except Exception as e:
         print(f"❌ Kubernetes rollback failed: {e}")
+    
+    wall_time = time.monotonic() - started
+    summary = {
+        'namespace': namespace,
+        'total': len(results),
+        'rolled_back': sum(1 for r in results if r['status'] == 'rolled_back'),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'failed': sum(1 for r in results if r['status'] == 'failed'),
+        'wall_time_seconds': round(wall_time, 3),
+        'results': results
+    }
+    print(f"📊 Rollback summary: {summary['rolled_back']} rolled back, {summary['skipped']} skipped, "
+          f"{summary['failed']} failed in {summary['wall_time_seconds']}s")
+    return summary
 
 def create_emergency_alert(app_name, severity, rollback_success):
-    """Create emergency alert ConfigMap"""
+    """Record emergency alert in the batched audit log"""
     try:
-        v1 = client.CoreV1Api()
-        
-        alert_cm = {
-            'metadata': {
-                'name': f'emergency-alert-{app_name}-{int(datetime.now().timestamp())}',
-                'namespace': 'argocd',
-                'labels': {
-                    'alert-type': 'emergency-rollback',
-                    'severity': severity,
-                    'app': app_name
-                }
-            },
-            'data': {
-                'alert': f'Emergency rollback {"completed" if rollback_success else "failed"} for {app_name}',
-                'severity': severity,
-                'timestamp': datetime.now().isoformat(),
-                'rollback_status': 'success' if rollback_success else 'failed',
-                'operator': 'emergency-rollback-hook'
-            }
-        }
-        
-        v1.create_namespaced_config_map(
-            namespace='argocd',
-            body=alert_cm
-        )
+        sink = create_audit_sink(client.CoreV1Api(get_api_client()), namespace='argocd')
+        sink.write(make_audit_entry(
+            app_name, 'emergency-rollback', severity,
+            alert=f'Emergency rollback {"completed" if rollback_success else "failed"} for {app_name}',
+            rollback_status='success' if rollback_success else 'failed',
+            operator='emergency-rollback-hook'
+        ))
+        sink.close()
         
-        print(f"🚨 Emergency alert created for {app_name}")
+        print(f"🚨 Emergency alert recorded for {app_name}")
         
     except Exception as e:
-        print(f"❌ Failed to create emergency alert: {e}")
+        print(f"❌ Failed to record emergency alert: {e}")
 
 def notify_oncall_team(app_name, severity):
     """Notify on-call team for critical issues"""
@@ -13,6 +13,10 @@ docker build -t emergency-rollback:latest -f docker/emergency-rollback/Dockerfil
 echo "🔐 Applying RBAC for ArgoCD..."
 kubectl apply -f k8s/rbac.yaml
 
+# Apply remediation policies (mounted into the controller and hot-reloaded)
+echo "📜 Applying remediation policies..."
+kubectl apply -f config/remediation_policies.yaml
+
 # Build the main controller image
 echo "🐳 Building Argo Drift Controller image..."
 docker build -t argo-drift-controller:latest -f docker/Dockerfile .
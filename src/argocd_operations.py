@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+
+from metrics import OPERATION_DURATION, OPERATIONS_DEFERRED
+
+# status.operationState.phase values (ArgoCD OperationPhase)
+RUNNING_PHASES = frozenset(['Running', 'Terminating'])
+COMPLETED_PHASES = frozenset(['Succeeded', 'Failed', 'Error'])
+
+# Remediation executor result when an approval request was sent and nothing was changed
+AWAITING_APPROVAL = 'awaiting_approval'
+
+
+def sync_operation_body(revision=None):
+    """Application patch that starts a forced, pruning sync (to revision, for rollbacks)"""
+    sync = {
+        "syncStrategy": {
+            "apply": {
+                "force": True
+            }
+        },
+        "prune": True
+    }
+    if revision is not None:
+        sync = {"revision": revision, **sync}
+    return {"operation": {"sync": sync}}
+
+
+def emergency_stop_body():
+    """Application merge patch that turns off automated sync (null deletes the key)"""
+    return {"spec": {"syncPolicy": {"automated": None}}}
+
+
+def previous_revision_of(app):
+    """Revision of the second most recent sync in the Application history, or None"""
+    history = app.get('status', {}).get('history', [])
+    if len(history) < 2:
+        return None
+    return history[-2]['revision']
+
+
+def operation_state(app):
+    return (app.get('status') or {}).get('operationState') or {}
+
+
+def operation_in_progress(app):
+    """An operation is queued on the Application or ArgoCD is still running one"""
+    return bool(app.get('operation')) or operation_state(app).get('phase') in RUNNING_PHASES
+
+
+class PendingOperation:
+    """A sync or rollback this controller submitted and has not yet seen finish"""
+
+    __slots__ = ('app_name', 'operation', 'severity', 'baseline', 'submitted', 'started')
+
+    def __init__(self, app_name, operation, severity, baseline, submitted):
+        self.app_name = app_name
+        self.operation = operation
+        self.severity = severity
+        # operationState before submission, so its (finished) phase is not mistaken for ours
+        self.baseline = baseline
+        self.submitted = submitted
+        self.started = False
+
+
+class OperationTracker:
+    """Bounds the ArgoCD operations in flight and follows each one to completion.
+
+    begin() admits a sync or rollback unless the Application is busy (an
+    operation already queued or running there) or max_in_flight operations are
+    outstanding. Busy applications are re-queued by the informer event that
+    ends their operation; applications turned away at capacity are remembered
+    and passed to on_slot_free, oldest first, as slots are released.
+
+    observe() is fed the Application updates the informer delivers and
+    completes an operation once ArgoCD reports a new finished operationState;
+    there is no polling. on_complete(pending, phase, duration) then receives
+    the phase (Succeeded, Failed, Error, or Timeout/Deleted when it was never
+    seen to finish) and the seconds from submission to completion. Operations
+    older than timeout_seconds are released as Timeout on the next call.
+    """
+
+    def __init__(self, max_in_flight=10, timeout_seconds=600.0, clock=time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.timeout_seconds = timeout_seconds
+        self.clock = clock
+        self.on_complete = None
+        self.on_slot_free = None
+        # Insertion order is submission order, so the oldest operation is first
+        self._pending = {}
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def begin(self, app, operation, severity=None):
+        """Admit an operation on app; returns a PendingOperation, or None when it must wait"""
+        self._expire()
+        app_name = app['metadata']['name']
+        with self._lock:
+            if app_name in self._pending or operation_in_progress(app):
+                reason = 'busy'
+            elif len(self._pending) >= self.max_in_flight:
+                reason = 'saturated'
+                self._waiting[app_name] = None
+            else:
+                self._waiting.pop(app_name, None)
+                pending = PendingOperation(app_name, operation, severity, operation_state(app), self.clock())
+                self._pending[app_name] = pending
+                return pending
+        OPERATIONS_DEFERRED.labels(reason).inc()
+        if reason == 'busy':
+            logging.debug(f"Deferring {operation} for {app_name}: an operation is already in progress")
+        else:
+            logging.info(f"⏳ Deferring {operation} for {app_name}: {self.max_in_flight} operations in flight")
+        return None
+
+    def abort(self, pending):
+        """Release the slot of an operation whose submission failed"""
+        with self._lock:
+            if self._pending.get(pending.app_name) is not pending:
+                return
+            del self._pending[pending.app_name]
+            waiter = self._next_waiter()
+        self._wake(waiter)
+
+    def observe(self, app):
+        """Informer callback: complete the application's operation if ArgoCD has finished it"""
+        if not self._pending:
+            return
+        self._expire()
+        pending = self._pending.get(app['metadata']['name'])
+        if pending is None or app.get('operation'):
+            return
+        state = operation_state(app)
+        phase = state.get('phase')
+        if phase in RUNNING_PHASES:
+            pending.started = True
+        elif phase in COMPLETED_PHASES and (pending.started or state != pending.baseline):
+            self._finish(pending, phase)
+
+    def forget(self, app_name):
+        """The application was deleted"""
+        with self._lock:
+            self._waiting.pop(app_name, None)
+            pending = self._pending.get(app_name)
+        if pending is not None:
+            self._finish(pending, 'Deleted')
+
+    def _expire(self):
+        cutoff = self.clock() - self.timeout_seconds
+        while True:
+            with self._lock:
+                oldest = next(iter(self._pending.values()), None)
+            if oldest is None or oldest.submitted > cutoff:
+                return
+            logging.warning(f"⌛ {oldest.operation} for {oldest.app_name} not seen to finish "
+                            f"within {self.timeout_seconds:.0f}s")
+            self._finish(oldest, 'Timeout')
+
+    def _finish(self, pending, phase):
+        with self._lock:
+            if self._pending.get(pending.app_name) is not pending:
+                return
+            del self._pending[pending.app_name]
+            waiter = self._next_waiter()
+        duration = self.clock() - pending.submitted
+        OPERATION_DURATION.labels(pending.operation, phase).observe(duration)
+        logging.info(f"🏁 {pending.operation} for {pending.app_name} finished: {phase} after {duration:.1f}s")
+        if self.on_complete is not None:
+            try:
+                self.on_complete(pending, phase, duration)
+            except Exception as e:
+                logging.error(f"Operation completion handler failed for {pending.app_name}: {e}")
+        self._wake(waiter)
+
+    def _next_waiter(self):
+        if not self._waiting:
+            return None
+        app_name = next(iter(self._waiting))
+        del self._waiting[app_name]
+        return app_name
+
+    def _wake(self, waiter):
+        if waiter is not None and self.on_slot_free is not None:
+            self.on_slot_free(waiter)
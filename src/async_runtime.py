@@ -0,0 +1,619 @@
+import asyncio
+import functools
+import json
+import logging
+import ssl
+import time
+from http import HTTPStatus
+from urllib.parse import urlencode, urlsplit
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from argocd_operations import (AWAITING_APPROVAL, PendingOperation, emergency_stop_body, previous_revision_of,
+                               sync_operation_body)
+from informer import ApplicationInformer, HTTP_STATUS_GONE
+from workqueue import AsyncRateLimitingQueue, AsyncWorkerPool, TokenBucket
+from metrics import NOTIFICATION_LATENCY, PATCH_LATENCY, QUEUE_WAIT, ROLLBACK_LATENCY
+
+
+class AsyncHttpResponse:
+    __slots__ = ('status', 'reason', 'headers', 'body')
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class AsyncHttpClient:
+    """Minimal pooled HTTP/1.1 client on asyncio streams (stdlib only).
+
+    Keeps idle keep-alive connections per (scheme, host, port), bounds open
+    connections per host, and understands Content-Length and chunked bodies.
+    Responses can be read whole (request) or line by line (stream_lines), the
+    latter for WATCH.
+    """
+
+    def __init__(self, max_connections_per_host=100, connect_timeout=5.0, read_timeout=30.0,
+                 ssl_context=None):
+        self.max_connections_per_host = max_connections_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.ssl_context = ssl_context
+        self._idle = {}
+        self._limits = {}
+        self.connections_opened = 0
+
+    @staticmethod
+    def _endpoint(url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        target = parts.path or '/'
+        if parts.query:
+            target = f'{target}?{parts.query}'
+        return (parts.scheme, parts.hostname, port), target
+
+    async def _acquire(self, key):
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.max_connections_per_host)
+        await limit.acquire()
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context if scheme == 'https' else None,
+                                        server_hostname=host if scheme == 'https' else None),
+                self.connect_timeout)
+        except BaseException:
+            limit.release()
+            raise
+        self.connections_opened += 1
+        return reader, writer, False
+
+    def _release(self, key, reader, writer, reusable):
+        if reusable and not writer.is_closing():
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+        self._limits[key].release()
+
+    @staticmethod
+    def _encode_request(method, host, target, headers, body):
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {host}', 'Accept-Encoding: identity']
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        if body is not None:
+            lines.append(f'Content-Length: {len(body)}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+    @staticmethod
+    async def _read_head(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed before response')
+        _, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return int(status), (reason[0] if reason else ''), headers
+
+    @staticmethod
+    async def _iter_body(reader, headers):
+        """Yield body chunks; the last value yielded is None when the connection can be reused"""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                yield await reader.readexactly(size)
+                await reader.readline()
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length:
+                yield await reader.readexactly(length)
+        else:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                yield chunk
+        if headers.get('connection', '').lower() != 'close':
+            yield None
+
+    async def request(self, method, url, headers=None, body=None, timeout=None):
+        """Send a request and read the whole response body"""
+        key, target = self._endpoint(url)
+        timeout = timeout or self.read_timeout
+        payload = self._encode_request(method, key[1], target, headers, body)
+        for attempt in (0, 1):
+            reader, writer, reused = await self._acquire(key)
+            reusable = False
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status, reason, response_headers = await asyncio.wait_for(self._read_head(reader), timeout)
+                chunks = []
+                async def read_all():
+                    nonlocal reusable
+                    async for chunk in self._iter_body(reader, response_headers):
+                        if chunk is None:
+                            reusable = True
+                        else:
+                            chunks.append(chunk)
+                await asyncio.wait_for(read_all(), timeout)
+                return AsyncHttpResponse(status, reason, response_headers, b''.join(chunks))
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                # A pooled connection the server already closed; retry once on a fresh one
+                if not reused or attempt:
+                    raise
+            finally:
+                self._release(key, reader, writer, reusable)
+
+    async def stream_lines(self, method, url, headers=None, observe_bytes=None):
+        """Send a request and yield the response body line by line (for WATCH).
+
+        Raises ApiException without reading further if the status is not 2xx.
+        """
+        key, target = self._endpoint(url)
+        reader, writer, _ = await self._acquire(key)
+        reusable = False
+        try:
+            writer.write(self._encode_request(method, key[1], target, headers, None))
+            await writer.drain()
+            status, reason, response_headers = await asyncio.wait_for(self._read_head(reader),
+                                                                      self.read_timeout)
+            if status >= 300:
+                raise ApiException(status=status, reason=reason)
+            pending = b''
+            async for chunk in self._iter_body(reader, response_headers):
+                if chunk is None:
+                    reusable = True
+                    break
+                if observe_bytes is not None:
+                    observe_bytes(len(chunk))
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    if line:
+                        yield line
+            if pending:
+                yield pending
+        finally:
+            self._release(key, reader, writer, reusable)
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class AsyncKubeClient:
+    """Async JSON access to the apiserver using the loaded kubernetes client Configuration.
+
+    Shares the bearer-token/TLS settings of the synchronous client and applies
+    the same client-side QPS/burst limit (KUBE_CLIENT_QPS / KUBE_CLIENT_BURST).
+    """
+
+    def __init__(self, configuration=None, http=None, qps=50.0, burst=100, max_connections=100):
+        self.configuration = configuration or client.Configuration.get_default_copy()
+        self.host = self.configuration.host.rstrip('/')
+        self.http = http or AsyncHttpClient(max_connections_per_host=max_connections,
+                                            ssl_context=self._ssl_context())
+        self.limiter = TokenBucket(qps=qps, burst=burst) if qps else None
+
+    def _ssl_context(self):
+        if not self.host.startswith('https'):
+            return None
+        configuration = self.configuration
+        context = ssl.create_default_context(cafile=configuration.ssl_ca_cert)
+        if configuration.cert_file:
+            context.load_cert_chain(configuration.cert_file, configuration.key_file)
+        if not configuration.verify_ssl:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def _headers(self, accept=None, content_type=None):
+        configuration = self.configuration
+        if configuration.refresh_api_key_hook is not None:
+            configuration.refresh_api_key_hook(configuration)
+        headers = {'Accept': accept or 'application/json'}
+        token = configuration.get_api_key_with_prefix('authorization')
+        if token:
+            headers['Authorization'] = token
+        if content_type:
+            headers['Content-Type'] = content_type
+        return headers
+
+    def _url(self, path, params=None):
+        query = urlencode({key: value for key, value in (params or {}).items() if value is not None})
+        return f'{self.host}{path}?{query}' if query else f'{self.host}{path}'
+
+    async def _throttle(self):
+        if self.limiter is not None:
+            wait = self.limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def request_json(self, method, path, params=None, body=None,
+                           content_type='application/json', accept=None, observe_bytes=None):
+        await self._throttle()
+        payload = json.dumps(body).encode() if body is not None else None
+        response = await self.http.request(
+            method, self._url(path, params),
+            headers=self._headers(accept, content_type if payload is not None else None), body=payload)
+        if observe_bytes is not None:
+            observe_bytes(len(response.body))
+        if response.status >= 300:
+            raise ApiException(status=response.status, reason=response.reason)
+        return response.json()
+
+    async def watch_json(self, path, params=None, accept=None, observe_bytes=None):
+        """Async generator of decoded WATCH events; ERROR events raise ApiException"""
+        await self._throttle()
+        params = dict(params or {}, watch='true')
+        async for line in self.http.stream_lines('GET', self._url(path, params),
+                                                 headers=self._headers(accept), observe_bytes=observe_bytes):
+            event = json.loads(line)
+            if event.get('type') == 'ERROR':
+                error = event.get('object') or {}
+                raise ApiException(status=error.get('code'), reason=error.get('message'))
+            yield event
+
+    async def close(self):
+        await self.http.close()
+
+
+class AsyncApplicationInformer(ApplicationInformer):
+    """ApplicationInformer whose LIST and WATCH run on the event loop via AsyncKubeClient"""
+
+    def __init__(self, kube, namespace, group="argoproj.io", version="v1alpha1",
+                 plural="applications", watch_timeout_seconds=300, label_selector=None, accept=None):
+        super().__init__(None, namespace, group, version, plural, watch_timeout_seconds, label_selector)
+        self.kube = kube
+        self.accept = accept
+        self.path = f'/apis/{group}/{version}/namespaces/{namespace}/{plural}'
+
+    async def relist(self):
+        result = await self.kube.request_json('GET', self.path, {'labelSelector': self.label_selector},
+                                              accept=self.accept, observe_bytes=self._observe_list_bytes)
+        self._replace_store(result)
+
+    async def _watch_once(self):
+        started = time.monotonic()
+        events = 0
+        bytes_before = self.bytes_received
+        params = {
+            'labelSelector': self.label_selector,
+            'resourceVersion': self.resource_version,
+            'allowWatchBookmarks': 'true',
+            'timeoutSeconds': self.watch_timeout_seconds
+        }
+        try:
+            async for event in self.kube.watch_json(self.path, params, accept=self.accept,
+                                                    observe_bytes=self._observe_watch_bytes):
+                events += 1
+                self.apply_event(event['type'], event['object'])
+                if self._stopped:
+                    break
+        finally:
+            self._log_watch_session(started, events, bytes_before)
+
+    async def run(self, max_backoff_seconds=60):
+        failures = 0
+        while not self._stopped:
+            try:
+                if not self.has_synced or self.resource_version is None:
+                    await self.relist()
+                await self._watch_once()
+                failures = 0
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    logging.warning("Watch resourceVersion expired (410 Gone), re-listing")
+                    self.resource_version = None
+                    continue
+                failures += 1
+                logging.error(f"Watch error (attempt {failures}): {e}")
+                await asyncio.sleep(min(2 ** failures, max_backoff_seconds))
+            except Exception as e:
+                failures += 1
+                logging.error(f"Watch error (attempt {failures}): {e}")
+                await asyncio.sleep(min(2 ** failures, max_backoff_seconds))
+
+
+class AsyncNotifier:
+    """Awaitable notification sends on top of NotificationHandler's templates.
+
+    Slack webhooks are posted on the event loop; channels without an async
+    transport (email, PagerDuty, demo logging) run in the default executor.
+    """
+
+    def __init__(self, handler, http=None):
+        self.handler = handler
+        self.http = http or AsyncHttpClient(ssl_context=ssl.create_default_context())
+
+    async def send_notification(self, app_name, message, severity='medium', channels=None):
+        if channels is None:
+            channels = self.handler._get_channels_for_severity(severity)
+        if self.handler.coalescer is not None and severity != 'critical':
+            # Digests are sent from the coalescer's window timer; do not hold the caller for the window
+            return self.handler.send_notification(app_name, message, severity, channels=channels)
+        data = self.handler._notification_data(app_name, message, severity)
+        deliveries = [self.handler._channel_delivery(channel, data, 'drift_detected') for channel in channels]
+        return await self._deliver_all([delivery for delivery in deliveries if delivery is not None])
+
+    async def send_remediation_complete(self, app_name, action, status, duration=None, channels=None):
+        return await self._deliver_all(
+            self.handler._remediation_deliveries(app_name, action, status, duration, channels))
+
+    async def send_critical_alert(self, app_name, message, details=None):
+        logging.critical(f"🚨 CRITICAL ALERT: {app_name} - {message}")
+        return await self._deliver_all(self.handler._critical_alert_deliveries(app_name, message, details))
+
+    async def _deliver_all(self, deliveries):
+        results = await asyncio.gather(*(self._deliver(*delivery) for delivery in deliveries),
+                                       return_exceptions=True)
+        outcome = {}
+        for (channel, *_), result in zip(deliveries, results):
+            if isinstance(result, Exception):
+                logging.error(f"Failed to send {channel} notification: {result!r}")
+                result = False
+            outcome[channel] = result
+        return outcome
+
+    async def _deliver(self, channel, func, args, kwargs):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            webhook_url = self.handler.channels['slack'].get('webhook_url')
+            if channel == 'slack' and webhook_url:
+                payload = json.dumps(self.handler._slack_payload(*args)).encode()
+                response = await self.http.request('POST', webhook_url, body=payload,
+                                                   headers={'Content-Type': 'application/json'})
+                result = response.status == 200
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(None, lambda: func(*args, **kwargs))
+            outcome = 'failed' if result is False else 'success'
+            return result
+        finally:
+            NOTIFICATION_LATENCY.labels(channel, outcome).observe(time.perf_counter() - started)
+
+    async def close(self):
+        # Pending digests are posted synchronously by the handler
+        await asyncio.get_running_loop().run_in_executor(None, self.handler.close)
+        await self.http.close()
+
+
+class AsyncControllerRuntime:
+    """Runs an AutoRemediationController on one asyncio event loop.
+
+    The controller keeps its policies, remediation state, report cache and
+    coordinator; this runtime replaces its I/O: an async informer, an asyncio
+    work queue drained by `concurrency` tasks, async Application GET/PATCH,
+    async notifications, and the health/metrics endpoints served on the same
+    loop. Opt in with CONTROLLER_RUNTIME=asyncio.
+    """
+
+    def __init__(self, controller, kube, health_response, notifier=None, concurrency=1000, health_port=8080):
+        self.controller = controller
+        self.health_response = health_response
+        self.kube = kube
+        self.notifier = notifier
+        self.health_port = health_port
+        self.app_path = f'/apis/argoproj.io/v1alpha1/namespaces/{controller.argocd_namespace}/applications'
+
+        # Swap the controller's threaded queue for an asyncio one; event handlers
+        # and plan_remediation() keep calling queue.add()/add_after() unchanged
+        controller.queue = AsyncRateLimitingQueue(bucket=controller.queue.bucket,
+                                                  wait_observer=QUEUE_WAIT.observe)
+        self.workers = AsyncWorkerPool(controller.queue, self.process_application, concurrency=concurrency)
+        self.informer = AsyncApplicationInformer(
+            kube, controller.argocd_namespace, label_selector=controller.informer.label_selector,
+            accept=controller.informer_accept)
+        self.informer.add_event_handler(controller.on_application_event)
+        controller.informer = self.informer
+        self.executors = {
+            'auto_sync': self._auto_sync,
+            'notify_and_timeout': self._notify_and_timeout,
+            'immediate_rollback': self._immediate_rollback,
+            'emergency_stop': self._emergency_stop
+        }
+        # Operations complete from informer events, which run on this loop
+        controller.operations.on_complete = self._on_operation_complete
+        self._notifications = set()
+        self._server = None
+
+    async def get_application(self, app_name):
+        if not self.controller.metadata_only:
+            app = self.informer.get(app_name)
+            if app is not None:
+                return app
+        try:
+            return await self.kube.request_json('GET', f'{self.app_path}/{app_name}')
+        except ApiException as e:
+            if e.status == 404:
+                return None
+            raise
+
+    async def patch_application(self, app_name, body, operation):
+        started = time.perf_counter()
+        try:
+            return await self.kube.request_json('PATCH', f'{self.app_path}/{app_name}', body=body,
+                                                content_type='application/merge-patch+json')
+        finally:
+            PATCH_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    async def submit_operation(self, app, operation, body, severity):
+        """PATCH an ArgoCD operation onto app; returns the PendingOperation, or None when it must wait"""
+        operations = self.controller.operations
+        pending = operations.begin(app, operation, severity)
+        if pending is None:
+            return None
+        try:
+            await self.patch_application(pending.app_name, body, operation)
+        except BaseException:
+            operations.abort(pending)
+            raise
+        return pending
+
+    async def process_application(self, app_name):
+        controller = self.controller
+        if not controller.coordinator.owns(app_name):
+            return True
+        app = await self.get_application(app_name)
+        if app is None:
+            return True
+        sync_status = app.get('status', {}).get('sync', {}).get('status')
+        if controller.metadata_only:
+            controller._observe_sync_status(app_name, sync_status)
+            controller.operations.observe(app)
+        if sync_status != 'OutOfSync':
+            return True
+        return await self.handle_drift(app)
+
+    async def handle_drift(self, app):
+        plan = self.controller.plan_remediation(app)
+        if plan is None:
+            return None
+        remediation, severity, fingerprint = plan
+        app_name = app['metadata']['name']
+        action = remediation['action']
+        started = time.monotonic()
+
+        try:
+            result = await self.executors[action](app, severity)
+        except Exception as e:
+            logging.error(f"❌ {action} failed for {app_name}: {e}")
+            result = False
+        if result is None:
+            # Deferred by the operation tracker: nothing was submitted, nothing to record
+            return None
+
+        self.controller.record_remediation(app_name, remediation, fingerprint, result)
+        # A submitted operation is reported once the informer sees it finish; an approval
+        # request is itself the notification
+        if not isinstance(result, PendingOperation) and result is not AWAITING_APPROVAL:
+            await self.notify_remediation(app_name, remediation, 'failed' if result is False else 'success',
+                                          duration=round(time.monotonic() - started, 3))
+        return result
+
+    async def notify_remediation(self, app_name, remediation, status, duration=None):
+        if self.notifier is None or not remediation['notification_channels']:
+            return
+        action = remediation['action']
+        if remediation['notify_oncall']:
+            await self.notifier.send_critical_alert(
+                app_name, f"{action} {status} for {remediation['severity']} drift",
+                details={'action': action, 'status': status, 'duration': duration})
+        else:
+            await self.notifier.send_remediation_complete(
+                app_name, action, status, duration=duration, channels=remediation['notification_channels'])
+
+    def _on_operation_complete(self, pending, phase, duration):
+        remediation, status = self.controller.record_operation_outcome(pending, phase)
+        task = asyncio.get_running_loop().create_task(self.notify_remediation(
+            pending.app_name, remediation, status, duration=round(duration, 3)))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    async def _auto_sync(self, app, severity):
+        pending = await self.submit_operation(app, 'sync', sync_operation_body(), severity)
+        if pending is not None:
+            logging.info(f"✅ Successfully triggered sync operation for {app['metadata']['name']}")
+        return pending
+
+    async def _notify_and_timeout(self, app, severity):
+        app_name = app['metadata']['name']
+        message, channels = self.controller.approval_request(app_name, severity)
+        if self.notifier is not None and channels:
+            await self.notifier.send_notification(app_name, message, severity, channels=channels)
+        logging.info(f"📧 Approval requested for {app_name} via {', '.join(channels) or 'no channels'}: {message}")
+        return AWAITING_APPROVAL
+
+    async def _immediate_rollback(self, app, severity):
+        app_name = app['metadata']['name']
+        with ROLLBACK_LATENCY.time():
+            revision = previous_revision_of(app)
+            if revision is None:
+                logging.error(f"No previous revision to rollback to for {app_name}")
+                return False
+            pending = await self.submit_operation(app, 'rollback', sync_operation_body(revision), severity)
+            if pending is None:
+                return None
+            logging.info(f"✅ Emergency rollback triggered for {app_name} to revision {revision}")
+            await self._create_emergency_alert(app_name, severity, f"Rolled back to {revision}")
+            return pending
+
+    async def _emergency_stop(self, app, severity):
+        app_name = app['metadata']['name']
+        logging.critical(f"🛑 Emergency stop for {app_name}: disabling automated sync")
+        await self.patch_application(app_name, emergency_stop_body(), 'emergency_stop')
+        await self._create_emergency_alert(app_name, severity, "Automated sync disabled",
+                                           event_type='emergency-stop')
+        return True
+
+    async def _create_emergency_alert(self, app_name, severity, details, event_type='emergency-rollback'):
+        # The audit write can flush a batch to the apiserver synchronously; keep it off the loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.controller._create_emergency_alert, app_name, severity, details,
+                                    event_type=event_type))
+
+    async def _serve_health(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            status, content_type, body = self.health_response(parts[1] if len(parts) > 1 else '/')
+            head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+                    f'Content-Length: {len(body)}', 'Connection: close']
+            if content_type:
+                head.append(f'Content-Type: {content_type}')
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self):
+        controller = self.controller
+        self._server = await asyncio.start_server(self._serve_health, '0.0.0.0', self.health_port)
+        logging.info(f"Health server started on port {self.health_port} (asyncio)")
+        logging.info(f"👀 Watching ArgoCD applications in namespace: {controller.argocd_namespace} (asyncio)")
+        controller.restore_checkpoint()
+        controller.policies.start()
+        # Bind the queue to this loop before the coordinator thread can enqueue
+        self.workers.start()
+        controller.coordinator.start()
+        if controller.checkpointer is not None:
+            controller.checkpointer.start()
+        try:
+            await self.informer.run()
+        finally:
+            self.informer.stop()
+            controller.policies.stop()
+            await self.workers.stop()
+            if self._notifications:
+                await asyncio.gather(*self._notifications, return_exceptions=True)
+            controller.coordinator.stop()
+            if controller.checkpointer is not None:
+                controller.checkpointer.stop()
+            await asyncio.get_running_loop().run_in_executor(None, controller.audit_sink.close)
+            self._server.close()
+            if self.notifier is not None:
+                await self.notifier.close()
+            await self.kube.close()
@@ -0,0 +1,447 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+SEGMENT_LABEL = 'drift-audit/segment'
+SEGMENT_STATE_OPEN = 'open'
+SEGMENT_STATE_SEALED = 'sealed'
+MIN_TS_ANNOTATION = 'drift-audit/min-ts'
+MAX_TS_ANNOTATION = 'drift-audit/max-ts'
+COUNT_ANNOTATION = 'drift-audit/count'
+
+
+def make_audit_entry(app_name, event_type, severity, **fields):
+    """Build an audit record; 'ts' (epoch seconds) drives retention and time-range queries"""
+    now = time.time()
+    entry = {
+        'ts': now,
+        'timestamp': datetime.fromtimestamp(now).isoformat(),
+        'app': app_name,
+        'type': event_type,
+        'severity': severity
+    }
+    entry.update(fields)
+    return entry
+
+
+def _matches(entry, app, start, end):
+    if app is not None and entry.get('app') != app:
+        return False
+    ts = entry.get('ts', 0)
+    if start is not None and ts < start:
+        return False
+    if end is not None and ts > end:
+        return False
+    return True
+
+
+class AuditSink:
+    """Batches audit entries and hands them to a backend in size-capped segments.
+
+    Entries are buffered until batch_size is reached or flush_interval seconds
+    pass, then written with a single backend call. Every maintenance_interval
+    seconds a background thread runs maintain() (retention, plus compaction
+    where the backend has it). Subclasses implement _write_batch(), query()
+    and enforce_retention().
+    """
+
+    def __init__(self, batch_size=100, flush_interval=5.0, retention_seconds=7 * 24 * 3600,
+                 maintenance_interval=3600.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_seconds
+        self.maintenance_interval = maintenance_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self.entries_written = 0
+        self.batches_written = 0
+        self._stop = threading.Event()
+        self._maintenance_thread = None
+
+    def write(self, entry):
+        with self._lock:
+            if self._maintenance_thread is None and self.maintenance_interval and not self._stop.is_set():
+                # Started on first use so subclass state exists before maintain() can run
+                self._maintenance_thread = threading.Thread(target=self._run_maintenance, name='audit-maintenance')
+                self._maintenance_thread.daemon = True
+                self._maintenance_thread.start()
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+            if not full and self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch = self._buffer
+            self._buffer = []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return
+        with self._write_lock:
+            try:
+                self._write_batch(batch)
+                self.entries_written += len(batch)
+                self.batches_written += 1
+            except Exception as e:
+                logging.error(f"❌ Failed to write {len(batch)} audit entries: {e}")
+                with self._lock:
+                    self._buffer[:0] = batch
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def maintain(self):
+        """Periodic housekeeping; backends with compaction extend this"""
+        self.enforce_retention()
+
+    def _run_maintenance(self):
+        while not self._stop.wait(self.maintenance_interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                logging.error(f"❌ Audit log maintenance failed: {e}")
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def query(self, app=None, start=None, end=None):
+        """Return entries for an application and/or epoch time range, oldest first"""
+        raise NotImplementedError
+
+    def enforce_retention(self):
+        raise NotImplementedError
+
+
+class FileSegmentAuditSink(AuditSink):
+    """Append-only JSONL segment files plus an index of per-segment time range and apps.
+
+    The active segment rolls over once it reaches max_segment_bytes. Retention
+    deletes segments whose newest entry is past retention_seconds, and compact()
+    merges undersized sealed segments while dropping expired entries.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, directory, max_segment_bytes=4 * 1024 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'next_segment': 0, 'segments': []}
+
+    def _save_index(self):
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp, path)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, segment['file'])
+
+    def _new_segment(self):
+        seq = self._index['next_segment']
+        self._index['next_segment'] = seq + 1
+        segment = {'file': f'segment-{seq:08d}.jsonl', 'min_ts': None, 'max_ts': None,
+                   'count': 0, 'bytes': 0, 'apps': [], 'sealed': False}
+        self._index['segments'].append(segment)
+        return segment
+
+    def _active_segment(self):
+        segments = self._index['segments']
+        if segments and not segments[-1]['sealed']:
+            return segments[-1]
+        return self._new_segment()
+
+    def _write_batch(self, batch):
+        segment = self._active_segment()
+        apps = set(segment['apps'])
+        lines = [json.dumps(entry, separators=(',', ':')) + '\n' for entry in batch]
+        f = open(self._segment_path(segment), 'a')
+        try:
+            for entry, line in zip(batch, lines):
+                if segment['bytes'] and segment['bytes'] + len(line) > self.max_segment_bytes:
+                    # Roll over: seal the full segment and continue in a new file
+                    f.close()
+                    segment['apps'] = sorted(app for app in apps if app is not None)
+                    segment['sealed'] = True
+                    segment = self._new_segment()
+                    apps = set()
+                    f = open(self._segment_path(segment), 'a')
+                f.write(line)
+                segment['bytes'] += len(line)
+                segment['count'] += 1
+                ts = entry.get('ts', 0)
+                segment['min_ts'] = ts if segment['min_ts'] is None else min(segment['min_ts'], ts)
+                segment['max_ts'] = ts if segment['max_ts'] is None else max(segment['max_ts'], ts)
+                apps.add(entry.get('app'))
+        finally:
+            f.close()
+        segment['apps'] = sorted(app for app in apps if app is not None)
+        self._save_index()
+
+    def _read_segment(self, segment):
+        try:
+            with open(self._segment_path(segment)) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def query(self, app=None, start=None, end=None):
+        self.flush()
+        results = []
+        with self._write_lock:
+            segments = list(self._index['segments'])
+        for segment in segments:
+            if segment['min_ts'] is None:
+                continue
+            if start is not None and segment['max_ts'] < start:
+                continue
+            if end is not None and segment['min_ts'] > end:
+                continue
+            if app is not None and app not in segment['apps']:
+                continue
+            results.extend(e for e in self._read_segment(segment) if _matches(e, app, start, end))
+        results.sort(key=lambda e: e.get('ts', 0))
+        return results
+
+    def enforce_retention(self):
+        cutoff = time.time() - self.retention_seconds
+        with self._write_lock:
+            kept = []
+            for segment in self._index['segments']:
+                if segment['sealed'] and segment['max_ts'] is not None and segment['max_ts'] < cutoff:
+                    try:
+                        os.remove(self._segment_path(segment))
+                    except OSError:
+                        pass
+                else:
+                    kept.append(segment)
+            removed = len(self._index['segments']) - len(kept)
+            self._index['segments'] = kept
+            self._save_index()
+        return removed
+
+    def maintain(self):
+        self.enforce_retention()
+        self.compact()
+
+    def compact(self):
+        """Merge runs of undersized sealed segments and drop entries past retention"""
+        cutoff = time.time() - self.retention_seconds
+        with self._write_lock:
+            sealed = [s for s in self._index['segments'] if s['sealed']]
+            active = [s for s in self._index['segments'] if not s['sealed']]
+            merged = []
+            pending = []
+            pending_bytes = 0
+            for segment in sealed + [None]:
+                size = segment['bytes'] if segment else 0
+                if segment is not None and pending_bytes + size <= self.max_segment_bytes:
+                    pending.append(segment)
+                    pending_bytes += size
+                    continue
+                if len(pending) > 1:
+                    merged.append(self._merge(pending, cutoff))
+                else:
+                    merged.extend(pending)
+                pending = [segment] if segment else []
+                pending_bytes = size
+            self._index['segments'] = [s for s in merged if s['count']] + active
+            self._save_index()
+
+    def _merge(self, segments, cutoff):
+        entries = []
+        for segment in segments:
+            entries.extend(e for e in self._read_segment(segment) if e.get('ts', 0) >= cutoff)
+        target = dict(segments[0])
+        if not target['file'].endswith('.compact.jsonl'):
+            target['file'] = target['file'].replace('.jsonl', '.compact.jsonl')
+        tmp = self._segment_path(target) + '.tmp'
+        with open(tmp, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        os.replace(tmp, self._segment_path(target))
+        for segment in segments:
+            if segment['file'] != target['file']:
+                try:
+                    os.remove(self._segment_path(segment))
+                except OSError:
+                    pass
+        target.update({
+            'count': len(entries),
+            'bytes': os.path.getsize(self._segment_path(target)),
+            'min_ts': min((e.get('ts', 0) for e in entries), default=None),
+            'max_ts': max((e.get('ts', 0) for e in entries), default=None),
+            'apps': sorted({e.get('app') for e in entries if e.get('app') is not None}),
+            'sealed': True
+        })
+        return target
+
+
+class ConfigMapSegmentAuditSink(AuditSink):
+    """Rolling ConfigMap segments shared by every writer in the namespace.
+
+    Batches are appended to the open segment with optimistic concurrency
+    (replace with resourceVersion, retry on 409). Once a segment would exceed
+    max_segment_bytes it is sealed and the batch starts a new one. Writers that
+    race to create a segment can leave several open; the next write seals all
+    but the newest. Segment time ranges live in annotations so queries and
+    retention can skip whole ConfigMaps.
+    """
+
+    def __init__(self, core_v1, namespace='argocd', prefix='drift-audit',
+                 max_segment_bytes=768 * 1024, max_segments=50, max_conflict_retries=5, **kwargs):
+        super().__init__(**kwargs)
+        self.core_v1 = core_v1
+        self.namespace = namespace
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.max_conflict_retries = max_conflict_retries
+
+    def _list_segments(self, state=None):
+        selector = f'{SEGMENT_LABEL}={state}' if state else SEGMENT_LABEL
+        items = self.core_v1.list_namespaced_config_map(self.namespace, label_selector=selector).items
+        return sorted(items, key=lambda cm: cm.metadata.name)
+
+    def _segment_body(self, name, state, entries_text, min_ts, max_ts, count, resource_version=None):
+        metadata = {
+            'name': name,
+            'namespace': self.namespace,
+            'labels': {SEGMENT_LABEL: state},
+            'annotations': {
+                MIN_TS_ANNOTATION: repr(min_ts),
+                MAX_TS_ANNOTATION: repr(max_ts),
+                COUNT_ANNOTATION: str(count)
+            }
+        }
+        if resource_version:
+            metadata['resourceVersion'] = resource_version
+        return {'metadata': metadata, 'data': {'entries.jsonl': entries_text}}
+
+    def _new_segment_name(self):
+        return f'{self.prefix}-{int(time.time() * 1000)}'
+
+    def _write_batch(self, batch):
+        from kubernetes.client.rest import ApiException
+
+        text = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in batch)
+        batch_min = min(entry.get('ts', 0) for entry in batch)
+        batch_max = max(entry.get('ts', 0) for entry in batch)
+
+        for attempt in range(self.max_conflict_retries):
+            try:
+                open_segments = self._list_segments(SEGMENT_STATE_OPEN)
+                if not open_segments:
+                    self._create_segment(text, batch_min, batch_max, len(batch))
+                    return
+
+                # Concurrent writers each created one: keep appending to the newest only
+                for stale in open_segments[:-1]:
+                    self._seal(stale)
+                current = open_segments[-1]
+                existing = (current.data or {}).get('entries.jsonl', '')
+                annotations = current.metadata.annotations or {}
+                count = int(annotations.get(COUNT_ANNOTATION, 0))
+
+                if existing and len(existing) + len(text) > self.max_segment_bytes:
+                    # Seal the full segment and start the next one with this batch
+                    self._seal(current)
+                    self._create_segment(text, batch_min, batch_max, len(batch))
+                    return
+
+                self.core_v1.replace_namespaced_config_map(
+                    current.metadata.name, self.namespace, self._segment_body(
+                        current.metadata.name, SEGMENT_STATE_OPEN, existing + text,
+                        min(float(annotations.get(MIN_TS_ANNOTATION, batch_min)), batch_min),
+                        max(float(annotations.get(MAX_TS_ANNOTATION, batch_max)), batch_max),
+                        count + len(batch), current.metadata.resource_version))
+                return
+            except ApiException as e:
+                # 409: a concurrent writer changed the segment (or took the new name) first
+                if e.status != 409 or attempt == self.max_conflict_retries - 1:
+                    raise
+
+    def _create_segment(self, text, min_ts, max_ts, count):
+        self.core_v1.create_namespaced_config_map(self.namespace, self._segment_body(
+            self._new_segment_name(), SEGMENT_STATE_OPEN, text, min_ts, max_ts, count))
+
+    def _seal(self, cm):
+        annotations = cm.metadata.annotations or {}
+        self.core_v1.replace_namespaced_config_map(
+            cm.metadata.name, self.namespace, self._segment_body(
+                cm.metadata.name, SEGMENT_STATE_SEALED, (cm.data or {}).get('entries.jsonl', ''),
+                float(annotations.get(MIN_TS_ANNOTATION, 0)), float(annotations.get(MAX_TS_ANNOTATION, 0)),
+                int(annotations.get(COUNT_ANNOTATION, 0)), cm.metadata.resource_version))
+
+    def query(self, app=None, start=None, end=None):
+        self.flush()
+        results = []
+        for cm in self._list_segments():
+            annotations = cm.metadata.annotations or {}
+            if start is not None and float(annotations.get(MAX_TS_ANNOTATION, 'inf')) < start:
+                continue
+            if end is not None and float(annotations.get(MIN_TS_ANNOTATION, 0)) > end:
+                continue
+            for line in (cm.data or {}).get('entries.jsonl', '').splitlines():
+                if line:
+                    entry = json.loads(line)
+                    if _matches(entry, app, start, end):
+                        results.append(entry)
+        results.sort(key=lambda e: e.get('ts', 0))
+        return results
+
+    def enforce_retention(self):
+        """Delete segments past retention_seconds, open or sealed, and sealed ones beyond max_segments"""
+        from kubernetes.client.rest import ApiException
+
+        cutoff = time.time() - self.retention_seconds
+        segments = self._list_segments()
+        expired = [cm for cm in segments
+                   if float((cm.metadata.annotations or {}).get(MAX_TS_ANNOTATION, 0)) < cutoff]
+        sealed = [cm for cm in segments if cm not in expired
+                  and (cm.metadata.labels or {}).get(SEGMENT_LABEL) == SEGMENT_STATE_SEALED]
+        expired.extend(sealed[:max(len(sealed) - self.max_segments, 0)])
+        deleted = 0
+        for cm in expired:
+            try:
+                # The precondition keeps a segment a writer has just appended to
+                self.core_v1.delete_namespaced_config_map(
+                    cm.metadata.name, self.namespace,
+                    body={'preconditions': {'resourceVersion': cm.metadata.resource_version}})
+                deleted += 1
+            except ApiException as e:
+                # 404: another replica's retention got there first; 409: written since listed
+                if e.status not in (404, 409):
+                    logging.warning(f"Failed to delete audit segment {cm.metadata.name}: {e}")
+        return deleted
+
+
+def create_audit_sink(core_v1=None, namespace='argocd'):
+    """Build the configured sink: AUDIT_SINK=configmap (default in-cluster) or file"""
+    backend = os.getenv('AUDIT_SINK', 'configmap' if core_v1 is not None else 'file')
+    maintenance_interval = float(os.getenv('AUDIT_MAINTENANCE_INTERVAL', '3600'))
+    if backend == 'configmap' and core_v1 is not None:
+        return ConfigMapSegmentAuditSink(core_v1, namespace=namespace, maintenance_interval=maintenance_interval)
+    return FileSegmentAuditSink(os.getenv('AUDIT_LOG_DIR', '/var/lib/drift-audit'),
+                                maintenance_interval=maintenance_interval)
@@ -1,28 +1,59 @@
-from kubernetes import client, config, watch
+from kubernetes import client
+from kubernetes.client.rest import ApiException
 import logging
+import os
+import signal
+import socket
+import sys
 import time
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
+from informer import ApplicationInformer
+from workqueue import RateLimitingQueue, TokenBucket, WorkerPool
+from remediation_state import RemediationStateTracker
+from drift_analyzer import DriftAnalyzer, DriftReportCache
+from argocd_operations import (AWAITING_APPROVAL, OperationTracker, PendingOperation, emergency_stop_body,
+                               previous_revision_of, sync_operation_body)
+from audit_sink import create_audit_sink, make_audit_entry
+from checkpoint import PeriodicCheckpointer, create_checkpoint_store
+from remediation_policy import RemediationPolicyEngine
+from coordination import Coordinator, create_coordinator
+from kube_client import METADATA_ONLY_ACCEPT, create_api_client, get_api_client, load_kube_config, read_json
+from metrics import (REGISTRY, WATCH_EVENTS, WATCH_EVENT_LAG, QUEUE_DEPTH, QUEUE_WAIT,
+                     PATCH_LATENCY, ROLLBACK_LATENCY, REMEDIATIONS, REMEDIATIONS_SUPPRESSED, OPERATIONS_IN_FLIGHT)
 
 logging.basicConfig(level=logging.INFO)
 
+_readiness_check = None
+
+def set_readiness_check(check):
+    """Make /ready answer 503 until check() returns true"""
+    global _readiness_check
+    _readiness_check = check
+
+def health_response(path):
+    """(status, content type, body) for the health/metrics endpoints, shared by both runtimes"""
+    if path == '/health':
+        return 200, 'application/json', json.dumps({'status': 'healthy'}).encode()
+    if path == '/ready':
+        if _readiness_check is not None and not _readiness_check():
+            return 503, 'application/json', json.dumps({'status': 'starting'}).encode()
+        return 200, 'application/json', json.dumps({'status': 'ready'}).encode()
+    if path == '/metrics':
+        return 200, 'text/plain; version=0.0.4; charset=utf-8', REGISTRY.render().encode()
+    return 404, None, b''
+
 class HealthHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        if self.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({'status': 'healthy'}).encode())
-        elif self.path == '/ready':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({'status': 'ready'}).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
+        status, content_type, body = health_response(self.path)
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
 def start_health_server():
     server = HTTPServer(('0.0.0.0', 8080), HealthHandler)
@@ -32,228 +63,555 @@ def start_health_server():
     logging.info("Health server started on port 8080")
 
 class AutoRemediationController:
-    def __init__(self):
-        try:
-            config.load_incluster_config()
-            self.demo_mode = False
-        except:
-            try:
-                config.load_kube_config()
-                self.demo_mode = False
-            except:
-                logging.warning("No Kubernetes config found - running in demo mode")
-                self.demo_mode = True
-                return
+    def __init__(self, workers=4, qps=10.0, burst=50, coordinator=None,
+                 coordination_mode=None, identity=None, report_cache_size=4096,
+                 label_selector='drift-severity', metadata_only=False, checkpoint_interval=30.0,
+                 policy_path=None, policy_poll_interval=5.0, notification_handler=None,
+                 max_operations=10, operation_timeout=600.0):
+        self.coordinator = coordinator or Coordinator()
+        self.coordinator.on_ownership_change = self.resync_owned_applications
+        self.queue = RateLimitingQueue(bucket=TokenBucket(qps=qps, burst=burst),
+                                       wait_observer=QUEUE_WAIT.observe)
+        self.workers = WorkerPool(self.queue, self.process_application, workers=workers)
+        self.remediation_state = RemediationStateTracker()
+        self.analyzer = DriftAnalyzer()
+        self.report_cache = DriftReportCache(self.analyzer, max_entries=report_cache_size)
+        self._cooldown_rechecks = set()
+        self.metadata_only = metadata_only
+        self.checkpointer = None
+        self.notification_handler = notification_handler
+        self.policies = RemediationPolicyEngine(policy_path, poll_interval=policy_poll_interval)
+        self.executors = {
+            'auto_sync': self._execute_auto_sync,
+            'notify_and_timeout': self._execute_notify_and_timeout,
+            'immediate_rollback': self._execute_immediate_rollback,
+            'emergency_stop': self._execute_emergency_stop
+        }
+        self.operations = OperationTracker(max_in_flight=max_operations, timeout_seconds=operation_timeout)
+        self.operations.on_complete = self._on_operation_complete
+        self.operations.on_slot_free = self._on_operation_slot_free
+        OPERATIONS_IN_FLIGHT.set_function(lambda: len(self.operations))
+        QUEUE_DEPTH.set_function(lambda: len(self.queue))
+        if not load_kube_config():
+            logging.warning("No Kubernetes config found - running in demo mode")
+            self.demo_mode = True
+            return
+        self.demo_mode = False
         
-        self.v1 = client.CustomObjectsApi()
-        self.core_v1 = client.CoreV1Api()
+        self.api_client = get_api_client()
+        self.v1 = client.CustomObjectsApi(self.api_client)
+        self.core_v1 = client.CoreV1Api(self.api_client)
         self.argocd_namespace = "argocd"  # Fixed: ArgoCD applications are in argocd namespace
-        self.load_remediation_policies()
+        # Only labelled applications are ever transferred; in metadata-only mode the watch
+        # carries PartialObjectMetadata and full objects are fetched for queued candidates
+        watch_api = self.v1
+        self.informer_accept = METADATA_ONLY_ACCEPT if metadata_only else None
+        if metadata_only:
+            watch_api = client.CustomObjectsApi(create_api_client(accept=self.informer_accept))
+        self.informer = ApplicationInformer(watch_api, self.argocd_namespace, label_selector=label_selector)
+        self.audit_sink = create_audit_sink(self.core_v1, self.argocd_namespace)
+        self.informer.add_event_handler(self.on_application_event)
+        # Ready once the informer cache is usable, whether restored from a checkpoint or listed
+        set_readiness_check(lambda: self.informer.has_synced)
+        checkpoint_store = create_checkpoint_store(self.core_v1, self.argocd_namespace,
+                                                   identity or socket.gethostname())
+        if checkpoint_store is not None:
+            self.checkpointer = PeriodicCheckpointer(checkpoint_store, self.snapshot_state,
+                                                     self.checkpoint_token, interval=checkpoint_interval)
+        if coordinator is None and coordination_mode:
+            self.coordinator = create_coordinator(coordination_mode, identity, self.argocd_namespace,
+                                                  api_client=self.api_client)
+            self.coordinator.on_ownership_change = self.resync_owned_applications
         
     def load_remediation_policies(self):
-        self.remediation_matrix = {
-            'low': {
-                'action': 'auto_sync',
-                'approval_required': False,
-                'cooldown_minutes': 5,
-                'max_retries': 3
-            },
-            'medium': {
-                'action': 'notify_and_timeout',
-                'approval_required': True,
-                'timeout_hours': 24,
-                'max_retries': 2
-            },
-            'high': {
-                'action': 'immediate_rollback',
-                'approval_required': False,
-                'cooldown_minutes': 0,
-                'max_retries': 1
-            }
-        }
+        """Re-read the policy file now instead of waiting for the next poll"""
+        return self.policies.reload(force=True)
 
     def handle_drift(self, app):
+        plan = self.plan_remediation(app)
+        if plan is None:
+            return None
+        
+        remediation, severity, fingerprint = plan
+        app_name = app['metadata']['name']
+        started = time.monotonic()
+        result = self.executors[remediation['action']](app, severity)
+        if result is None:
+            # Deferred by the operation tracker: nothing was submitted, nothing to record
+            return None
+        
+        self.record_remediation(app_name, remediation, fingerprint, result)
+        # A submitted operation is reported once the informer sees it finish; an approval
+        # request is itself the notification
+        if not isinstance(result, PendingOperation) and result is not AWAITING_APPROVAL:
+            self.notify_remediation(app_name, remediation, 'failed' if result is False else 'success',
+                                    duration=round(time.monotonic() - started, 3))
+        return result
+
+    def plan_remediation(self, app):
+        """Decide whether and how to remediate; returns (remediation, severity, fingerprint) or None.
+
+        Shared by the threaded and asyncio runtimes, which differ only in how the
+        chosen action is executed.
+        """
         app_name = app['metadata']['name']
         
         # Fixed: Only handle applications with drift-severity label
         labels = app['metadata'].get('labels', {})
         if 'drift-severity' not in labels:
-            return
+            return None
             
-        severity = labels.get('drift-severity', 'low')
+        # Identical content to an earlier event reuses its report instead of re-analyzing
+        report, fingerprint, cached = self.report_cache.get(app)
+        severity = report['severity']
         
         logging.info(f"🎯 Detected drift in {app_name} with severity: {severity}")
         
-        remediation = self.remediation_matrix.get(severity, self.remediation_matrix['low'])
+        # Compiled table: unknown severities already resolve to the default policy
+        remediation = self.policies.resolve(severity)
+        
+        allowed, reason, retry_after = self.remediation_state.check(app_name, remediation)
+        if not allowed:
+            REMEDIATIONS_SUPPRESSED.labels(reason).inc()
+            if reason == 'cooldown':
+                logging.info(f"⏸️  Skipping {app_name}: in cooldown for another {int(retry_after)}s")
+            else:
+                logging.warning(f"🛑 Skipping {app_name}: max_retries ({remediation.get('max_retries')}) "
+                                f"exhausted, next retry in {int(retry_after)}s")
+            # Re-check once the cooldown expires or a retry frees up, in case the app is still drifted
+            self._cooldown_rechecks.add(app_name)
+            self.queue.add_after(app_name, retry_after)
+            return None
         
-        if remediation['action'] == 'auto_sync':
-            self._execute_auto_sync(app_name, severity)
-        elif remediation['action'] == 'notify_and_timeout':
-            self._execute_notify_and_timeout(app_name, severity)
-        elif remediation['action'] == 'immediate_rollback':
-            self._execute_immediate_rollback(app_name, severity)
-
-    def _execute_auto_sync(self, app_name, severity):
+        # Unchanged drift that was already remediated is not re-triggered by further
+        # watch events; only the scheduled post-cooldown re-check retries it
+        recheck = app_name in self._cooldown_rechecks
+        self._cooldown_rechecks.discard(app_name)
+        if cached and not recheck and self.report_cache.is_remediated(fingerprint):
+            logging.debug(f"Skipping {app_name}: drift unchanged since last remediation")
+            return None
+        
+        return remediation, severity, fingerprint
+
+    def record_remediation(self, app_name, remediation, fingerprint, result):
+        """Record the outcome of an executed remediation (result False means failed).
+
+        A submitted operation counts as an attempt now, but its outcome is only
+        known once ArgoCD finishes it (see record_operation_outcome()).
+        """
+        pending = isinstance(result, PendingOperation)
+        self.remediation_state.record(app_name, remediation['action'], None if pending else result is not False)
+        if result is not False:
+            self.report_cache.mark_remediated(fingerprint)
+        if pending:
+            return
+        if result is False:
+            outcome = 'failed'
+        elif result is AWAITING_APPROVAL:
+            outcome = AWAITING_APPROVAL
+        else:
+            outcome = 'success'
+        REMEDIATIONS.labels(remediation['action'], outcome).inc()
+
+    def notify_remediation(self, app_name, remediation, status, duration=None):
+        """Notify the policy's channels; policies with notify_oncall page instead"""
+        if self.notification_handler is None or not remediation['notification_channels']:
+            return
+        if remediation['notify_oncall']:
+            self.notification_handler.send_critical_alert(
+                app_name, f"{remediation['action']} {status} for {remediation['severity']} drift",
+                details={'action': remediation['action'], 'status': status, 'duration': duration})
+        else:
+            self.notification_handler.send_remediation_complete(
+                app_name, remediation['action'], status, duration=duration,
+                channels=remediation['notification_channels'])
+
+    def record_operation_outcome(self, pending, phase):
+        """Record how a submitted sync or rollback ended; returns (remediation, status).
+
+        Only a Succeeded operation starts the cooldown. Otherwise the drift is
+        no longer considered remediated and the application is re-queued with
+        backoff, within its max_retries.
+        """
+        app_name = pending.app_name
+        remediation = self.policies.resolve(pending.severity)
+        succeeded = phase == 'Succeeded'
+        self.remediation_state.complete(app_name, succeeded)
+        REMEDIATIONS.labels(remediation['action'], 'success' if succeeded else 'failed').inc()
+        if succeeded:
+            self.queue.forget(app_name)
+        elif phase != 'Deleted':
+            logging.warning(f"⚠️  {pending.operation} of {app_name} ended {phase}; re-queueing")
+            self.report_cache.invalidate(app_name)
+            if self.coordinator.owns(app_name):
+                self.queue.add_rate_limited(app_name)
+        return remediation, 'success' if succeeded else phase.lower()
+
+    def _on_operation_complete(self, pending, phase, duration):
+        """OperationTracker callback - record and report how the submitted sync or rollback ended"""
+        remediation, status = self.record_operation_outcome(pending, phase)
+        self.notify_remediation(pending.app_name, remediation, status, duration=round(duration, 3))
+
+    def _on_operation_slot_free(self, app_name):
+        """OperationTracker callback - retry an application turned away at the in-flight limit"""
+        if self.coordinator.owns(app_name):
+            self.queue.add(app_name)
+
+    def _submit_operation(self, app, operation, body, severity):
+        """PATCH an ArgoCD operation onto app; returns the PendingOperation, or None when it must wait"""
+        pending = self.operations.begin(app, operation, severity)
+        if pending is None:
+            return None
+        try:
+            with PATCH_LATENCY.labels(operation).time():
+                self.v1.patch_namespaced_custom_object(
+                    group="argoproj.io",
+                    version="v1alpha1",
+                    namespace=self.argocd_namespace,  # Fixed: Use argocd namespace
+                    plural="applications",
+                    name=pending.app_name,
+                    body=body
+                )
+        except Exception:
+            self.operations.abort(pending)
+            raise
+        return pending
+
+    def _execute_auto_sync(self, app, severity):
+        app_name = app['metadata']['name']
         try:
             if self.demo_mode:
                 logging.info(f"DEMO: Would auto-sync {app_name}")
-                return
+                return True
                 
             # Fixed: Trigger sync operation instead of patching syncPolicy
-            sync_operation = {
-                "operation": {
-                    "sync": {
-                        "syncStrategy": {
-                            "apply": {
-                                "force": True
-                            }
-                        },
-                        "prune": True
-                    }
-                }
-            }
-            
-            self.v1.patch_namespaced_custom_object(
-                group="argoproj.io",
-                version="v1alpha1",
-                namespace=self.argocd_namespace,  # Fixed: Use argocd namespace
-                plural="applications",
-                name=app_name,
-                body=sync_operation
-            )
-            
-            logging.info(f"✅ Successfully triggered sync operation for {app_name}")
+            pending = self._submit_operation(app, 'sync', sync_operation_body(), severity)
+            if pending is not None:
+                logging.info(f"✅ Successfully triggered sync operation for {app_name}")
+            return pending
             
         except Exception as e:
             logging.error(f"❌ Failed to auto-sync {app_name}: {e}")
+            return False
 
-    def _execute_notify_and_timeout(self, app_name, severity):
-        logging.info(f"📧 Notification sent for {app_name} - awaiting approval")
-        logging.info(f"⏳ Timeout: 24 hours for manual intervention")
+    def approval_request(self, app_name, severity):
+        """(message, channels) asking for manual approval of a notify_and_timeout remediation"""
+        remediation = self.policies.resolve(severity)
+        message = f"{severity.capitalize()} drift detected - manual approval required to sync"
+        if remediation.get('timeout_hours'):
+            message += f" within {remediation['timeout_hours']}h"
+        if remediation.get('escalation_hours'):
+            message += f", escalating after {remediation['escalation_hours']}h"
+        return message, remediation['notification_channels']
 
-    def _execute_immediate_rollback(self, app_name, severity):
+    def _execute_notify_and_timeout(self, app, severity):
+        app_name = app['metadata']['name']
+        message, channels = self.approval_request(app_name, severity)
+        if self.notification_handler is not None and channels:
+            self.notification_handler.send_notification(app_name, message, severity, channels=channels)
+        logging.info(f"📧 Approval requested for {app_name} via {', '.join(channels) or 'no channels'}: {message}")
+        return AWAITING_APPROVAL
+
+    def _execute_immediate_rollback(self, app, severity):
+        with ROLLBACK_LATENCY.time():
+            return self._rollback_to_previous_revision(app, severity)
+
+    def _rollback_to_previous_revision(self, app, severity):
+        app_name = app['metadata']['name']
         try:
             logging.info(f"🚨 Executing immediate rollback for {app_name}")
             
             if self.demo_mode:
                 logging.info(f"DEMO: Would rollback {app_name} to previous revision")
-                return
+                return True
                 
-            # Get application history to find last successful revision
-            app = self.v1.get_namespaced_custom_object(
-                group="argoproj.io",
-                version="v1alpha1",
-                namespace=self.argocd_namespace,
-                plural="applications",
-                name=app_name
-            )
-            
-            # Find previous successful revision
-            history = app.get('status', {}).get('history', [])
-            if len(history) < 2:
+            # Find previous successful revision in the application history
+            previous_revision = previous_revision_of(app)
+            if previous_revision is None:
                 logging.error(f"No previous revision to rollback to for {app_name}")
-                return
-                
-            previous_revision = history[-2]['revision']
+                return False
             
             # Trigger rollback to previous revision
-            rollback_operation = {
-                "operation": {
-                    "sync": {
-                        "revision": previous_revision,
-                        "syncStrategy": {
-                            "apply": {
-                                "force": True
-                            }
-                        },
-                        "prune": True
-                    }
-                }
-            }
-            
-            self.v1.patch_namespaced_custom_object(
-                group="argoproj.io",
-                version="v1alpha1",
-                namespace=self.argocd_namespace,
-                plural="applications",
-                name=app_name,
-                body=rollback_operation
-            )
+            pending = self._submit_operation(app, 'rollback', sync_operation_body(previous_revision), severity)
+            if pending is None:
+                return None
             
-            logging.info(f"✅ Emergency rollback completed for {app_name} to revision {previous_revision}")
+            logging.info(f"✅ Emergency rollback triggered for {app_name} to revision {previous_revision}")
             
             # Create emergency alert
             self._create_emergency_alert(app_name, severity, f"Rolled back to {previous_revision}")
+            return pending
             
         except Exception as e:
             logging.error(f"❌ Emergency rollback failed for {app_name}: {e}")
+            return False
 
-    def _create_emergency_alert(self, app_name, severity, details):
-        """Create emergency alert ConfigMap"""
+    def _execute_emergency_stop(self, app, severity):
+        """Freeze the application: turn off automated sync so nothing more is applied"""
+        app_name = app['metadata']['name']
         try:
-            alert_cm = {
-                'metadata': {
-                    'name': f'emergency-alert-{app_name}-{int(time.time())}',
-                    'namespace': self.argocd_namespace,
-                    'labels': {
-                        'alert-type': 'emergency-rollback',
-                        'severity': severity,
-                        'app': app_name
-                    }
-                },
-                'data': {
-                    'alert': f'Emergency rollback executed for {app_name}',
-                    'details': details,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }
+            logging.critical(f"🛑 Emergency stop for {app_name}: disabling automated sync")
             
-            self.core_v1.create_namespaced_config_map(
-                namespace=self.argocd_namespace,
-                body=alert_cm
-            )
+            if self.demo_mode:
+                logging.info(f"DEMO: Would disable automated sync for {app_name}")
+                return True
             
-            logging.info(f"🚨 Emergency alert created for {app_name}")
+            with PATCH_LATENCY.labels('emergency_stop').time():
+                self.v1.patch_namespaced_custom_object(
+                    group="argoproj.io",
+                    version="v1alpha1",
+                    namespace=self.argocd_namespace,
+                    plural="applications",
+                    name=app_name,
+                    body=emergency_stop_body()
+                )
+            
+            self._create_emergency_alert(app_name, severity, "Automated sync disabled",
+                                         event_type='emergency-stop')
+            return True
             
         except Exception as e:
-            logging.error(f"❌ Failed to create emergency alert: {e}")
+            logging.error(f"❌ Emergency stop failed for {app_name}: {e}")
+            return False
 
-    def watch_applications(self):
+    def _create_emergency_alert(self, app_name, severity, details, event_type='emergency-rollback'):
+        """Record emergency alert in the batched audit log"""
+        try:
+            self.audit_sink.write(make_audit_entry(
+                app_name, event_type, severity,
+                alert=f"{event_type.replace('-', ' ').capitalize()} executed for {app_name}",
+                details=details
+            ))
+            
+            logging.info(f"🚨 Emergency alert recorded for {app_name}")
+            
+        except Exception as e:
+            logging.error(f"❌ Failed to record emergency alert: {e}")
+
+    def get_application(self, app_name):
+        """Full Application object: from the informer cache, or the apiserver in metadata-only mode"""
+        if not self.metadata_only:
+            app = self.informer.get(app_name)
+            if app is not None:
+                return app
+        try:
+            return read_json(
+                self.v1.get_namespaced_custom_object,
+                group="argoproj.io",
+                version="v1alpha1",
+                namespace=self.argocd_namespace,
+                plural="applications",
+                name=app_name
+            )
+        except ApiException as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def _observe_sync_status(self, app_name, sync_status):
+        """Drift-trend and remediation bookkeeping for a sync status transition"""
+        # Every replica keeps the full drift history so a rebalance does not lose it
+        if sync_status == 'OutOfSync':
+            self.analyzer.trends.record_drift(app_name)
+        elif sync_status == 'Synced':
+            self.analyzer.trends.record_resolved(app_name)
+            # Remediation state is kept: an app that drifts again right after a sync is
+            # still in cooldown and spends its retries (they age out of the attempt window)
+            self.report_cache.invalidate(app_name)
+
+    def on_application_event(self, event_type, app):
+        """Informer callback - enqueue applications that are OutOfSync"""
+        app_name = app['metadata']['name']
+        WATCH_EVENTS.labels(event_type).inc()
+        reconciled_at = app.get('status', {}).get('reconciledAt')
+        if reconciled_at:
+            try:
+                lag = time.time() - datetime.fromisoformat(reconciled_at.replace('Z', '+00:00')).timestamp()
+                WATCH_EVENT_LAG.observe(max(lag, 0))
+            except ValueError:
+                pass
+        if event_type == 'DELETED':
+            self.operations.forget(app_name)
+            self.remediation_state.reset(app_name)
+            self.report_cache.invalidate(app_name)
+            self.analyzer.forget_application(app_name)
+            self.analyzer.trends.forget(app_name)
+            return
+        if self.metadata_only:
+            # No status in PartialObjectMetadata: every changed application is a candidate
+            # and the worker fetches it (queued keys coalesce bursts of events)
+            if self.coordinator.owns(app_name):
+                self.queue.add(app_name)
+            return
+        sync_status = app.get('status', {}).get('sync', {}).get('status')
+        self._observe_sync_status(app_name, sync_status)
+        self.operations.observe(app)
+        if not self.coordinator.owns(app_name):
+            return
+        if sync_status == 'OutOfSync':
+            self.queue.add(app_name)
+
+    def process_application(self, app_name):
+        """Worker callback - handle drift for the latest cached state of an application"""
+        # Ownership may have moved to another replica while the key was queued
+        if not self.coordinator.owns(app_name):
+            return True
+        app = self.get_application(app_name)
+        if app is None:
+            return True
+        sync_status = app.get('status', {}).get('sync', {}).get('status')
+        if self.metadata_only:
+            self._observe_sync_status(app_name, sync_status)
+            self.operations.observe(app)
+        if sync_status != 'OutOfSync':
+            return True
+        return self.handle_drift(app)
+
+    def resync_owned_applications(self):
+        """Enqueue every drifted application this replica now owns (after a leader change or rebalance)"""
         if self.demo_mode:
-            logging.info("Running in demo mode - simulating drift scenarios")
             return
+        for app in self.informer.list():
+            app_name = app['metadata']['name']
+            if not self.coordinator.owns(app_name):
+                continue
+            # Metadata-only objects carry no status; the worker checks it after fetching
+            if self.metadata_only or app.get('status', {}).get('sync', {}).get('status') == 'OutOfSync':
+                self.queue.add(app_name)
+
+    def checkpoint_token(self):
+        """Changes whenever there is something new to checkpoint"""
+        return self.informer.resource_version, self.remediation_state.version
+
+    def snapshot_state(self, include_store=True):
+        """State needed to resume without repeating remediations (see restore_checkpoint)"""
+        snapshot = {
+            'namespace': self.argocd_namespace,
+            'label_selector': self.informer.label_selector,
+            'metadata_only': self.metadata_only,
+            'remediation': self.remediation_state.snapshot(),
+            'remediated_fingerprints': self.report_cache.remediated_fingerprints(),
+            'trends': self.analyzer.trends.snapshot()
+        }
+        if include_store:
+            resource_version, items = self.informer.snapshot()
+            snapshot['informer'] = {'resource_version': resource_version, 'items': items}
+        return snapshot
+
+    def restore_checkpoint(self):
+        """Load the last checkpoint before the informer starts; returns whether one was used.
+
+        Cooldowns, retry counts and drift trends carry over. When the informer
+        cache is in the checkpoint and was listed with the same selector and
+        object shape, the watch resumes from its resourceVersion instead of
+        re-listing, drift already remediated is not remediated again, and every
+        owned OutOfSync application is enqueued for a fresh check.
+        """
+        if self.checkpointer is None:
+            return False
+        started = time.monotonic()
+        snapshot = self.checkpointer.store.load()
+        if snapshot is None:
+            return False
+        if snapshot.get('namespace') != self.argocd_namespace:
+            logging.warning(f"Ignoring checkpoint taken for namespace {snapshot.get('namespace')}")
+            return False
         
-        # Fixed: Added error handling and retry logic
-        retry_count = 0
-        max_retries = 5
+        self.remediation_state.restore(snapshot.get('remediation', {}))
+        self.analyzer.trends.restore(snapshot.get('trends', {}))
+        cached = snapshot.get('informer')
+        if cached and snapshot.get('label_selector') == self.informer.label_selector \
+                and snapshot.get('metadata_only') == self.metadata_only:
+            self.informer.restore(cached['resource_version'], cached['items'])
+            if not self.metadata_only:
+                for app_name, fingerprint in snapshot.get('remediated_fingerprints', {}).items():
+                    app = self.informer.get(app_name)
+                    if app is not None and self.report_cache.get(app)[1] == fingerprint:
+                        self.report_cache.mark_remediated(fingerprint)
+            # The seeded store notifies no handlers, and queued keys and add_after rechecks
+            # died with the previous process: re-check every drifted application we own
+            self.resync_owned_applications()
         
-        while retry_count < max_retries:
-            try:
-                logging.info(f"👀 Watching ArgoCD applications in namespace: {self.argocd_namespace}")
-                w = watch.Watch()
-                for event in w.stream(
-                    self.v1.list_namespaced_custom_object,  # Fixed: Use namespaced instead of cluster
-                    group="argoproj.io",
-                    version="v1alpha1",
-                    namespace=self.argocd_namespace,  # Fixed: Watch argocd namespace
-                    plural="applications",
-                    timeout_seconds=300  # Fixed: Added timeout
-                ):
-                    app = event['object']
-                    if app.get('status', {}).get('sync', {}).get('status') == 'OutOfSync':
-                        self.handle_drift(app)
-                        
-            except Exception as e:
-                retry_count += 1
-                logging.error(f"Watch error (attempt {retry_count}/{max_retries}): {e}")
-                if retry_count < max_retries:
-                    time.sleep(min(2 ** retry_count, 60))  # Exponential backoff
-                else:
-                    logging.error("Max retries reached, exiting")
-                    break
+        logging.info(f"💾 Restored checkpoint saved {time.time() - snapshot.get('saved_at', 0):.0f}s ago "
+                     f"in {time.monotonic() - started:.2f}s: {len(self.informer)} cached applications, "
+                     f"{len(self.remediation_state)} remediation states"
+                     + (f", resuming watch at resourceVersion {self.informer.resource_version}"
+                        if self.informer.has_synced else ''))
+        return True
+
+    def watch_applications(self):
+        if self.demo_mode:
+            logging.info("Running in demo mode - simulating drift scenarios")
+            return
+
+        # Single LIST, then WATCH resumed from the last resourceVersion; re-list only on 410 Gone
+        logging.info(f"👀 Watching ArgoCD applications in namespace: {self.argocd_namespace}")
+        self.restore_checkpoint()
+        self.policies.start()
+        self.coordinator.start()
+        self.workers.start()
+        if self.checkpointer is not None:
+            self.checkpointer.start()
+        try:
+            self.informer.run()
+        finally:
+            self.policies.stop()
+            self.workers.stop()
+            self.coordinator.stop()
+            if self.checkpointer is not None:
+                self.checkpointer.stop()
+            self.audit_sink.close()
+
+def notification_coalesce_window():
+    """Seconds to fold non-critical notifications into one digest; 0 sends each one immediately"""
+    return float(os.getenv('NOTIFICATION_COALESCE_WINDOW_SECONDS', '0')) or None
+
+def run_async_runtime(controller):
+    """Run the controller on one asyncio event loop (CONTROLLER_RUNTIME=asyncio)"""
+    import asyncio
+    from async_runtime import AsyncControllerRuntime, AsyncKubeClient, AsyncNotifier
+    from notification_handler import NotificationHandler
+
+    kube = AsyncKubeClient(qps=float(os.getenv('KUBE_CLIENT_QPS', '50')),
+                           burst=int(os.getenv('KUBE_CLIENT_BURST', '100')),
+                           max_connections=int(os.getenv('KUBE_CLIENT_POOL_SIZE', '100')))
+    notifier = None
+    if os.getenv('REMEDIATION_NOTIFICATIONS', 'false').lower() == 'true':
+        notifier = AsyncNotifier(NotificationHandler(async_delivery=False,
+                                                     coalesce_window_seconds=notification_coalesce_window()))
+    runtime = AsyncControllerRuntime(controller, kube, health_response, notifier=notifier,
+                                     concurrency=int(os.getenv('ASYNC_CONCURRENCY', '1000')))
+    asyncio.run(runtime.run())
 
 if __name__ == '__main__':
-    start_health_server()
-    controller = AutoRemediationController()
+    from notification_handler import NotificationHandler
+
+    runtime_name = os.getenv('CONTROLLER_RUNTIME', 'threaded')
+    # The asyncio runtime sends through its own AsyncNotifier
+    send_notifications = os.getenv('REMEDIATION_NOTIFICATIONS', 'false').lower() == 'true' \
+        and runtime_name != 'asyncio'
+    controller = AutoRemediationController(
+        workers=int(os.getenv('REMEDIATION_WORKERS', '4')),
+        qps=float(os.getenv('REMEDIATION_QPS', '10')),
+        burst=int(os.getenv('REMEDIATION_BURST', '50')),
+        coordination_mode=os.getenv('COORDINATION_MODE', 'none'),
+        identity=os.getenv('POD_NAME', socket.gethostname()),
+        report_cache_size=int(os.getenv('REPORT_CACHE_SIZE', '4096')),
+        label_selector=os.getenv('WATCH_LABEL_SELECTOR', 'drift-severity') or None,
+        metadata_only=os.getenv('WATCH_METADATA_ONLY', 'false').lower() == 'true',
+        checkpoint_interval=float(os.getenv('CHECKPOINT_INTERVAL', '30')),
+        policy_path=os.getenv('REMEDIATION_POLICIES_PATH') or None,
+        policy_poll_interval=float(os.getenv('POLICY_POLL_INTERVAL', '5')),
+        notification_handler=NotificationHandler(coalesce_window_seconds=notification_coalesce_window())
+        if send_notifications else None,
+        max_operations=int(os.getenv('MAX_IN_FLIGHT_OPERATIONS', '10')),
+        operation_timeout=float(os.getenv('OPERATION_TIMEOUT_SECONDS', '600'))
+    )
+    # Exit through the shutdown path so the final checkpoint and audit flush run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     logging.info("🚀 Starting ArgoCD Advanced Drift Detection and Auto-Remediation Controller")
-    controller.watch_applications()
+    if runtime_name == 'asyncio' and not controller.demo_mode:
+        run_async_runtime(controller)
+    else:
+        start_health_server()
+        controller.watch_applications()
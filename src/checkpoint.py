@@ -0,0 +1,228 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+from metrics import CHECKPOINT_BYTES, CHECKPOINT_SAVE_DURATION
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_KEY_SUFFIX = '.json.z'
+
+
+def encode_checkpoint(snapshot):
+    """Compact on-disk form: zlib-compressed JSON"""
+    snapshot = dict(snapshot, version=CHECKPOINT_VERSION, saved_at=time.time())
+    return zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode(), 6)
+
+
+def decode_checkpoint(blob):
+    snapshot = json.loads(zlib.decompress(blob))
+    if snapshot.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported checkpoint version {snapshot.get('version')}")
+    return snapshot
+
+
+class CheckpointStore:
+    """Where controller snapshots are kept. Subclasses implement _write() and _read().
+
+    include_store says whether the informer cache belongs in the snapshot;
+    backends with tight size limits keep only the remediation bookkeeping.
+    """
+
+    include_store = True
+
+    def save(self, snapshot):
+        blob = encode_checkpoint(snapshot)
+        self._write(blob)
+        return len(blob)
+
+    def load(self):
+        """Return the last saved snapshot, or None when there is none or it is unreadable"""
+        try:
+            blob = self._read()
+            return decode_checkpoint(blob) if blob else None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable checkpoint: {e}")
+            return None
+
+    def _write(self, blob):
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Single file replaced atomically (write to a temp file, fsync, rename)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _write(self, blob):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class ConfigMapCheckpointStore(CheckpointStore):
+    """One ConfigMap shared by all replicas, one binaryData key per replica identity.
+
+    ConfigMaps are capped at 1 MiB, so the informer cache is left out (the
+    informer re-lists on start). load() merges the remediation state of every
+    replica's key, which keeps it across shard rebalances and pod renames; keys
+    not rewritten within max_age_seconds are pruned.
+    """
+
+    include_store = False
+
+    def __init__(self, core_v1, namespace, identity, name='argo-drift-controller-checkpoint',
+                 max_age_seconds=24 * 3600, max_conflict_retries=5):
+        self.core_v1 = core_v1
+        self.namespace = namespace
+        self.key = f'{identity}{CHECKPOINT_KEY_SUFFIX}'
+        self.name = name
+        self.max_age_seconds = max_age_seconds
+        self.max_conflict_retries = max_conflict_retries
+
+    def _write(self, blob):
+        from kubernetes.client.rest import ApiException
+
+        encoded = base64.b64encode(blob).decode()
+        for attempt in range(self.max_conflict_retries):
+            try:
+                try:
+                    current = self.core_v1.read_namespaced_config_map(self.name, self.namespace)
+                except ApiException as e:
+                    if e.status != 404:
+                        raise
+                    self.core_v1.create_namespaced_config_map(self.namespace, {
+                        'metadata': {'name': self.name, 'namespace': self.namespace},
+                        'binaryData': {self.key: encoded}
+                    })
+                    return
+                binary_data = dict(current.binary_data or {})
+                binary_data[self.key] = encoded
+                self.core_v1.replace_namespaced_config_map(self.name, self.namespace, {
+                    'metadata': {'name': self.name, 'namespace': self.namespace,
+                                 'resourceVersion': current.metadata.resource_version},
+                    'binaryData': self._prune(binary_data)
+                })
+                return
+            except ApiException as e:
+                if e.status != 409 or attempt == self.max_conflict_retries - 1:
+                    raise
+
+    def _prune(self, binary_data):
+        cutoff = time.time() - self.max_age_seconds
+        kept = {}
+        for key, encoded in binary_data.items():
+            if key != self.key:
+                try:
+                    if decode_checkpoint(base64.b64decode(encoded)).get('saved_at', 0) < cutoff:
+                        continue
+                except Exception:
+                    continue
+            kept[key] = encoded
+        return kept
+
+    def load(self):
+        from kubernetes.client.rest import ApiException
+
+        try:
+            current = self.core_v1.read_namespaced_config_map(self.name, self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                logging.warning(f"Ignoring unreadable checkpoint ConfigMap {self.name}: {e}")
+            return None
+        merged = None
+        # Own key last so its values win over older copies from peers
+        entries = sorted((current.binary_data or {}).items(), key=lambda item: item[0] == self.key)
+        for key, encoded in entries:
+            try:
+                snapshot = decode_checkpoint(base64.b64decode(encoded))
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable checkpoint key {key}: {e}")
+                continue
+            if merged is None:
+                merged = snapshot
+                continue
+            for section in ('remediation', 'remediated_fingerprints', 'trends'):
+                merged.setdefault(section, {}).update(snapshot.get(section, {}))
+        return merged
+
+
+class PeriodicCheckpointer:
+    """Saves snapshot_func(include_store) every interval seconds while token_func() keeps changing.
+
+    stop() writes a final snapshot so a graceful shutdown loses nothing.
+    """
+
+    def __init__(self, store, snapshot_func, token_func, interval=30.0):
+        self.store = store
+        self.snapshot_func = snapshot_func
+        self.token_func = token_func
+        self.interval = interval
+        self.saves = 0
+        self._last_token = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def save(self, force=False):
+        """Write a snapshot unless nothing changed since the last one; returns bytes written"""
+        with self._lock:
+            token = self.token_func()
+            if not force and token == self._last_token:
+                return 0
+            started = time.perf_counter()
+            try:
+                size = self.store.save(self.snapshot_func(self.store.include_store))
+            except Exception as e:
+                logging.error(f"❌ Failed to save checkpoint: {e}")
+                return 0
+            elapsed = time.perf_counter() - started
+            CHECKPOINT_SAVE_DURATION.observe(elapsed)
+            CHECKPOINT_BYTES.set(size)
+            self._last_token = token
+            self.saves += 1
+            logging.debug(f"💾 Checkpoint saved: {size} bytes in {elapsed * 1000:.0f}ms")
+            return size
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='checkpointer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self.save()
+
+
+def create_checkpoint_store(core_v1=None, namespace='argocd', identity='controller'):
+    """Build the configured store: CHECKPOINT_BACKEND=file (default), configmap or none"""
+    backend = os.getenv('CHECKPOINT_BACKEND', 'file')
+    if backend == 'none':
+        return None
+    if backend == 'configmap' and core_v1 is not None:
+        return ConfigMapCheckpointStore(core_v1, namespace, identity)
+    return FileCheckpointStore(os.getenv('CHECKPOINT_PATH', '/var/lib/drift-controller/checkpoint.json.z'))
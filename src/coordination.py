@@ -0,0 +1,348 @@
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+MEMBERSHIP_LABEL = 'drift-controller/membership'
+
+
+class FakeCoordinationBackend:
+    """In-memory lease store with the same API as LeaseCoordinationBackend (for tests/demo)"""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name, identity, duration_seconds, labels=None):
+        with self._lock:
+            now = self.clock()
+            lease = self._leases.get(name)
+            if lease and lease['holder'] not in (None, identity) and \
+                    now <= lease['renew_time'] + lease['duration']:
+                return False
+            self._leases[name] = {'holder': identity, 'renew_time': now,
+                                  'duration': duration_seconds, 'labels': dict(labels or {})}
+            return True
+
+    def release(self, name, identity):
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease and lease['holder'] == identity:
+                del self._leases[name]
+
+    def live_holders(self, label, value):
+        with self._lock:
+            now = self.clock()
+            return sorted(lease['holder'] for lease in self._leases.values()
+                          if lease['labels'].get(label) == value and lease['holder']
+                          and now <= lease['renew_time'] + lease['duration'])
+
+
+class LeaseCoordinationBackend:
+    """coordination.k8s.io/v1 Lease objects with optimistic concurrency"""
+
+    def __init__(self, coordination_v1, namespace='argocd'):
+        self.api = coordination_v1
+        self.namespace = namespace
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def _format_time(value):
+        return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+    @staticmethod
+    def _expired(lease, now):
+        spec = lease.spec
+        if not spec.holder_identity or spec.renew_time is None:
+            return True
+        renew = spec.renew_time
+        if renew.tzinfo is None:
+            renew = renew.replace(tzinfo=timezone.utc)
+        return (now - renew).total_seconds() > (spec.lease_duration_seconds or 0)
+
+    def acquire(self, name, identity, duration_seconds, labels=None):
+        from kubernetes.client.rest import ApiException
+
+        now = self._now()
+        try:
+            lease = self.api.read_namespaced_lease(name, self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            body = {
+                'metadata': {'name': name, 'namespace': self.namespace, 'labels': labels or {}},
+                'spec': {
+                    'holderIdentity': identity,
+                    'leaseDurationSeconds': int(duration_seconds),
+                    'acquireTime': self._format_time(now),
+                    'renewTime': self._format_time(now),
+                    'leaseTransitions': 0
+                }
+            }
+            try:
+                self.api.create_namespaced_lease(self.namespace, body)
+                return True
+            except ApiException as create_error:
+                if create_error.status == 409:
+                    return False
+                raise
+
+        holder = lease.spec.holder_identity
+        if holder != identity and not self._expired(lease, now):
+            return False
+
+        transitions = lease.spec.lease_transitions or 0
+        body = {
+            'metadata': {
+                'name': name,
+                'namespace': self.namespace,
+                'labels': labels or lease.metadata.labels or {},
+                'resourceVersion': lease.metadata.resource_version
+            },
+            'spec': {
+                'holderIdentity': identity,
+                'leaseDurationSeconds': int(duration_seconds),
+                'acquireTime': self._format_time(now) if holder != identity else
+                self._format_time(lease.spec.acquire_time or now),
+                'renewTime': self._format_time(now),
+                'leaseTransitions': transitions + (1 if holder != identity else 0)
+            }
+        }
+        try:
+            self.api.replace_namespaced_lease(name, self.namespace, body)
+            return True
+        except ApiException as e:
+            if e.status == 409:
+                return False
+            raise
+
+    def release(self, name, identity):
+        from kubernetes.client.rest import ApiException
+
+        try:
+            lease = self.api.read_namespaced_lease(name, self.namespace)
+            if lease.spec.holder_identity == identity:
+                self.api.delete_namespaced_lease(name, self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                logging.warning(f"Failed to release lease {name}: {e}")
+
+    def live_holders(self, label, value):
+        now = self._now()
+        leases = self.api.list_namespaced_lease(self.namespace, label_selector=f'{label}={value}').items
+        return sorted(lease.spec.holder_identity for lease in leases if not self._expired(lease, now))
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes; stable across processes (md5, not hash())"""
+
+    def __init__(self, members=(), vnodes=64):
+        self.vnodes = vnodes
+        self.members = tuple(sorted(members))
+        self._hashes = []
+        self._owners = []
+        points = sorted((self._hash(f'{member}#{i}'), member)
+                        for member in self.members for i in range(vnodes))
+        for point, member in points:
+            self._hashes.append(point)
+            self._owners.append(member)
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def owner(self, key):
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class Coordinator:
+    """Single-replica default: this process owns every application"""
+
+    def __init__(self):
+        self.on_ownership_change = None
+
+    def owns(self, app_name):
+        return True
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def _notify_ownership_change(self):
+        if self.on_ownership_change is not None:
+            try:
+                self.on_ownership_change()
+            except Exception as e:
+                logging.error(f"Ownership change handler failed: {e}")
+
+
+class LeaderElectionCoordinator(Coordinator):
+    """Lease-based leader election; only the current leader owns applications"""
+
+    def __init__(self, backend, identity, lease_name='argo-drift-controller-leader',
+                 lease_duration=15, renew_period=5):
+        super().__init__()
+        self.backend = backend
+        self.identity = identity
+        self.lease_name = lease_name
+        self.lease_duration = lease_duration
+        self.renew_period = renew_period
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def owns(self, app_name):
+        return self.is_leader
+
+    def tick(self):
+        """One acquire/renew round; returns whether this replica leads"""
+        try:
+            leading = self.backend.acquire(self.lease_name, self.identity, self.lease_duration)
+        except Exception as e:
+            logging.error(f"Leader election error: {e}")
+            leading = False
+        if leading != self.is_leader:
+            self.is_leader = leading
+            logging.info(f"👑 {self.identity} {'acquired' if leading else 'lost'} leadership")
+            self._notify_ownership_change()
+        return leading
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='leader-election')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.renew_period)
+
+    def stop(self):
+        self._stop.set()
+        if self.is_leader:
+            self.backend.release(self.lease_name, self.identity)
+            self.is_leader = False
+
+
+class ShardedCoordinator(Coordinator):
+    """Every replica keeps a membership Lease; applications are split over live
+    members with a consistent-hash ring that is rebuilt when membership changes.
+
+    A replica whose own lease could not be renewed owns nothing, so a partitioned
+    replica stops acting before its peers take over its slice.
+
+    Replicas see a membership change on their own ticks, up to renew_period
+    apart, so ownership is handed over asymmetrically: applications moving
+    away are dropped at once, while applications moving in are only taken
+    once handoff_grace seconds (default renew_period) have passed since the
+    change was seen. By then the previous owner has rebuilt its ring too.
+    """
+
+    def __init__(self, backend, identity, group='argo-drift-controller',
+                 lease_duration=15, renew_period=5, vnodes=64, handoff_grace=None,
+                 clock=time.monotonic):
+        super().__init__()
+        self.backend = backend
+        self.identity = identity
+        self.group = group
+        self.lease_duration = lease_duration
+        self.renew_period = renew_period
+        self.vnodes = vnodes
+        self.handoff_grace = renew_period if handoff_grace is None else handoff_grace
+        self.clock = clock
+        self.ring = HashRing(vnodes=vnodes)
+        self.rebalances = 0
+        self._member_lease = f'{group}-member-{identity}'
+        self._healthy = False
+        # Ring from before the pending handoff; None once it has settled
+        self._settled_ring = None
+        self._handoff_until = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def members(self):
+        return self.ring.members
+
+    @property
+    def in_handoff(self):
+        return self._settled_ring is not None
+
+    def owns(self, app_name):
+        if not self._healthy or self.ring.owner(app_name) != self.identity:
+            return False
+        settled = self._settled_ring
+        return settled is None or settled.owner(app_name) == self.identity
+
+    def tick(self):
+        """Renew our membership lease, rebalance if the live member set changed
+        and take over incoming applications once the handoff grace has passed"""
+        was_healthy = self._healthy
+        try:
+            self._healthy = self.backend.acquire(self._member_lease, self.identity, self.lease_duration,
+                                                 labels={MEMBERSHIP_LABEL: self.group})
+            members = self.backend.live_holders(MEMBERSHIP_LABEL, self.group)
+        except Exception as e:
+            logging.error(f"Shard membership error: {e}")
+            self._healthy = False
+            return
+
+        now = self.clock()
+        if tuple(sorted(members)) != self.ring.members:
+            if self._settled_ring is None:
+                self._settled_ring = self.ring
+            self.ring = HashRing(members, vnodes=self.vnodes)
+            self._handoff_until = now + self.handoff_grace
+            self.rebalances += 1
+            logging.info(f"🧩 Rebalanced shards across {len(members)} replicas: {', '.join(members)}")
+            if self.handoff_grace <= 0:
+                self._settled_ring = None
+            self._notify_ownership_change()
+        elif self._settled_ring is not None and now >= self._handoff_until:
+            self._settled_ring = None
+            logging.info(f"🧩 {self.identity} took over its shard after the handoff grace period")
+            self._notify_ownership_change()
+        elif self._healthy and not was_healthy:
+            # Events for our slice were dropped while we owned nothing
+            logging.info(f"🧩 {self.identity} renewed its membership lease again, resyncing its shard")
+            self._notify_ownership_change()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='shard-membership')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.renew_period)
+
+    def stop(self):
+        self._stop.set()
+        self._healthy = False
+        self.backend.release(self._member_lease, self.identity)
+
+
+def create_coordinator(mode, identity, namespace='argocd', api_client=None):
+    """Build a coordinator for COORDINATION_MODE: none, leader-election or sharded"""
+    if mode in (None, '', 'none'):
+        return Coordinator()
+
+    from kubernetes import client
+    backend = LeaseCoordinationBackend(client.CoordinationV1Api(api_client), namespace)
+    if mode == 'leader-election':
+        return LeaderElectionCoordinator(backend, identity)
+    if mode == 'sharded':
+        return ShardedCoordinator(backend, identity)
+    raise ValueError(f"Unknown coordination mode: {mode}")
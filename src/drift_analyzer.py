@@ -1,6 +1,160 @@
+import hashlib
+import json
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from kubernetes import client, config
+from itertools import islice
+from drift_trends import DriftTrendStore
+from metrics import ANALYSIS_DURATION, DRIFT_REPORT_CACHE
+
+SEVERITY_LEVELS = ('low', 'medium', 'high', 'critical')
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(SEVERITY_LEVELS)}
+AFFECTED_STATUSES = frozenset(['OutOfSync', 'Degraded', 'Missing'])
+
+_worker_analyzer = None
+
+def _init_worker(analyzer):
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+
+def _analyze_in_worker(app):
+    return _worker_analyzer.analyze_report(app)
+
+def _resource_key(resource):
+    return (resource.get('group', ''), resource.get('kind', ''),
+            resource.get('namespace', ''), resource.get('name', ''))
+
+def _resource_signature(resource):
+    """Hash of the resource fields that feed the analysis"""
+    health = resource.get('health') or {}
+    return hash((resource.get('status', 'Unknown'), health.get('status'), resource.get('kind', '')))
+
+class IncrementalAppState:
+    """Previous per-resource analysis of one application, updated by diffing"""
+
+    __slots__ = ('resources', 'rank_counts', 'affected')
+
+    def __init__(self):
+        self.resources = {}  # key -> (signature, rank, affected entry or None)
+        self.rank_counts = [0] * len(SEVERITY_LEVELS)
+        self.affected = OrderedDict()
+
+    def max_rank(self):
+        for rank in range(len(self.rank_counts) - 1, -1, -1):
+            if self.rank_counts[rank]:
+                return rank
+        return SEVERITY_RANK['low']
+
+    def remove(self, key):
+        _, rank, entry = self.resources.pop(key)
+        self.rank_counts[rank] -= 1
+        if entry is not None:
+            del self.affected[key]
+
+def report_fingerprint(app, trend_adjustment=0):
+    """Stable hash of exactly the inputs analyze_report() reads.
+
+    Timestamps, operationState and other status churn are left out, so watch
+    events that only touch those map to the same fingerprint. The drift-trend
+    risk adjustment is included since it changes the risk score.
+    """
+    metadata = app['metadata']
+    status = app.get('status', {})
+    relevant = (
+        metadata['name'],
+        metadata.get('labels', {}),
+        app.get('spec', {}).get('destination', {}).get('namespace'),
+        status.get('sync', {}).get('status'),
+        status.get('health', {}).get('status'),
+        [(resource.get('kind'), resource.get('name'), resource.get('namespace'), resource.get('status'))
+         for resource in status.get('resources', [])],
+        trend_adjustment
+    )
+    encoded = json.dumps(relevant, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+class DriftReportCache:
+    """Bounded LRU of drift reports keyed by report_fingerprint().
+
+    Besides the report, each entry remembers whether remediation has already
+    been triggered for that exact content, so repeated watch events for an
+    unchanged drift neither re-run the analysis nor re-trigger remediation.
+    """
+
+    def __init__(self, analyzer, max_entries=4096):
+        self.analyzer = analyzer
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # fingerprint -> [report, remediated]
+        self._app_fingerprints = {}
+        self._lock = threading.Lock()
+
+    def get(self, app):
+        """Return (report, fingerprint, hit) for the application's current content"""
+        app_name = app['metadata']['name']
+        fingerprint = report_fingerprint(app, self.analyzer.trends.risk_adjustment(app_name))
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+                self.hits += 1
+                DRIFT_REPORT_CACHE.labels('hit').inc()
+                return entry[0], fingerprint, True
+        
+        # Misses re-evaluate only the resources that changed since the app's last analysis
+        report = self.analyzer.analyze_report_incremental(app)
+        with self._lock:
+            self.misses += 1
+            DRIFT_REPORT_CACHE.labels('miss').inc()
+            previous = self._app_fingerprints.get(app_name)
+            if previous is not None and previous != fingerprint:
+                self._entries.pop(previous, None)
+            self._app_fingerprints[app_name] = fingerprint
+            self._entries[fingerprint] = [report, False]
+            while len(self._entries) > self.max_entries:
+                evicted, (evicted_report, _) = self._entries.popitem(last=False)
+                if self._app_fingerprints.get(evicted_report['application']) == evicted:
+                    del self._app_fingerprints[evicted_report['application']]
+        return report, fingerprint, False
+
+    def is_remediated(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            return entry is not None and entry[1]
+
+    def mark_remediated(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                entry[1] = True
+
+    def remediated_fingerprints(self):
+        """{app: fingerprint} for every application whose current drift was remediated"""
+        with self._lock:
+            return {app_name: fingerprint for app_name, fingerprint in self._app_fingerprints.items()
+                    if self._entries.get(fingerprint, (None, False))[1]}
+
+    def invalidate(self, app_name):
+        """Forget an application's cached report (deleted, or back in sync)"""
+        with self._lock:
+            fingerprint = self._app_fingerprints.pop(app_name, None)
+            if fingerprint is not None:
+                self._entries.pop(fingerprint, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
 
 class DriftAnalyzer:
     def __init__(self):
@@ -17,9 +171,59 @@ class DriftAnalyzer:
             'medium': 5,
             'low': 2
         }
+        
+        self._compile_severity_rules()
+        
+        self.max_tracked_apps = 10000
+        self._incremental_states = OrderedDict()
+        self._incremental_lock = threading.Lock()
+        # app -> seconds taken by its last analyze_drift(), for generate_drift_report()
+        self._analysis_seconds = OrderedDict()
+        
+        self.trends = DriftTrendStore(max_apps=self.max_tracked_apps * 2)
+
+    def __getstate__(self):
+        # Shipped to process-pool workers by analyze_many(); incremental state stays behind
+        state = self.__dict__.copy()
+        del state['_incremental_lock']
+        state['_incremental_states'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._incremental_lock = threading.Lock()
+
+    def _compile_severity_rules(self):
+        """Compile severity_rules into a kind cache plus one combined substring regex"""
+        # Alternatives are ordered by rule precedence, so at any position the first
+        # alternative that matches belongs to the highest-precedence severity bucket
+        self._rule_precedence = {}
+        alternatives = []
+        for precedence, (severity, resource_types) in enumerate(self.severity_rules.items()):
+            for resource_type in resource_types:
+                self._rule_precedence.setdefault(resource_type, (precedence, severity))
+                alternatives.append(re.escape(resource_type))
+        
+        # Zero-width lookahead finds overlapping matches at every offset
+        self._severity_pattern = re.compile('(?=(' + '|'.join(alternatives) + '))') if alternatives else None
+        self._kind_severity_cache = {}
 
     def analyze_drift(self, app):
         """Analyze drift and determine severity based on resource types and changes"""
+        started = time.perf_counter()
+        try:
+            return self._analyze_drift(app)
+        finally:
+            elapsed = time.perf_counter() - started
+            ANALYSIS_DURATION.observe(elapsed)
+            # Picked up by generate_drift_report() for the same application
+            with self._incremental_lock:
+                self._analysis_seconds[app['metadata']['name']] = elapsed
+                self._analysis_seconds.move_to_end(app['metadata']['name'])
+                while len(self._analysis_seconds) > self.max_tracked_apps:
+                    self._analysis_seconds.popitem(last=False)
+
+    def _analyze_drift(self, app):
         app_name = app['metadata']['name']
         labels = app['metadata'].get('labels', {})
         
@@ -54,7 +258,7 @@ class DriftAnalyzer:
             return 'low', 'No specific resources identified in drift'
         
         # Analyze each resource for severity
-        highest_severity = 'low'
+        highest_rank = SEVERITY_RANK['low']
         affected_resources = []
         
         for resource in resources:
@@ -65,8 +269,9 @@ class DriftAnalyzer:
             # Determine severity based on resource type
             resource_severity = self._get_resource_severity(resource_kind)
             
-            if self._is_higher_severity(resource_severity, highest_severity):
-                highest_severity = resource_severity
+            resource_rank = SEVERITY_RANK[resource_severity]
+            if resource_rank > highest_rank:
+                highest_rank = resource_rank
             
             if resource_status in ['OutOfSync', 'Degraded', 'Missing']:
                 affected_resources.append({
@@ -76,6 +281,8 @@ class DriftAnalyzer:
                     'severity': resource_severity
                 })
         
+        highest_severity = SEVERITY_LEVELS[highest_rank]
+        
         # Additional analysis based on sync and health status
         if health_status == 'Degraded':
             if highest_severity == 'low':
@@ -89,17 +296,124 @@ class DriftAnalyzer:
         
         return highest_severity, details
 
+    def analyze_drift_incremental(self, app):
+        """Incremental analyze_drift(): only resources whose key or status changed are re-evaluated.
+
+        Returns the same (severity, details) as analyze_drift(). Per-app state is
+        LRU-bounded by max_tracked_apps and dropped by forget_application().
+        """
+        severity, details, _ = self._analyze_incremental(app)
+        if 'drift-severity' in app['metadata'].get('labels', {}):
+            return severity, details
+        return severity, f"{details} (Risk Score: {self._calculate_risk_score(app, severity)}/10)"
+
+    def analyze_report_incremental(self, app):
+        """analyze_report() on top of the incremental per-app state (what DriftReportCache uses)"""
+        started = time.perf_counter()
+        severity, details, affected = self._analyze_incremental(app)
+        return self._build_report(app, severity, details, affected, started)
+
+    def _analyze_incremental(self, app):
+        """Diff status.resources against the previous analysis; returns (severity, details, affected)"""
+        app_name = app['metadata']['name']
+        labels = app['metadata'].get('labels', {})
+        status = app.get('status', {})
+        resources = status.get('resources', [])
+        
+        with self._incremental_lock:
+            state = self._incremental_states.get(app_name)
+            if state is None:
+                state = IncrementalAppState()
+                self._incremental_states[app_name] = state
+                while len(self._incremental_states) > self.max_tracked_apps:
+                    self._incremental_states.popitem(last=False)
+            else:
+                self._incremental_states.move_to_end(app_name)
+        
+        seen = set()
+        for resource in resources:
+            key = _resource_key(resource)
+            seen.add(key)
+            signature = _resource_signature(resource)
+            previous = state.resources.get(key)
+            if previous is not None:
+                if previous[0] == signature:
+                    continue
+                state.remove(key)
+            
+            resource_severity = self._get_resource_severity(resource.get('kind', '').lower())
+            rank = SEVERITY_RANK[resource_severity]
+            entry = None
+            resource_status = resource.get('status', 'Unknown')
+            if resource_status in AFFECTED_STATUSES:
+                entry = {
+                    'kind': resource.get('kind'),
+                    'name': resource.get('name'),
+                    'namespace': resource.get('namespace'),
+                    'status': resource_status
+                }
+                state.affected[key] = entry
+            state.resources[key] = (signature, rank, entry)
+            state.rank_counts[rank] += 1
+        
+        if len(seen) != len(state.resources):
+            for key in [key for key in state.resources if key not in seen]:
+                state.remove(key)
+        
+        affected = list(state.affected.values())
+        if 'drift-severity' in labels:
+            severity = labels['drift-severity']
+            return severity, f"Explicit severity set via label: {severity}", affected
+        if not resources:
+            return 'low', 'No specific resources identified in drift', affected
+        
+        sync_status = status.get('sync', {}).get('status', 'Unknown')
+        health_status = status.get('health', {}).get('status', 'Unknown')
+        severity = SEVERITY_LEVELS[state.max_rank()]
+        if health_status == 'Degraded' and severity == 'low':
+            severity = 'medium'
+        if sync_status == 'OutOfSync' and len(affected) > 5:
+            severity = self._escalate_severity(severity)
+        details = f"Analyzed {len(resources)} resources, {len(affected)} affected. " \
+                 f"Health: {health_status}, Sync: {sync_status}"
+        return severity, details, affected
+
+    def get_incremental_affected_resources(self, app_name):
+        """Affected resources from the last incremental analysis of an application"""
+        state = self._incremental_states.get(app_name)
+        return list(state.affected.values()) if state else []
+
+    def forget_application(self, app_name):
+        """Drop incremental state for a deleted application"""
+        with self._incremental_lock:
+            self._incremental_states.pop(app_name, None)
+
     def _get_resource_severity(self, resource_kind):
         """Determine severity based on resource type"""
-        for severity, resource_types in self.severity_rules.items():
-            if any(rt in resource_kind for rt in resource_types):
-                return severity
-        return 'low'
+        severity = self._kind_severity_cache.get(resource_kind)
+        if severity is None:
+            severity = self._classify_kind(resource_kind)
+            if len(self._kind_severity_cache) >= 4096:
+                self._kind_severity_cache.clear()
+            self._kind_severity_cache[resource_kind] = severity
+        return severity
+
+    def _classify_kind(self, resource_kind):
+        """Uncached classification - first severity bucket with a matching substring"""
+        if self._severity_pattern is None:
+            return 'low'
+        best = None
+        for match in self._severity_pattern.finditer(resource_kind):
+            candidate = self._rule_precedence[match.group(1)]
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+                if best[0] == 0:
+                    break
+        return best[1] if best else 'low'
 
     def _is_higher_severity(self, new_severity, current_severity):
         """Check if new severity is higher than current"""
-        severity_order = ['low', 'medium', 'high', 'critical']
-        return severity_order.index(new_severity) > severity_order.index(current_severity)
+        return SEVERITY_RANK[new_severity] > SEVERITY_RANK[current_severity]
 
     def _escalate_severity(self, current_severity):
         """Escalate severity by one level"""
@@ -134,6 +448,9 @@ class DriftAnalyzer:
         if labels.get('criticality') == 'high':
             base_score += 1
         
+        # Drift history: flapping or increasingly frequent drift
+        base_score += self.trends.risk_adjustment(app.get('metadata', {}).get('name'))
+        
         # Cap at 10
         return min(base_score, 10)
 
@@ -147,22 +464,69 @@ class DriftAnalyzer:
         }
         return action_map.get(severity, 'manual_review')
 
-    def analyze_drift_trend(self, app_name, historical_data=None):
-        """Analyze drift trends over time (placeholder for future enhancement)"""
-        # This could be enhanced to track drift patterns over time
-        # and predict potential issues
+    def analyze_field_drift(self, resource_drifts):
+        """Classify field-level drift from manifest_diff.diff_resources().
+
+        A resource whose only differences are under metadata.labels or
+        metadata.annotations is low severity; anything else (including a
+        missing resource) takes the severity of its kind.
+        """
+        highest_rank = SEVERITY_RANK['low']
+        affected = []
+        field_count = 0
+        for resource in resource_drifts:
+            fields = resource['fields']
+            field_count += len(fields)
+            metadata_only = not resource['missing'] and all(
+                field['path'].startswith(('metadata.labels', 'metadata.annotations')) for field in fields)
+            severity = 'low' if metadata_only else self._get_resource_severity(resource['kind'].lower())
+            highest_rank = max(highest_rank, SEVERITY_RANK[severity])
+            affected.append({
+                'kind': resource['kind'],
+                'name': resource['name'],
+                'namespace': resource['namespace'],
+                'status': 'Missing' if resource['missing'] else 'OutOfSync',
+                'severity': severity,
+                'fields': [field['path'] for field in fields]
+            })
         
-        logging.info(f"📈 Trend analysis for {app_name} - Feature coming soon")
+        details = f"{len(affected)} resources drifted from desired state, {field_count} fields differ"
+        return SEVERITY_LEVELS[highest_rank], details, affected
+
+    def analyze_drift_trend(self, app_name, historical_data=None):
+        """Analyze drift trends over time from the per-app drift time series.
+
+        historical_data, if given, is an iterable of (timestamp, event) pairs with
+        event 'drift' or 'resolved', in chronological order, replayed into the store first.
+        """
+        for timestamp, event in historical_data or ():
+            if event == 'drift':
+                self.trends.record_drift(app_name, timestamp)
+            elif event == 'resolved':
+                self.trends.record_resolved(app_name, timestamp)
         
-        return {
-            'trend': 'stable',
-            'frequency': 'low',
-            'prediction': 'no_immediate_risk'
-        }
+        trend = self.trends.trend(app_name)
+        logging.info(f"📈 Trend analysis for {app_name}: {trend['trend']}, "
+                     f"{trend['drifts_per_day']} drifts/day, flapping={trend['flapping']}")
+        return trend
+
+    def generate_drift_report(self, app, severity=None, details=None, analysis_duration_ms=None):
+        """Generate comprehensive drift analysis report (running analyze_drift() when no severity is given).
 
-    def generate_drift_report(self, app, severity, details):
-        """Generate comprehensive drift analysis report"""
+        analysis_duration_ms covers the analysis as well as building the report:
+        the time of this call's own analyze_drift(), or of the last one run for
+        the application, is added to the report construction time.
+        """
+        started = time.perf_counter()
         app_name = app['metadata']['name']
+        ran_analysis = severity is None
+        if ran_analysis:
+            severity, details = self.analyze_drift(app)
+        with self._incremental_lock:
+            analysis_seconds = self._analysis_seconds.pop(app_name, 0.0)
+        if ran_analysis:
+            # Already inside this call's own timing
+            analysis_seconds = 0.0
         namespace = app.get('spec', {}).get('destination', {}).get('namespace', 'unknown')
         
         report = {
@@ -176,11 +540,15 @@ class DriftAnalyzer:
             'affected_resources': self._get_affected_resources(app),
             'analysis_metadata': {
                 'analyzer_version': '1.0.0',
-                'analysis_duration_ms': 50,  # Placeholder
+                'analysis_duration_ms': None,
                 'confidence_score': 0.95
             }
         }
         
+        if analysis_duration_ms is None:
+            analysis_duration_ms = (analysis_seconds + time.perf_counter() - started) * 1000
+        report['analysis_metadata']['analysis_duration_ms'] = round(analysis_duration_ms, 3)
+        
         return report
 
     def _get_affected_resources(self, app):
@@ -199,3 +567,98 @@ class DriftAnalyzer:
         
         return affected
 
+
+    def analyze_many(self, apps, processes=None, chunksize=64):
+        """Analyze an iterable of applications, yielding one drift report per app.
+
+        Each app's resources are walked once. With processes set, apps are fanned
+        out across a process pool in bounded windows so the input can be a stream;
+        an input that fits in one chunk is analyzed in-process instead.
+        """
+        if not processes:
+            for app in apps:
+                yield self.analyze_report(app)
+            return
+        
+        apps = iter(apps)
+        window = processes * chunksize * 2
+        batch = list(islice(apps, window))
+        # Starting the pool costs more than analyzing a single chunk
+        if len(batch) <= chunksize:
+            for app in batch:
+                yield self.analyze_report(app)
+            return
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            while batch:
+                yield from executor.map(_analyze_in_worker, batch, chunksize=chunksize)
+                batch = list(islice(apps, window))
+
+    def analyze_report(self, app):
+        """Single-pass equivalent of analyze_drift() followed by generate_drift_report()"""
+        started = time.perf_counter()
+        metadata = app['metadata']
+        labels = metadata.get('labels', {})
+        status = app.get('status', {})
+        resources = status.get('resources', [])
+        
+        highest_rank = SEVERITY_RANK['low']
+        affected_count = 0
+        affected = []
+        for resource in resources:
+            resource_severity = self._get_resource_severity(resource.get('kind', '').lower())
+            resource_rank = SEVERITY_RANK[resource_severity]
+            if resource_rank > highest_rank:
+                highest_rank = resource_rank
+            resource_status = resource.get('status')
+            if resource_status in AFFECTED_STATUSES:
+                affected_count += 1
+                affected.append({
+                    'kind': resource.get('kind'),
+                    'name': resource.get('name'),
+                    'namespace': resource.get('namespace'),
+                    'status': resource_status
+                })
+        
+        if 'drift-severity' in labels:
+            severity = labels['drift-severity']
+            details = f"Explicit severity set via label: {severity}"
+        elif not resources:
+            severity = 'low'
+            details = 'No specific resources identified in drift'
+        else:
+            sync_status = status.get('sync', {}).get('status', 'Unknown')
+            health_status = status.get('health', {}).get('status', 'Unknown')
+            severity = SEVERITY_LEVELS[highest_rank]
+            if health_status == 'Degraded' and severity == 'low':
+                severity = 'medium'
+            if sync_status == 'OutOfSync' and affected_count > 5:
+                severity = self._escalate_severity(severity)
+            details = f"Analyzed {len(resources)} resources, {affected_count} affected. " \
+                     f"Health: {health_status}, Sync: {sync_status}"
+        
+        return self._build_report(app, severity, details, affected, started)
+
+    def _build_report(self, app, severity, details, affected, started):
+        """Report dict shared by analyze_report() and analyze_report_incremental()"""
+        risk_score = self._calculate_risk_score(app, severity)
+        if 'drift-severity' not in app['metadata'].get('labels', {}):
+            details = f"{details} (Risk Score: {risk_score}/10)"
+        
+        elapsed = time.perf_counter() - started
+        ANALYSIS_DURATION.observe(elapsed)
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'application': app['metadata']['name'],
+            'namespace': app.get('spec', {}).get('destination', {}).get('namespace', 'unknown'),
+            'severity': severity,
+            'risk_score': risk_score,
+            'details': details,
+            'recommended_action': self.get_recommended_action(severity),
+            'affected_resources': affected,
+            'analysis_metadata': {
+                'analyzer_version': '1.0.0',
+                'analysis_duration_ms': round(elapsed * 1000, 3),
+                'confidence_score': 0.95
+            }
+        }
@@ -0,0 +1,276 @@
+import threading
+import time
+from collections import OrderedDict
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class AppDriftSeries:
+    """Fixed-size drift history of one application.
+
+    A ring of one bit per minute marks the minutes in which a drift episode
+    started, next to a small ring of per-day counts and the start minutes of the
+    most recent episodes. A week at minute resolution costs 1260 bytes.
+    """
+
+    __slots__ = ('bits', 'day_counts', 'recent', 'recent_index', 'window_count', 'last_minute',
+                 'open_since', 'mttr_seconds', 'resolved', 'total_drifts')
+
+    def __init__(self, window_minutes, flap_threshold, start_minute):
+        self.bits = bytearray((window_minutes + 7) // 8)
+        self.day_counts = [0] * max(window_minutes // MINUTES_PER_DAY, 1)
+        self.recent = [None] * flap_threshold
+        self.recent_index = 0
+        self.window_count = 0
+        self.last_minute = start_minute
+        self.open_since = None
+        self.mttr_seconds = None
+        self.resolved = 0
+        self.total_drifts = 0
+
+
+class DriftTrendStore:
+    """Per-application drift time series with O(1) updates.
+
+    record_drift() marks the start of a drift episode (repeated calls while the
+    episode is open are ignored) and record_resolved() closes it, feeding the
+    time-to-remediate into an exponentially weighted mean. trend() derives drift
+    frequency, direction and flapping from the rings without scanning them.
+
+    Memory is O(apps x window): 10k applications x 7 days at minute resolution
+    take about 13 MB of bitmaps.
+    """
+
+    def __init__(self, window_minutes=7 * MINUTES_PER_DAY, flap_window_minutes=60, flap_threshold=3,
+                 mttr_alpha=0.2, max_apps=20000, clock=time.time):
+        self.window_minutes = window_minutes
+        self.flap_window_minutes = flap_window_minutes
+        self.flap_threshold = flap_threshold
+        self.mttr_alpha = mttr_alpha
+        self.max_apps = max_apps
+        self.clock = clock
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks do not pickle; DriftAnalyzer is shipped to process-pool workers
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._series)
+
+    def _minute(self, timestamp):
+        return int((self.clock() if timestamp is None else timestamp) // 60)
+
+    def _get(self, app_name, minute, create=True):
+        series = self._series.get(app_name)
+        if series is None:
+            if not create:
+                return None
+            series = AppDriftSeries(self.window_minutes, self.flap_threshold, minute)
+            self._series[app_name] = series
+            if len(self._series) > self.max_apps:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(app_name)
+            self._advance(series, minute)
+        return series
+
+    def _advance(self, series, minute):
+        """Expire the slots that fell out of the window since the last update"""
+        elapsed = minute - series.last_minute
+        if elapsed <= 0:
+            return
+        if elapsed >= self.window_minutes:
+            series.bits = bytearray(len(series.bits))
+            series.day_counts = [0] * len(series.day_counts)
+            series.window_count = 0
+        else:
+            # Slots last_minute+1..minute, as at most two ranges of the ring
+            first = (series.last_minute + 1) % self.window_minutes
+            end = first + elapsed
+            series.window_count -= self._clear_bits(series.bits, first, min(end, self.window_minutes))
+            if end > self.window_minutes:
+                series.window_count -= self._clear_bits(series.bits, 0, end - self.window_minutes)
+            days = len(series.day_counts)
+            first_day = series.last_minute // MINUTES_PER_DAY
+            for day in range(first_day + 1, min(minute // MINUTES_PER_DAY, first_day + days) + 1):
+                series.day_counts[day % days] = 0
+        series.last_minute = minute
+
+    @staticmethod
+    def _clear_bits(bits, start, end):
+        """Clear bit slots start..end-1; returns how many were set.
+
+        Whole bytes are cleared with one slice assignment and only the partial
+        bytes at either edge are masked, so the cost does not grow per minute.
+        """
+        first_byte, last_byte = start >> 3, (end - 1) >> 3
+        head_mask = (0xFF << (start & 7)) & 0xFF
+        tail_mask = (1 << (((end - 1) & 7) + 1)) - 1
+        if first_byte == last_byte:
+            mask = head_mask & tail_mask
+            cleared = bin(bits[first_byte] & mask).count('1')
+            bits[first_byte] &= ~mask & 0xFF
+            return cleared
+        cleared = bin(bits[first_byte] & head_mask).count('1') + bin(bits[last_byte] & tail_mask).count('1')
+        bits[first_byte] &= ~head_mask & 0xFF
+        bits[last_byte] &= ~tail_mask & 0xFF
+        middle = last_byte - first_byte - 1
+        if middle > 0:
+            cleared += bin(int.from_bytes(bits[first_byte + 1:last_byte], 'little')).count('1')
+            bits[first_byte + 1:last_byte] = bytes(middle)
+        return cleared
+
+    def record_drift(self, app_name, timestamp=None):
+        """Mark the start of a drift episode; no-op while one is already open"""
+        minute = self._minute(timestamp)
+        with self._lock:
+            series = self._get(app_name, minute)
+            if series.open_since is not None:
+                return
+            series.open_since = self.clock() if timestamp is None else timestamp
+            series.total_drifts += 1
+
+            slot = minute % self.window_minutes
+            byte, mask = slot >> 3, 1 << (slot & 7)
+            if not series.bits[byte] & mask:
+                series.bits[byte] |= mask
+                series.window_count += 1
+            series.day_counts[(minute // MINUTES_PER_DAY) % len(series.day_counts)] += 1
+            series.recent[series.recent_index] = minute
+            series.recent_index = (series.recent_index + 1) % len(series.recent)
+
+    def record_resolved(self, app_name, timestamp=None):
+        """Close the open drift episode and fold its duration into the MTTR"""
+        now = self.clock() if timestamp is None else timestamp
+        with self._lock:
+            series = self._get(app_name, self._minute(now), create=False)
+            if series is None or series.open_since is None:
+                return
+            duration = max(now - series.open_since, 0.0)
+            series.open_since = None
+            series.resolved += 1
+            if series.mttr_seconds is None:
+                series.mttr_seconds = duration
+            else:
+                series.mttr_seconds += self.mttr_alpha * (duration - series.mttr_seconds)
+
+    def forget(self, app_name):
+        with self._lock:
+            self._series.pop(app_name, None)
+
+    def is_flapping(self, app_name, timestamp=None):
+        minute = self._minute(timestamp)
+        with self._lock:
+            series = self._get(app_name, minute, create=False)
+            return series is not None and self._flapping(series, minute)
+
+    def _flapping(self, series, minute):
+        # The ring holds the last flap_threshold episode starts; the oldest is the next slot
+        oldest = series.recent[series.recent_index]
+        return oldest is not None and minute - oldest < self.flap_window_minutes
+
+    def trend(self, app_name, timestamp=None):
+        """Frequency, direction, MTTR and flapping for one application"""
+        minute = self._minute(timestamp)
+        with self._lock:
+            series = self._get(app_name, minute, create=False)
+            if series is None:
+                return {
+                    'trend': 'stable',
+                    'frequency': 'low',
+                    'drifts_per_day': 0.0,
+                    'drifts_in_window': 0,
+                    'mean_time_to_remediate_seconds': None,
+                    'flapping': False,
+                    'prediction': 'no_immediate_risk'
+                }
+
+            days = len(series.day_counts)
+            today = series.day_counts[(minute // MINUTES_PER_DAY) % days]
+            per_day = series.window_count / (self.window_minutes / MINUTES_PER_DAY)
+            previous_days = (sum(series.day_counts) - today) / (days - 1) if days > 1 else today
+            flapping = self._flapping(series, minute)
+            mttr = series.mttr_seconds
+            window_count = series.window_count
+
+        if today > max(previous_days * 1.5, 1):
+            direction = 'increasing'
+        elif today < previous_days * 0.5:
+            direction = 'decreasing'
+        else:
+            direction = 'stable'
+
+        if per_day >= 5:
+            frequency = 'high'
+        elif per_day >= 1:
+            frequency = 'medium'
+        else:
+            frequency = 'low'
+
+        if flapping:
+            prediction = 'flapping'
+        elif direction == 'increasing' or frequency == 'high':
+            prediction = 'elevated_risk'
+        else:
+            prediction = 'no_immediate_risk'
+
+        return {
+            'trend': direction,
+            'frequency': frequency,
+            'drifts_per_day': round(per_day, 3),
+            'drifts_in_window': window_count,
+            'mean_time_to_remediate_seconds': round(mttr, 3) if mttr is not None else None,
+            'flapping': flapping,
+            'prediction': prediction
+        }
+
+    def risk_adjustment(self, app_name, timestamp=None):
+        """Risk score points added for drift history: +1 flapping, +1 rising or frequent drift"""
+        if app_name not in self._series:
+            return 0
+        trend = self.trend(app_name, timestamp)
+        adjustment = 1 if trend['flapping'] else 0
+        if trend['trend'] == 'increasing' or trend['frequency'] == 'high':
+            adjustment += 1
+        return adjustment
+
+    def snapshot(self):
+        """JSON-serializable copy of every series, for checkpoints"""
+        with self._lock:
+            return {app_name: {slot: bytes(series.bits).hex() if slot == 'bits' else getattr(series, slot)
+                               for slot in AppDriftSeries.__slots__}
+                    for app_name, series in self._series.items()}
+
+    def restore(self, snapshot):
+        """Load series saved by snapshot(); series shaped for another window size are skipped"""
+        restored = 0
+        with self._lock:
+            for app_name, saved in snapshot.items():
+                series = AppDriftSeries(self.window_minutes, self.flap_threshold, saved['last_minute'])
+                bits = bytearray.fromhex(saved['bits'])
+                if len(bits) != len(series.bits) or len(saved['day_counts']) != len(series.day_counts) \
+                        or len(saved['recent']) != len(series.recent):
+                    continue
+                for slot in AppDriftSeries.__slots__:
+                    setattr(series, slot, bits if slot == 'bits' else saved[slot])
+                self._series[app_name] = series
+                self._series.move_to_end(app_name)
+                restored += 1
+            while len(self._series) > self.max_apps:
+                self._series.popitem(last=False)
+        return restored
+
+    def memory_bytes(self):
+        """Approximate bytes held by the per-app rings"""
+        with self._lock:
+            return sum(len(series.bits) + 8 * (len(series.day_counts) + len(series.recent)) + 120
+                       for series in self._series.values())
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from kubernetes.client.rest import ApiException
+from kube_client import iter_watch_json, list_json
+from metrics import WATCH_BYTES
+
+HTTP_STATUS_GONE = 410
+
+
+class ApplicationInformer:
+    """Shared informer for ArgoCD Applications.
+
+    Performs a single LIST into an in-memory store keyed by application name and
+    then keeps the store current with WATCH requests that resume from the last
+    seen resourceVersion. A full re-list only happens when the apiserver answers
+    410 Gone (the resourceVersion has been compacted away).
+
+    label_selector is applied server-side to both LIST and WATCH, so objects we
+    ignore are never transferred. Responses are decoded from raw JSON and the
+    received bytes and event rate of each watch session are reported.
+    """
+
+    def __init__(self, api, namespace, group="argoproj.io", version="v1alpha1",
+                 plural="applications", watch_timeout_seconds=300, label_selector=None):
+        self.api = api
+        self.namespace = namespace
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self.watch_timeout_seconds = watch_timeout_seconds
+        self.label_selector = label_selector
+
+        self.resource_version = None
+        self.has_synced = False
+        self.relist_count = 0
+        self.events_received = 0
+        self.bytes_received = 0
+        self._store = {}
+        self._lock = threading.RLock()
+        self._handlers = []
+        self._stopped = False
+
+    def add_event_handler(self, handler):
+        """Register a callable invoked as handler(event_type, app) for every change"""
+        self._handlers.append(handler)
+
+    def get(self, name):
+        """Return the cached Application by name (or None)"""
+        with self._lock:
+            return self._store.get(name)
+
+    def list(self):
+        """Return a snapshot of all cached Applications"""
+        with self._lock:
+            return list(self._store.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._store)
+
+    def snapshot(self):
+        """(resourceVersion, items) taken together, for checkpoints"""
+        with self._lock:
+            return self.resource_version, list(self._store.values())
+
+    def restore(self, resource_version, items):
+        """Seed the store from a checkpoint without notifying handlers.
+
+        run() then resumes the WATCH from resource_version, so handlers only see
+        changes made since the checkpoint; if that version has been compacted
+        the 410 re-list replays just the differences against the seeded store.
+        """
+        with self._lock:
+            self._store = {item['metadata']['name']: item for item in items}
+            self.resource_version = resource_version
+            self.has_synced = resource_version is not None
+
+    def stop(self):
+        """Stop after the current watch event (or when the watch request times out)"""
+        self._stopped = True
+
+    def _observe_list_bytes(self, count):
+        self.bytes_received += count
+        WATCH_BYTES.labels('list').inc(count)
+
+    def _observe_watch_bytes(self, count):
+        self.bytes_received += count
+        WATCH_BYTES.labels('watch').inc(count)
+
+    def _selector_kwargs(self):
+        return {'label_selector': self.label_selector} if self.label_selector else {}
+
+    def relist(self):
+        """LIST all applications and replace the store contents"""
+        result = list_json(
+            self.api.list_namespaced_custom_object,
+            group=self.group,
+            version=self.version,
+            namespace=self.namespace,
+            plural=self.plural,
+            observe_bytes=self._observe_list_bytes,
+            **self._selector_kwargs()
+        )
+        self._replace_store(result)
+
+    def _replace_store(self, result):
+        """Swap in a freshly listed store and replay the differences to handlers"""
+        items = result.get('items', [])
+        fresh = {item['metadata']['name']: item for item in items}
+
+        with self._lock:
+            previous = self._store
+            self._store = fresh
+            self.resource_version = result.get('metadata', {}).get('resourceVersion')
+            self.has_synced = True
+        self.relist_count += 1
+
+        logging.info(f"📦 Informer listed {len(fresh)} applications "
+                     f"(resourceVersion {self.resource_version})")
+
+        # Replay differences so handlers observe a consistent view after a relist
+        for name, app in fresh.items():
+            old = previous.get(name)
+            if old is None:
+                self._dispatch('ADDED', app)
+            elif old.get('metadata', {}).get('resourceVersion') != \
+                    app.get('metadata', {}).get('resourceVersion'):
+                self._dispatch('MODIFIED', app)
+        for name, app in previous.items():
+            if name not in fresh:
+                self._dispatch('DELETED', app)
+
+    def apply_event(self, event_type, app):
+        """Apply a single watch event to the store and notify handlers"""
+        metadata = app.get('metadata', {})
+        rv = metadata.get('resourceVersion')
+
+        with self._lock:
+            if rv:
+                self.resource_version = rv
+            if event_type == 'BOOKMARK':
+                return
+            name = metadata['name']
+            if event_type == 'DELETED':
+                self._store.pop(name, None)
+            else:
+                self._store[name] = app
+
+        self._dispatch(event_type, app)
+
+    def _dispatch(self, event_type, app):
+        for handler in self._handlers:
+            try:
+                handler(event_type, app)
+            except Exception as e:
+                logging.error(f"Informer handler failed for "
+                              f"{app.get('metadata', {}).get('name')}: {e}")
+
+    def _watch_once(self):
+        """Run one WATCH request from the current resourceVersion until it times out"""
+        started = time.monotonic()
+        events = 0
+        bytes_before = self.bytes_received
+        try:
+            for event in iter_watch_json(
+                self.api.list_namespaced_custom_object,
+                group=self.group,
+                version=self.version,
+                namespace=self.namespace,
+                plural=self.plural,
+                resource_version=self.resource_version,
+                allow_watch_bookmarks=True,
+                timeout_seconds=self.watch_timeout_seconds,
+                observe_bytes=self._observe_watch_bytes,
+                **self._selector_kwargs()
+            ):
+                events += 1
+                self.apply_event(event['type'], event['object'])
+                if self._stopped:
+                    break
+        finally:
+            self._log_watch_session(started, events, bytes_before)
+
+    def _log_watch_session(self, started, events, bytes_before):
+        self.events_received += events
+        elapsed = max(time.monotonic() - started, 1e-6)
+        received = self.bytes_received - bytes_before
+        logging.info(f"📡 Watch session: {events} events in {elapsed:.1f}s "
+                     f"({events / elapsed:.1f} events/s, {received} bytes, "
+                     f"selector={self.label_selector or 'none'})")
+
+    def run(self, max_backoff_seconds=60):
+        """List once, then watch forever resuming from the last resourceVersion"""
+        failures = 0
+        while not self._stopped:
+            try:
+                if not self.has_synced or self.resource_version is None:
+                    self.relist()
+                self._watch_once()
+                failures = 0
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    logging.warning("Watch resourceVersion expired (410 Gone), re-listing")
+                    self.resource_version = None
+                    continue
+                failures += 1
+                logging.error(f"Watch error (attempt {failures}): {e}")
+                time.sleep(min(2 ** failures, max_backoff_seconds))
+            except Exception as e:
+                failures += 1
+                logging.error(f"Watch error (attempt {failures}): {e}")
+                time.sleep(min(2 ** failures, max_backoff_seconds))
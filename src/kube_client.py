@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from kubernetes import client, config
+from urllib3.connection import HTTPConnection
+from workqueue import TokenBucket
+
+# Accept header that makes the apiserver return PartialObjectMetadata(List) for any resource
+METADATA_ONLY_ACCEPT = ('application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,'
+                        'application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1,'
+                        'application/json')
+
+_config_loaded = None
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def load_kube_config():
+    """Load in-cluster config, falling back to kubeconfig; returns False when neither exists"""
+    global _config_loaded
+    if _config_loaded is not None:
+        return _config_loaded
+    try:
+        config.load_incluster_config()
+        _config_loaded = True
+    except Exception:
+        try:
+            config.load_kube_config()
+            _config_loaded = True
+        except Exception:
+            _config_loaded = False
+    return _config_loaded
+
+
+class TunedApiClient(client.ApiClient):
+    """ApiClient with client-side QPS/burst throttling and a default request timeout.
+
+    Watch requests are exempt from the default timeout since they are expected
+    to idle for up to their server-side timeout_seconds. With accept set, every
+    GET is sent with that Accept header (e.g. METADATA_ONLY_ACCEPT).
+    """
+
+    def __init__(self, configuration=None, request_timeout=None, qps=None, burst=None, accept=None):
+        super().__init__(configuration)
+        self.request_timeout = request_timeout
+        self.limiter = TokenBucket(qps=qps, burst=burst) if qps else None
+        self.throttled_seconds = 0.0
+        self.accept = accept
+
+    def call_api(self, resource_path, method, path_params=None, query_params=None, header_params=None,
+                 *args, **kwargs):
+        if self.accept and method == 'GET':
+            header_params = dict(header_params or {}, Accept=self.accept)
+        if self.limiter is not None:
+            wait = self.limiter.reserve()
+            if wait > 0:
+                self.throttled_seconds += wait
+                time.sleep(wait)
+        is_watch = any(key in ('watch', 'follow') and value for key, value in (query_params or []))
+        if kwargs.get('_request_timeout') is None and self.request_timeout and not is_watch:
+            kwargs['_request_timeout'] = self.request_timeout
+        return super().call_api(resource_path, method, path_params, query_params, header_params,
+                                *args, **kwargs)
+
+
+def create_api_client(pool_size=None, request_timeout=None, qps=None, burst=None, accept=None):
+    """Build a TunedApiClient; unset arguments come from KUBE_CLIENT_* environment variables"""
+    pool_size = pool_size or int(os.getenv('KUBE_CLIENT_POOL_SIZE', '20'))
+    if request_timeout is None:
+        request_timeout = (float(os.getenv('KUBE_CLIENT_CONNECT_TIMEOUT', '5')),
+                           float(os.getenv('KUBE_CLIENT_READ_TIMEOUT', '30')))
+    qps = qps if qps is not None else float(os.getenv('KUBE_CLIENT_QPS', '50'))
+    burst = burst if burst is not None else int(os.getenv('KUBE_CLIENT_BURST', '100'))
+
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = pool_size
+
+    api_client = TunedApiClient(configuration, request_timeout=request_timeout, qps=qps, burst=burst,
+                                accept=accept)
+
+    # TCP keep-alive on pooled connections so idle sockets survive between bursts
+    keepalive = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    api_client.rest_client.pool_manager.connection_pool_kw['socket_options'] = \
+        HTTPConnection.default_socket_options + keepalive
+
+    logging.info(f"🔌 Kubernetes client: pool={pool_size} timeout={request_timeout} qps={qps} burst={burst}")
+    return api_client
+
+
+def get_api_client():
+    """Process-wide shared TunedApiClient (created on first use)"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = create_api_client()
+        return _shared_client
+
+
+def list_json(list_func, *args, observe_bytes=None, **kwargs):
+    """Call a list_* API method and return the decoded JSON dict, skipping model deserialization"""
+    response = list_func(*args, _preload_content=False, **kwargs)
+    try:
+        data = response.data
+        if observe_bytes is not None:
+            observe_bytes(len(data))
+        return json.loads(data)
+    finally:
+        response.release_conn()
+
+
+def read_json(read_func, *args, **kwargs):
+    """Call a get/read API method and return the decoded JSON dict"""
+    return list_json(read_func, *args, **kwargs)
+
+
+def iter_watch_json(watch_func, *args, observe_bytes=None, **kwargs):
+    """Stream a WATCH as decoded event dicts ({'type', 'object'}) read from the raw response.
+
+    Like kubernetes.watch.Watch but without model deserialization, and with the
+    received byte count reported through observe_bytes. ERROR events are raised
+    as ApiException so callers can react to 410 Gone.
+    """
+    from kubernetes.client.rest import ApiException
+
+    response = watch_func(*args, watch=True, _preload_content=False, **kwargs)
+    pending = b''
+    try:
+        for chunk in response.stream(amt=None, decode_content=False):
+            if observe_bytes is not None:
+                observe_bytes(len(chunk))
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get('type') == 'ERROR':
+                    error = event.get('object') or {}
+                    raise ApiException(status=error.get('code'), reason=error.get('message'))
+                yield event
+    finally:
+        response.release_conn()
+
+
+def iter_list_json(list_func, *args, page_size=500, project=None, deadline=None, **kwargs):
+    """Stream items of a paginated LIST as plain dicts.
+
+    Each page is fetched with limit/continue and decoded from raw JSON; when
+    project is given only its (small) result per item is kept, and the page is
+    dropped before the next one is requested, so peak memory is bounded by
+    page_size rather than by collection size. With a deadline (time.monotonic())
+    each page request times out at it, and TimeoutError is raised once it passed.
+    """
+    continue_token = None
+    while True:
+        page_kwargs = dict(kwargs, limit=page_size)
+        if continue_token:
+            page_kwargs['_continue'] = continue_token
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError('LIST deadline exceeded')
+            page_kwargs['_request_timeout'] = remaining
+        page = list_json(list_func, *args, **page_kwargs)
+        items = page.get('items') or []
+        continue_token = (page.get('metadata') or {}).get('continue')
+        del page
+        for item in items:
+            yield project(item) if project else item
+        del items
+        if not continue_token:
+            return
@@ -0,0 +1,452 @@
+import base64
+import copy
+import glob
+import logging
+import os
+import re
+from decimal import Decimal, InvalidOperation
+import yaml
+
+# Written by the apiserver or controllers, never part of a desired manifest
+SERVER_METADATA_FIELDS = ('uid', 'resourceVersion', 'generation', 'creationTimestamp',
+                          'managedFields', 'selfLink', 'deletionTimestamp',
+                          'deletionGracePeriodSeconds', 'ownerReferences', 'finalizers')
+SERVER_ANNOTATIONS = ('kubectl.kubernetes.io/last-applied-configuration',
+                      'deployment.kubernetes.io/revision',
+                      'argocd.argoproj.io/tracking-id',
+                      'batch.kubernetes.io/job-tracking',
+                      'pv.kubernetes.io/bind-completed',
+                      'pv.kubernetes.io/bound-by-controller',
+                      'volume.beta.kubernetes.io/storage-provisioner',
+                      'volume.kubernetes.io/storage-provisioner')
+# Added by ArgoCD at apply time (label tracking) or by the Job controller, so absent from rendered manifests
+SERVER_LABELS = ('app.kubernetes.io/instance', 'controller-uid', 'job-name',
+                 'batch.kubernetes.io/controller-uid', 'batch.kubernetes.io/job-name')
+
+# Values the apiserver fills in when a manifest leaves them out, keyed by kind.
+# Paths use '.' for maps and '[]' for every element of a list.
+_POD_DEFAULTS = {
+    'restartPolicy': 'Always',
+    'dnsPolicy': 'ClusterFirst',
+    'terminationGracePeriodSeconds': 30,
+    'schedulerName': 'default-scheduler',
+    'enableServiceLinks': True,
+    'securityContext': {},
+    'containers[].terminationMessagePath': '/dev/termination-log',
+    'containers[].terminationMessagePolicy': 'File',
+    'containers[].resources': {},
+    'containers[].ports[].protocol': 'TCP',
+    'initContainers[].terminationMessagePath': '/dev/termination-log',
+    'initContainers[].terminationMessagePolicy': 'File',
+    'initContainers[].resources': {},
+}
+
+def _prefixed(prefix, defaults):
+    return {f'{prefix}.{path}': value for path, value in defaults.items()}
+
+_JOB_DEFAULTS = {
+    'backoffLimit': 6,
+    'completions': 1,
+    'parallelism': 1,
+    'completionMode': 'NonIndexed',
+    'suspend': False,
+    **_prefixed('template.spec', _POD_DEFAULTS),
+}
+
+KIND_DEFAULTS = {
+    'Deployment': {
+        'spec.replicas': 1,
+        'spec.revisionHistoryLimit': 10,
+        'spec.progressDeadlineSeconds': 600,
+        'spec.strategy': {'type': 'RollingUpdate',
+                          'rollingUpdate': {'maxSurge': '25%', 'maxUnavailable': '25%'}},
+        **_prefixed('spec.template.spec', _POD_DEFAULTS),
+    },
+    'StatefulSet': {
+        'spec.replicas': 1,
+        'spec.revisionHistoryLimit': 10,
+        'spec.podManagementPolicy': 'OrderedReady',
+        'spec.updateStrategy': {'type': 'RollingUpdate', 'rollingUpdate': {'partition': 0}},
+        'spec.persistentVolumeClaimRetentionPolicy': {'whenDeleted': 'Retain', 'whenScaled': 'Retain'},
+        'spec.volumeClaimTemplates[].apiVersion': 'v1',
+        'spec.volumeClaimTemplates[].kind': 'PersistentVolumeClaim',
+        'spec.volumeClaimTemplates[].spec.volumeMode': 'Filesystem',
+        **_prefixed('spec.template.spec', _POD_DEFAULTS),
+    },
+    'Job': _prefixed('spec', _JOB_DEFAULTS),
+    'CronJob': {
+        'spec.concurrencyPolicy': 'Allow',
+        'spec.suspend': False,
+        'spec.successfulJobsHistoryLimit': 3,
+        'spec.failedJobsHistoryLimit': 1,
+        'spec.jobTemplate.metadata': {},
+        # The Job defaults are only applied to the Jobs created from the template
+        **_prefixed('spec.jobTemplate.spec.template.spec', _POD_DEFAULTS),
+    },
+    'PersistentVolumeClaim': {
+        'spec.volumeMode': 'Filesystem',
+    },
+    'Service': {
+        'spec.type': 'ClusterIP',
+        'spec.sessionAffinity': 'None',
+        'spec.ports[].protocol': 'TCP',
+    },
+    'Secret': {
+        'type': 'Opaque',
+    },
+    # ServiceAccount, Role, RoleBinding, Ingress and ConfigMap have no defaulted fields
+}
+
+# Defaults that depend on the Service type
+_SERVICE_TYPE_DEFAULTS = {
+    'NodePort': {'externalTrafficPolicy': 'Cluster'},
+    'LoadBalancer': {'externalTrafficPolicy': 'Cluster', 'allocateLoadBalancerNodePorts': True},
+}
+
+# Fields assigned by the apiserver whose live value is never in Git
+KIND_IGNORED_FIELDS = {
+    'Service': ('spec.clusterIP', 'spec.clusterIPs', 'spec.ipFamilies', 'spec.ipFamilyPolicy',
+                'spec.internalTrafficPolicy'),
+    'Deployment': ('spec.template.metadata.creationTimestamp',),
+    'StatefulSet': ('spec.template.metadata.creationTimestamp', 'spec.volumeClaimTemplates[].status'),
+    'Job': ('spec.selector', 'spec.template.metadata.labels'),
+}
+
+# Fields a controller assigns when the manifest leaves them out (a node port, the
+# bound volume, the default storage or ingress class); compared only when the
+# manifest sets them
+KIND_ASSIGNED_FIELDS = {
+    'Service': ('spec.ports[].nodePort', 'spec.healthCheckNodePort'),
+    'PersistentVolumeClaim': ('spec.volumeName', 'spec.storageClassName'),
+    'Ingress': ('spec.ingressClassName',),
+    'ServiceAccount': ('secrets',),
+}
+
+# Values under these keys are resource quantities ("1000m" and "1" are equal)
+QUANTITY_KEYS = frozenset(['cpu', 'memory', 'storage', 'ephemeral-storage'])
+_QUANTITY_RE = re.compile(r'^([+-]?[0-9.]+)([a-zA-Z]*)$')
+_QUANTITY_SUFFIXES = {
+    '': 1, 'm': Decimal('0.001'), 'k': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9, 'T': 10 ** 12,
+    'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40,
+}
+
+# Kinds whose leaf values must not end up in a drift report
+REDACTED_KINDS = frozenset(['Secret'])
+
+
+def resource_key(obj):
+    """(group, kind, namespace, name) identity of a manifest or live object"""
+    group = obj.get('apiVersion', '').rpartition('/')[0]
+    metadata = obj.get('metadata') or {}
+    return (group, obj.get('kind', ''), metadata.get('namespace') or '', metadata.get('name', ''))
+
+
+def load_desired_manifests(directory, namespace=None):
+    """Load every object from the YAML files under directory, keyed by resource_key.
+
+    Objects without a namespace are placed in namespace (the sync target), as
+    ArgoCD does when it applies them.
+    """
+    desired = {}
+    paths = sorted(glob.glob(os.path.join(directory, '**', '*.y*ml'), recursive=True))
+    for path in paths:
+        with open(path) as f:
+            for obj in yaml.safe_load_all(f):
+                if not isinstance(obj, dict) or 'kind' not in obj:
+                    continue
+                # Hooks are run by ArgoCD, not kept in sync
+                annotations = (obj.get('metadata') or {}).get('annotations') or {}
+                if 'argocd.argoproj.io/hook' in annotations:
+                    continue
+                if namespace and not obj.get('metadata', {}).get('namespace'):
+                    obj.setdefault('metadata', {})['namespace'] = namespace
+                desired[resource_key(obj)] = obj
+    logging.info(f"📂 Loaded {len(desired)} desired objects from {directory}")
+    return desired
+
+
+def _parse_quantity(value):
+    match = _QUANTITY_RE.match(str(value))
+    if not match or match.group(2) not in _QUANTITY_SUFFIXES:
+        return value
+    try:
+        return format((Decimal(match.group(1)) * _QUANTITY_SUFFIXES[match.group(2)]).normalize(), 'f')
+    except InvalidOperation:
+        return value
+
+
+def _normalize_value(value, parent_key=None):
+    if isinstance(value, dict):
+        return {key: _normalize_value(item, key) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_normalize_value(item, parent_key) for item in value]
+    if parent_key in QUANTITY_KEYS and isinstance(value, (str, int, float)):
+        return _parse_quantity(value)
+    return value
+
+
+def _apply_default(node, parts, value):
+    """Set a default at a path inside node unless already present"""
+    if not isinstance(node, dict):
+        return
+    head = parts[0]
+    is_list = head.endswith('[]')
+    key = head[:-2] if is_list else head
+    if len(parts) == 1:
+        if key not in node:
+            node[key] = copy.deepcopy(value)
+        return
+    if key not in node:
+        return
+    children = node[key] if is_list else [node[key]]
+    for child in children if isinstance(children, list) else ():
+        _apply_default(child, parts[1:], value)
+
+
+def _image_pull_policy(image):
+    """Default the apiserver picks: Always for :latest or untagged images, else IfNotPresent"""
+    if '@' in image:
+        return 'IfNotPresent'
+    tag = image.rpartition('/')[2].partition(':')[2]
+    return 'Always' if tag in ('', 'latest') else 'IfNotPresent'
+
+
+def _pod_spec(normalized):
+    spec = normalized.get('spec') or {}
+    if normalized.get('kind') == 'Pod':
+        return spec
+    if normalized.get('kind') == 'CronJob':
+        spec = ((spec.get('jobTemplate') or {}).get('spec')) or {}
+    return ((spec.get('template') or {}).get('spec')) or {}
+
+
+def _fold_string_data(secret):
+    """stringData is write-only: the apiserver merges it into data (base64), overriding data"""
+    string_data = secret.pop('stringData', None)
+    if not string_data:
+        return
+    data = secret.setdefault('data', {})
+    for key, value in string_data.items():
+        data[key] = base64.b64encode(str(value).encode()).decode()
+
+
+def _remove_path(node, parts):
+    head = parts[0]
+    is_list = head.endswith('[]')
+    key = head[:-2] if is_list else head
+    if not isinstance(node, dict) or key not in node:
+        return
+    if len(parts) == 1:
+        del node[key]
+        return
+    children = node[key] if is_list else [node[key]]
+    for child in children if isinstance(children, list) else ():
+        _remove_path(child, parts[1:])
+
+
+def _has_path(node, parts):
+    """Whether the path is set in node (in any element, for '[]' parts)"""
+    head = parts[0]
+    is_list = head.endswith('[]')
+    key = head[:-2] if is_list else head
+    if not isinstance(node, dict) or key not in node:
+        return False
+    if len(parts) == 1:
+        return True
+    children = node[key] if is_list else [node[key]]
+    return any(_has_path(child, parts[1:]) for child in (children if isinstance(children, list) else ()))
+
+
+def normalize(obj, defaults=True):
+    """Canonical form of a desired or live object for comparison.
+
+    Drops status and server-populated metadata, fills in the defaults the
+    apiserver would apply, removes server-assigned fields and canonicalizes
+    resource quantities, so that only intentional differences remain.
+    """
+    kind = obj.get('kind', '')
+    normalized = _normalize_value({key: value for key, value in obj.items() if key != 'status'})
+
+    metadata = normalized.get('metadata') or {}
+    for field in SERVER_METADATA_FIELDS:
+        metadata.pop(field, None)
+    for field, server_keys in (('annotations', SERVER_ANNOTATIONS), ('labels', SERVER_LABELS)):
+        values = metadata.get(field)
+        if values is not None:
+            for key in server_keys:
+                values.pop(key, None)
+            if not values:
+                del metadata[field]
+
+    if kind == 'Secret':
+        _fold_string_data(normalized)
+
+    for path in KIND_IGNORED_FIELDS.get(kind, ()):
+        _remove_path(normalized, path.split('.'))
+    if defaults:
+        for path, value in KIND_DEFAULTS.get(kind, {}).items():
+            _apply_default(normalized, path.split('.'), value)
+
+    # Service targetPort defaults to port
+    if kind == 'Service':
+        spec = normalized.get('spec') or {}
+        for port in spec.get('ports') or []:
+            if isinstance(port, dict) and 'port' in port:
+                port.setdefault('targetPort', port['port'])
+        if defaults:
+            for field, value in _SERVICE_TYPE_DEFAULTS.get(spec.get('type'), {}).items():
+                spec.setdefault(field, value)
+    # imagePullPolicy defaults from the image tag
+    if defaults:
+        pod_spec = _pod_spec(normalized)
+        for field in ('containers', 'initContainers'):
+            for container in pod_spec.get(field) or []:
+                if isinstance(container, dict) and isinstance(container.get('image'), str):
+                    container.setdefault('imagePullPolicy', _image_pull_policy(container['image']))
+    return normalized
+
+
+class HashedNode:
+    """Normalized object tree with a content hash on every subtree.
+
+    Built bottom-up in one pass so that comparing two trees costs one hash
+    comparison per node visited, and identical subtrees are never descended.
+    """
+
+    __slots__ = ('digest', 'value', 'children')
+
+    def __init__(self, value):
+        if isinstance(value, dict):
+            self.children = {key: HashedNode(item) for key, item in value.items()}
+            self.value = None
+            self.digest = hash(('map', frozenset((key, child.digest)
+                                                 for key, child in self.children.items())))
+        elif isinstance(value, list):
+            self.children = [HashedNode(item) for item in value]
+            self.value = None
+            self.digest = hash(('list', tuple(child.digest for child in self.children)))
+        else:
+            self.children = None
+            self.value = value
+            self.digest = hash((type(value).__name__, value))
+
+    def to_value(self):
+        if isinstance(self.children, dict):
+            return {key: child.to_value() for key, child in self.children.items()}
+        if isinstance(self.children, list):
+            return [child.to_value() for child in self.children]
+        return self.value
+
+
+def _list_merge_key(desired, live):
+    """Lists of named maps (containers, env, ports, volumes) are matched by name, not position"""
+    for key in ('name', 'containerPort', 'mountPath'):
+        if all(isinstance(child.children, dict) and key in child.children
+               for child in desired + live):
+            return key
+    return None
+
+
+def _format_path(path):
+    formatted = ''
+    for part in path:
+        if isinstance(part, str) and not part.startswith('['):
+            formatted += f'.{part}' if formatted else part
+        else:
+            formatted += part if isinstance(part, str) else f'[{part}]'
+    return formatted
+
+
+def _drift(path, op, desired, live, redact):
+    """One field-level drift entry; op is from the live object's point of view"""
+    entry = {'path': _format_path(path), 'op': op}
+    if not redact:
+        entry['desired'] = desired.to_value() if desired is not None else None
+        entry['live'] = live.to_value() if live is not None else None
+    return entry
+
+
+def diff_trees(desired, live, path=(), drifts=None, redact=False):
+    """Field-level differences between two HashedNode trees.
+
+    Map keys only in the live tree are reported as 'added' (normalize() has
+    already filled in server defaults on both sides, so these were set out of
+    band). Lists of named maps are matched by name, other lists by position.
+    """
+    if drifts is None:
+        drifts = []
+    if desired.digest == live.digest:
+        return drifts
+
+    if isinstance(desired.children, dict) and isinstance(live.children, dict):
+        for key, child in desired.children.items():
+            live_child = live.children.get(key)
+            if live_child is None:
+                drifts.append(_drift(path + (key,), 'removed', child, None, redact))
+            else:
+                diff_trees(child, live_child, path + (key,), drifts, redact)
+        for key, live_child in live.children.items():
+            if key not in desired.children:
+                drifts.append(_drift(path + (key,), 'added', None, live_child, redact))
+        return drifts
+
+    if isinstance(desired.children, list) and isinstance(live.children, list):
+        merge_key = _list_merge_key(desired.children, live.children)
+        if merge_key is None:
+            if len(desired.children) != len(live.children):
+                drifts.append(_drift(path, 'changed', desired, live, redact))
+                return drifts
+            for index, (child, live_child) in enumerate(zip(desired.children, live.children)):
+                diff_trees(child, live_child, path + (index,), drifts, redact)
+            return drifts
+
+        live_by_key = {child.children[merge_key].value: child for child in live.children}
+        desired_keys = set()
+        for child in desired.children:
+            name = child.children[merge_key].value
+            desired_keys.add(name)
+            live_child = live_by_key.get(name)
+            if live_child is None:
+                drifts.append(_drift(path + (f'[{merge_key}={name}]',), 'removed', child, None, redact))
+            else:
+                diff_trees(child, live_child, path + (f'[{merge_key}={name}]',), drifts, redact)
+        for name, live_child in live_by_key.items():
+            if name not in desired_keys:
+                drifts.append(_drift(path + (f'[{merge_key}={name}]',), 'added', None, live_child, redact))
+        return drifts
+
+    drifts.append(_drift(path, 'changed', desired, live, redact))
+    return drifts
+
+
+def diff_object(desired, live):
+    """Field-level drift of one live object against its desired manifest"""
+    kind = desired.get('kind')
+    desired, live = normalize(desired), normalize(live)
+    for path in KIND_ASSIGNED_FIELDS.get(kind, ()):
+        parts = path.split('.')
+        if not _has_path(desired, parts):
+            _remove_path(live, parts)
+    return diff_trees(HashedNode(desired), HashedNode(live), redact=kind in REDACTED_KINDS)
+
+
+def diff_resources(desired_objects, live_objects):
+    """Compare desired manifests to live objects.
+
+    Both arguments map resource_key() to a raw object dict. Returns one entry
+    per drifted resource: kind, name, namespace, whether it is missing, and its
+    field-level drift list ({'path', 'op', 'desired', 'live'}).
+    """
+    results = []
+    for key, desired in desired_objects.items():
+        group, kind, namespace, name = key
+        live = live_objects.get(key)
+        if live is None:
+            results.append({'group': group, 'kind': kind, 'namespace': namespace, 'name': name,
+                            'missing': True, 'fields': []})
+            continue
+        fields = diff_object(desired, live)
+        if fields:
+            results.append({'group': group, 'kind': kind, 'namespace': namespace, 'name': name,
+                            'missing': False, 'fields': fields})
+    return results
@@ -0,0 +1,261 @@
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base for a metric family; children are keyed by label values"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for labelvalues, child in list(self._children.items()):
+            lines.extend(self._render_child(labelvalues, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, labelvalues, child):
+        return [f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}']
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Sample the gauge from a callable at scrape time"""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+    def _render_child(self, labelvalues, child):
+        return [f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.get())}']
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+        self.elapsed = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        self.child.observe(self.elapsed)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_child(self, labelvalues, child):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(bound)))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames=labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames=labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames=labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+WATCH_EVENTS = REGISTRY.counter(
+    'drift_controller_watch_events_total', 'Application watch events received', ['type'])
+WATCH_BYTES = REGISTRY.counter(
+    'drift_controller_watch_bytes_total', 'Bytes received from Application LIST and WATCH responses', ['phase'])
+WATCH_EVENT_LAG = REGISTRY.histogram(
+    'drift_controller_watch_event_lag_seconds', 'Delay between ArgoCD reconciledAt and event receipt')
+QUEUE_DEPTH = REGISTRY.gauge(
+    'drift_controller_queue_depth', 'Applications waiting in the remediation work queue')
+QUEUE_WAIT = REGISTRY.histogram(
+    'drift_controller_queue_wait_seconds', 'Time an application spent queued before a worker picked it up')
+ANALYSIS_DURATION = REGISTRY.histogram(
+    'drift_analyzer_analysis_duration_seconds', 'Drift analysis time per application',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5))
+DRIFT_REPORT_CACHE = REGISTRY.counter(
+    'drift_analyzer_report_cache_total', 'Drift report cache lookups', ['result'])
+PATCH_LATENCY = REGISTRY.histogram(
+    'drift_controller_patch_latency_seconds', 'Latency of Application PATCH calls', ['operation'])
+ROLLBACK_LATENCY = REGISTRY.histogram(
+    'drift_controller_rollback_latency_seconds', 'End-to-end latency of immediate rollbacks')
+REMEDIATIONS = REGISTRY.counter(
+    'drift_controller_remediations_total', 'Remediation actions executed', ['action', 'outcome'])
+REMEDIATIONS_SUPPRESSED = REGISTRY.counter(
+    'drift_controller_remediations_suppressed_total', 'Remediation actions suppressed by policy', ['reason'])
+NOTIFICATION_LATENCY = REGISTRY.histogram(
+    'drift_notifications_delivery_seconds', 'Notification delivery latency', ['channel', 'outcome'])
+NOTIFICATION_SENDS_SAVED = REGISTRY.counter(
+    'drift_notifications_sends_saved_total', 'Notification sends avoided by folding them into a digest')
+CHECKPOINT_SAVE_DURATION = REGISTRY.histogram(
+    'drift_controller_checkpoint_save_seconds', 'Time to snapshot and write the controller checkpoint')
+CHECKPOINT_BYTES = REGISTRY.gauge(
+    'drift_controller_checkpoint_bytes', 'Size of the last controller checkpoint written')
+POLICY_RELOADS = REGISTRY.counter(
+    'drift_controller_policy_reloads_total', 'Remediation policy reloads after a change of the policy file',
+    ['result'])
+OPERATIONS_IN_FLIGHT = REGISTRY.gauge(
+    'drift_controller_operations_in_flight', 'ArgoCD sync and rollback operations submitted and not yet finished')
+OPERATIONS_DEFERRED = REGISTRY.counter(
+    'drift_controller_operations_deferred_total',
+    'Operations not submitted because the Application was busy or the in-flight limit was reached', ['reason'])
+OPERATION_DURATION = REGISTRY.histogram(
+    'drift_controller_operation_duration_seconds', 'Time from submitting an ArgoCD operation to seeing it finish',
+    ['operation', 'phase'], buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0))
@@ -1,13 +1,206 @@
 import logging
 import json
+import queue
+import threading
+import time
 import requests
 import smtplib
+from concurrent.futures import Future
 from datetime import datetime
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from requests.adapters import HTTPAdapter
+from metrics import NOTIFICATION_LATENCY, NOTIFICATION_SENDS_SAVED
+
+class DeliveryPipeline:
+    """Bounded queue drained by a pool of delivery threads.
+
+    submit() returns a concurrent.futures.Future that resolves to the result of
+    the delivery call (or its exception). When the queue stays full for longer
+    than enqueue_timeout the future fails immediately instead of blocking the
+    caller.
+    """
+
+    def __init__(self, workers=4, queue_size=1000, enqueue_timeout=0.5):
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self.dropped = 0
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f"notification-worker-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        try:
+            self._queue.put((future, func, args, kwargs), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.dropped += 1
+            future.set_exception(RuntimeError("notification queue full"))
+        return future
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every queued delivery has finished"""
+        self._queue.join()
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                future, func, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+class NotificationCoalescer:
+    """Holds non-critical notifications for a short window and emits one digest per group.
+
+    Notifications are grouped by (severity, channel). The first notification of a
+    group starts a window_seconds timer; when it fires the whole group is sent as
+    a single digest listing at most max_apps_listed applications, and no more
+    than fit in max_digest_bytes once rendered by the channel's template.
+    """
+
+    def __init__(self, handler, window_seconds=30, max_apps_listed=50, max_digest_bytes=4000):
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_apps_listed = max_apps_listed
+        self.max_digest_bytes = max_digest_bytes
+        self._groups = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.digests_sent = 0
+
+    def add(self, severity, channel, data):
+        """Buffer a notification; the returned Future resolves with the digest delivery result"""
+        future = Future()
+        key = (severity, channel)
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                group = []
+                self._groups[key] = group
+                timer = threading.Timer(self.window_seconds, self.flush_group, args=(key,))
+                timer.daemon = True
+                timer.start()
+            group.append((data, future))
+        return future
+
+    def flush_group(self, key):
+        with self._lock:
+            group = self._groups.pop(key, None)
+        if not group:
+            return
+        
+        severity, channel = key
+        items = [data for data, _ in group]
+        if len(items) == 1:
+            delivery = self.handler._channel_delivery(channel, items[0], 'drift_detected')
+        else:
+            delivery = self.handler._channel_delivery(channel, self._build_digest(severity, channel, items),
+                                                      'drift_digest')
+        
+        with self._lock:
+            self.coalesced += len(items)
+            self.digests_sent += 1
+        NOTIFICATION_SENDS_SAVED.inc(len(items) - 1)
+        
+        if delivery is None:
+            for _, future in group:
+                future.set_result(None)
+            return
+        
+        digest_future = self.handler._dispatch([delivery])[channel]
+        
+        def propagate(result, group=group):
+            for _, future in group:
+                if result.exception() is not None:
+                    future.set_exception(result.exception())
+                else:
+                    future.set_result(result.result())
+        digest_future.add_done_callback(propagate)
+
+    def flush(self):
+        """Send every pending group immediately"""
+        with self._lock:
+            keys = list(self._groups)
+        for key in keys:
+            self.flush_group(key)
+
+    def _build_digest(self, severity, channel, items):
+        apps = [item['app_name'] for item in items[:self.max_apps_listed]]
+        digest = {
+            'app_name': f"{len(items)} applications",
+            'message': f"{len(items)} applications drifted within {self.window_seconds}s",
+            'severity': severity,
+            'timestamp': datetime.now().isoformat(),
+            'apps': apps,
+            'omitted': len(items) - len(apps),
+            # A single oversized message must not crowd out the application list
+            'first_message': items[0]['message'][:500]
+        }
+        render = self.handler.templates['drift_digest'].get(channel)
+        if render is None:
+            return digest
+        
+        def rendered_size(listed):
+            trial = dict(digest, apps=apps[:listed], omitted=len(items) - listed)
+            return len(render(trial).encode())
+        
+        # Most applications whose rendered digest still fits (the size grows with each one listed)
+        low, high = 0, len(apps)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if rendered_size(middle) <= self.max_digest_bytes:
+                low = middle
+            else:
+                high = middle - 1
+        digest['apps'] = apps[:low]
+        digest['omitted'] = len(items) - low
+        return digest
+
+    def stats(self):
+        with self._lock:
+            return {
+                'notifications_coalesced': self.coalesced,
+                'digests_sent': self.digests_sent,
+                'sends_saved': self.coalesced - self.digests_sent,
+                'pending': sum(len(group) for group in self._groups.values())
+            }
 
 class NotificationHandler:
-    def __init__(self):
+    def __init__(self, async_delivery=True, workers=4, queue_size=1000,
+                 request_timeout=(3.05, 10), pool_size=10,
+                 coalesce_window_seconds=None, digest_max_apps=50, digest_max_bytes=4000):
+        self.request_timeout = request_timeout
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self.pipeline = DeliveryPipeline(workers=workers, queue_size=queue_size) if async_delivery else None
+        self.coalescer = None
+        if coalesce_window_seconds:
+            self.coalescer = NotificationCoalescer(self, window_seconds=coalesce_window_seconds,
+                                                   max_apps_listed=digest_max_apps,
+                                                   max_digest_bytes=digest_max_bytes)
+        
         self.channels = {
             'slack': {
                 'webhook_url': None,  # Set from config
@@ -41,6 +234,11 @@ class NotificationHandler:
                 'title': '🚨 EMERGENCY: Critical Drift Detected',
                 'slack': self._slack_emergency_template,
                 'email': self._email_emergency_template
+            },
+            'drift_digest': {
+                'title': '🚨 Configuration Drift Detected in Multiple Applications',
+                'slack': self._slack_digest_template,
+                'email': self._email_digest_template
             }
         }
 
@@ -49,29 +247,46 @@ class NotificationHandler:
         if channels is None:
             channels = self._get_channels_for_severity(severity)
         
-        notification_data = {
+        notification_data = self._notification_data(app_name, message, severity)
+        
+        # Critical notifications bypass the coalescing window
+        if self.coalescer is not None and severity != 'critical':
+            logging.info(f"📥 Queued {severity} notification for {app_name} into digest")
+            return {channel: self.coalescer.add(severity, channel, notification_data) for channel in channels}
+        
+        logging.info(f"📢 Sending {severity} notification for {app_name}")
+        
+        deliveries = []
+        for channel in channels:
+            delivery = self._channel_delivery(channel, notification_data, 'drift_detected')
+            if delivery is not None:
+                deliveries.append(delivery)
+        
+        return self._dispatch(deliveries)
+
+    def _notification_data(self, app_name, message, severity):
+        return {
             'app_name': app_name,
             'message': message,
             'severity': severity,
             'timestamp': datetime.now().isoformat()
         }
-        
-        logging.info(f"📢 Sending {severity} notification for {app_name}")
-        
-        for channel in channels:
-            try:
-                if channel == 'slack':
-                    self._send_slack_notification(notification_data, 'drift_detected')
-                elif channel == 'email':
-                    self._send_email_notification(notification_data, 'drift_detected')
-                elif channel == 'pagerduty':
-                    self._send_pagerduty_alert(notification_data)
-                    
-            except Exception as e:
-                logging.error(f"Failed to send {channel} notification: {e}")
+
+    def _channel_delivery(self, channel, data, template_type):
+        """Build the (channel, func, args, kwargs) delivery for a standard notification"""
+        if channel == 'slack':
+            return (channel, self._send_slack_notification, (data, template_type), {})
+        elif channel == 'email':
+            return (channel, self._send_email_notification, (data, template_type), {})
+        elif channel == 'pagerduty':
+            return (channel, self._send_pagerduty_alert, (data,), {})
+        return None
 
     def send_critical_alert(self, app_name, message, details=None):
         """Send critical alert with immediate escalation"""
+        return self._dispatch(self._critical_alert_deliveries(app_name, message, details))
+
+    def _critical_alert_deliveries(self, app_name, message, details=None):
         alert_data = {
             'app_name': app_name,
             'message': message,
@@ -84,19 +299,20 @@ class NotificationHandler:
         logging.critical(f"🚨 CRITICAL ALERT: {app_name} - {message}")
         
         # Send to all channels for critical alerts
-        try:
-            self._send_slack_notification(alert_data, 'emergency_alert')
-            self._send_email_notification(alert_data, 'emergency_alert')
-            self._send_pagerduty_alert(alert_data, severity='critical')
-            
+        return [
+            ('slack', self._send_slack_notification, (alert_data, 'emergency_alert'), {}),
+            ('email', self._send_email_notification, (alert_data, 'emergency_alert'), {}),
+            ('pagerduty', self._send_pagerduty_alert, (alert_data,), {'severity': 'critical'}),
             # Additional escalation for critical alerts
-            self._trigger_oncall_escalation(alert_data)
-            
-        except Exception as e:
-            logging.error(f"Failed to send critical alert: {e}")
+            ('oncall', self._trigger_oncall_escalation, (alert_data,), {})
+        ]
+
+    def send_remediation_complete(self, app_name, action, status, duration=None, channels=None):
+        """Send notification when remediation is complete (to channels, default slack and email)"""
+        logging.info(f"✅ Remediation complete notification for {app_name}")
+        return self._dispatch(self._remediation_deliveries(app_name, action, status, duration, channels))
 
-    def send_remediation_complete(self, app_name, action, status, duration=None):
-        """Send notification when remediation is complete"""
+    def _remediation_deliveries(self, app_name, action, status, duration=None, channels=None):
         remediation_data = {
             'app_name': app_name,
             'action': action,
@@ -104,15 +320,76 @@ class NotificationHandler:
             'duration': duration,
             'timestamp': datetime.now().isoformat()
         }
-        
-        logging.info(f"✅ Remediation complete notification for {app_name}")
-        
-        try:
-            self._send_slack_notification(remediation_data, 'remediation_complete')
-            self._send_email_notification(remediation_data, 'remediation_complete')
-            
-        except Exception as e:
-            logging.error(f"Failed to send remediation notification: {e}")
+        deliveries = [self._channel_delivery(channel, remediation_data, 'remediation_complete')
+                      for channel in (channels if channels is not None else ('slack', 'email'))]
+        return [delivery for delivery in deliveries if delivery is not None]
+
+    def _dispatch(self, deliveries):
+        """Fan deliveries out across channels; returns {channel: Future}"""
+        futures = {}
+        for channel, func, args, kwargs in deliveries:
+            func = self._timed_delivery(channel, func)
+            if self.pipeline is not None:
+                future = self.pipeline.submit(func, *args, **kwargs)
+            else:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            future.add_done_callback(lambda f, channel=channel: self._log_delivery_outcome(channel, f))
+            futures[channel] = future
+        return futures
+
+    def _timed_delivery(self, channel, func):
+        """Wrap a delivery call so its latency and outcome are recorded"""
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'failed' if result is False else 'success'
+                return result
+            finally:
+                NOTIFICATION_LATENCY.labels(channel, outcome).observe(time.perf_counter() - started)
+        return timed
+
+    def _log_delivery_outcome(self, channel, future):
+        error = future.exception()
+        if error is not None:
+            logging.error(f"Failed to send {channel} notification: {error}")
+
+    def _session(self, channel):
+        """Pooled keep-alive HTTP session per channel"""
+        with self._sessions_lock:
+            session = self._sessions.get(channel)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[channel] = session
+            return session
+
+    def flush(self):
+        """Send pending digests and wait for all queued deliveries to finish"""
+        if self.coalescer is not None:
+            self.coalescer.flush()
+        if self.pipeline is not None:
+            self.pipeline.join()
+
+    def close(self):
+        """Drain the delivery pipeline and close pooled sessions"""
+        if self.coalescer is not None:
+            self.coalescer.flush()
+        if self.pipeline is not None:
+            self.pipeline.shutdown()
+            self.pipeline = None
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
 
     def _get_channels_for_severity(self, severity):
         """Get notification channels based on severity"""
@@ -130,22 +407,25 @@ class NotificationHandler:
         if not webhook_url:
             logging.info(f"DEMO: Would send Slack notification - {template_type}")
             self._log_demo_notification('Slack', data, template_type)
-            return
+            return True
         
-        message = self.templates[template_type]['slack'](data)
-        
-        payload = {
-            'channel': self.channels['slack']['channel'],
-            'username': self.channels['slack']['username'],
-            'text': message,
-            'icon_emoji': self._get_emoji_for_severity(data.get('severity', 'medium'))
-        }
-        
-        response = requests.post(webhook_url, json=payload)
+        payload = self._slack_payload(data, template_type)
+        response = self._session('slack').post(webhook_url, json=payload, timeout=self.request_timeout)
         if response.status_code == 200:
             logging.info(f"✅ Slack notification sent successfully")
+            return True
         else:
             logging.error(f"❌ Slack notification failed: {response.status_code}")
+            return False
+
+    def _slack_payload(self, data, template_type):
+        """Slack webhook body for a templated notification"""
+        return {
+            'channel': self.channels['slack']['channel'],
+            'username': self.channels['slack']['username'],
+            'text': self.templates[template_type]['slack'](data),
+            'icon_emoji': self._get_emoji_for_severity(data.get('severity', 'medium'))
+        }
 
     def _send_email_notification(self, data, template_type):
         """Send email notification"""
@@ -154,10 +434,10 @@ class NotificationHandler:
         # Demo mode - just log
         logging.info(f"DEMO: Would send email notification - {template_type}")
         self._log_demo_notification('Email', data, template_type)
-        return
+        return True
         
         # Production email sending code would go here
-        # msg = MimeMultipart()
+        # msg = MIMEMultipart()
         # msg['From'] = smtp_config['from_address']
         # msg['To'] = ', '.join(smtp_config['to_addresses'])
         # msg['Subject'] = self.templates[template_type]['title']
@@ -169,10 +449,11 @@ class NotificationHandler:
         if not integration_key:
             logging.info(f"DEMO: Would send PagerDuty alert - {severity}")
             self._log_demo_notification('PagerDuty', data, 'alert')
-            return
+            return True
         
         # PagerDuty Events API v2 implementation would go here
         logging.info(f"📟 PagerDuty alert triggered for {data['app_name']}")
+        return True
 
     def _trigger_oncall_escalation(self, alert_data):
         """Trigger additional on-call escalation for critical alerts"""
@@ -180,6 +461,7 @@ class NotificationHandler:
         logging.critical(f"📧 Email sent to: oncall@company.com")
         logging.critical(f"📱 SMS sent to on-call engineer")
         logging.critical(f"☎️  Phone call initiated to primary on-call")
+        return True
 
     def _log_demo_notification(self, channel, data, template_type):
         """Log demo notification for presentation purposes"""
@@ -227,6 +509,17 @@ class NotificationHandler:
 *IMMEDIATE ACTION REQUIRED*
 *On-call team has been notified*"""
 
+    def _slack_digest_template(self, data):
+        apps = '\n'.join(f"• <https://argocd.company.com/applications/{app}|{app}>" for app in data['apps'])
+        more = f"\n…and {data['omitted']} more" if data['omitted'] else ''
+        return f"""🚨 *Configuration Drift Detected in {data['app_name']}*
+*Severity:* {data['severity'].upper()}
+*Message:* {data['first_message']}
+*Time:* {data['timestamp']}
+
+*Applications:*
+{apps}{more}"""
+
     def _email_drift_template(self, data):
         return f"""Configuration drift detected in application {data['app_name']}.
         
@@ -236,6 +529,18 @@ Timestamp: {data['timestamp']}
 
 Please review the application in ArgoCD and take appropriate action."""
 
+    def _email_digest_template(self, data):
+        apps = '\n'.join(f"  - {app}" for app in data['apps'])
+        more = f"\n  ...and {data['omitted']} more" if data['omitted'] else ''
+        return f"""Configuration drift detected in {data['app_name']}.
+        
+Severity: {data['severity']}
+Message: {data['first_message']}
+Timestamp: {data['timestamp']}
+
+Applications:
+{apps}{more}"""
+
     def _email_remediation_template(self, data):
         return f"""Drift remediation completed for application {data['app_name']}.
         
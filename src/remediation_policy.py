@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import os
+import threading
+from types import MappingProxyType
+
+import yaml
+
+from metrics import POLICY_RELOADS
+
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+ACTIONS = ('auto_sync', 'notify_and_timeout', 'immediate_rollback', 'emergency_stop')
+CHANNELS = ('slack', 'email', 'pagerduty', 'phone')
+DEFAULT_SEVERITY = 'low'
+POLICY_DATA_KEY = 'policies.yaml'
+DEFAULT_POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config',
+                                   'remediation_policies.yaml')
+
+# field -> (type, default) for every entry of remediation_matrix
+POLICY_FIELDS = {
+    'approval_required': (bool, False),
+    'cooldown_minutes': (int, 0),
+    'max_retries': (int, None),
+    'timeout_hours': (int, None),
+    'escalation_hours': (int, None),
+    'notify_oncall': (bool, False),
+}
+
+
+class PolicyError(ValueError):
+    pass
+
+
+def parse_policy_document(text):
+    """Policy document from YAML text: the policies file itself, or the ConfigMap manifest wrapping it"""
+    document = yaml.safe_load(text)
+    if isinstance(document, dict) and document.get('kind') == 'ConfigMap':
+        data = document.get('data') or {}
+        if POLICY_DATA_KEY not in data:
+            raise PolicyError(f"ConfigMap has no {POLICY_DATA_KEY} key")
+        document = yaml.safe_load(data[POLICY_DATA_KEY])
+    if not isinstance(document, dict) or not isinstance(document.get('remediation_matrix'), dict):
+        raise PolicyError("policy document has no remediation_matrix mapping")
+    return document
+
+
+def compile_policy(severity, entry):
+    """Validate one remediation_matrix entry into an immutable policy with every field present"""
+    if not isinstance(entry, dict):
+        raise PolicyError(f"{severity}: policy must be a mapping")
+    unknown = set(entry) - set(POLICY_FIELDS) - {'action', 'notification_channels'}
+    if unknown:
+        raise PolicyError(f"{severity}: unknown fields {', '.join(sorted(unknown))}")
+    action = entry.get('action')
+    if action not in ACTIONS:
+        raise PolicyError(f"{severity}: action must be one of {', '.join(ACTIONS)}, got {action!r}")
+
+    policy = {'severity': severity, 'action': action}
+    for field, (kind, default) in POLICY_FIELDS.items():
+        value = entry.get(field, default)
+        # bool is an int subclass; a true/false where a number belongs is a typo
+        if value is not None and (not isinstance(value, kind) or (kind is int and isinstance(value, bool))):
+            raise PolicyError(f"{severity}: {field} must be {kind.__name__}, got {value!r}")
+        if kind is int and value is not None and value < 0:
+            raise PolicyError(f"{severity}: {field} must not be negative")
+        policy[field] = value
+
+    channels = entry.get('notification_channels', [])
+    if not isinstance(channels, list) or any(channel not in CHANNELS for channel in channels):
+        raise PolicyError(f"{severity}: notification_channels must be a list drawn from {', '.join(CHANNELS)}")
+    policy['notification_channels'] = tuple(channels)
+    return MappingProxyType(policy)
+
+
+class PolicyTable:
+    """Severity -> compiled policy, with unknown severities resolved to the default once, up front"""
+
+    def __init__(self, policies, version, source=None):
+        self.version = version
+        self.source = source
+        self._policies = dict(policies)
+        self._default = self._policies[DEFAULT_SEVERITY]
+
+    @classmethod
+    def compile(cls, document, version=None, source=None):
+        matrix = document['remediation_matrix']
+        unknown = set(matrix) - set(SEVERITIES)
+        if unknown:
+            raise PolicyError(f"unknown severities {', '.join(sorted(unknown))}")
+        if DEFAULT_SEVERITY not in matrix:
+            raise PolicyError(f"remediation_matrix needs a {DEFAULT_SEVERITY} entry (the fallback)")
+        policies = {severity: compile_policy(severity, entry) for severity, entry in matrix.items()}
+        return cls(policies, version, source)
+
+    def resolve(self, severity):
+        return self._policies.get(severity, self._default)
+
+    def severities(self):
+        return list(self._policies)
+
+    def __contains__(self, severity):
+        return severity in self._policies
+
+
+def load_policy_table(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:12]
+    return PolicyTable.compile(parse_policy_document(raw.decode()), version=version, source=path)
+
+
+class RemediationPolicyEngine:
+    """Remediation policies compiled from a YAML file and hot-reloaded when it changes.
+
+    The file is stat()ed every poll_interval seconds; a ConfigMap volume update
+    (an atomic symlink swap) or a local edit changes its inode, size or mtime.
+    Only then is it parsed and compiled, off the event path, and the new table
+    replaces the old one in a single reference swap. A file that fails to load
+    or validate keeps the previous table in force.
+    """
+
+    def __init__(self, path=None, poll_interval=5.0):
+        self.path = path or DEFAULT_POLICY_PATH
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread = None
+        # Fail fast on a missing or invalid file at startup
+        self.table = self._load()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load(self):
+        self._stamp = self._file_stamp()
+        table = load_policy_table(self.path)
+        logging.info(f"📜 Loaded remediation policies {table.version} from {self.path}: "
+                     + ', '.join(f"{severity}={table.resolve(severity)['action']}"
+                                 for severity in table.severities()))
+        return table
+
+    def resolve(self, severity):
+        return self.table.resolve(severity)
+
+    def reload(self, force=False):
+        """Re-load the file if it changed; returns whether a new table is in force"""
+        if not force and self._file_stamp() == self._stamp:
+            return False
+        try:
+            table = self._load()
+        except (OSError, yaml.YAMLError, PolicyError) as e:
+            # The stamp is already updated, so this is reported once per change of the file
+            logging.error(f"❌ Keeping remediation policies {self.table.version}: {e}")
+            POLICY_RELOADS.labels('failed').inc()
+            return False
+        if table.version == self.table.version:
+            return False
+        self.table = table
+        self.reloads += 1
+        POLICY_RELOADS.labels('success').inc()
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='policy-reloader')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def stop(self):
+        self._stop.set()
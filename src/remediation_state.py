@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RemediationState:
+    """Per-application remediation bookkeeping"""
+
+    __slots__ = ('last_action_time', 'last_success_time', 'attempt_times', 'last_outcome', 'last_action',
+                 'touched')
+
+    def __init__(self):
+        self.last_action_time = None
+        # Cooldowns run from the last successful action; failed attempts retry with backoff
+        self.last_success_time = None
+        # Wall-clock times of the attempts still inside the attempt window, oldest first
+        self.attempt_times = deque()
+        self.last_outcome = None
+        self.last_action = None
+        self.touched = time.monotonic()
+
+    @property
+    def attempts(self):
+        return len(self.attempt_times)
+
+    def to_dict(self):
+        return {
+            'last_action_time': self.last_action_time,
+            'last_success_time': self.last_success_time,
+            'attempt_times': list(self.attempt_times),
+            'last_outcome': self.last_outcome,
+            'last_action': self.last_action
+        }
+
+
+class RemediationStateTracker:
+    """Bounded per-app remediation state table enforcing cooldown_minutes and max_retries.
+
+    Entries are kept in LRU order, capped at max_entries and dropped once they
+    have not been touched for ttl_seconds. max_retries counts the attempts made
+    within the last attempt_window_seconds, whether or not the application went
+    back to Synced in between, so an application that keeps drifting again
+    after each sync runs out of retries. The cooldown starts from the last
+    successful action only; a failed attempt can be retried straight away.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=24 * 3600, attempt_window_seconds=3600, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.attempt_window_seconds = attempt_window_seconds
+        self.clock = clock
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = {'cooldown': 0, 'max_retries': 0}
+        self.evicted = 0
+        # Bumped on every change so checkpoints can skip unchanged state
+        self.version = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
+
+    def get(self, app_name):
+        with self._lock:
+            return self._states.get(app_name)
+
+    def check(self, app_name, policy):
+        """Return (allowed, reason, retry_after_seconds) for a remediation attempt"""
+        cooldown = policy.get('cooldown_minutes', 0) * 60
+        max_retries = policy.get('max_retries')
+
+        with self._lock:
+            state = self._states.get(app_name)
+            if state is None:
+                return True, None, 0
+            now = self.clock()
+            self._expire_attempts(state, now)
+
+            if max_retries is not None and state.attempts >= max_retries:
+                self.suppressed['max_retries'] += 1
+                # A retry frees up when the oldest counted attempt leaves the window
+                retry_after = (state.attempt_times[-max_retries] + self.attempt_window_seconds - now
+                               if max_retries else self.attempt_window_seconds)
+                return False, 'max_retries', retry_after
+
+            if state.last_success_time is not None and cooldown > 0:
+                remaining = state.last_success_time + cooldown - now
+                if remaining > 0:
+                    self.suppressed['cooldown'] += 1
+                    return False, 'cooldown', remaining
+
+        return True, None, 0
+
+    def _expire_attempts(self, state, now):
+        cutoff = now - self.attempt_window_seconds
+        while state.attempt_times and state.attempt_times[0] <= cutoff:
+            state.attempt_times.popleft()
+
+    def record(self, app_name, action, success):
+        """Record a remediation attempt and its outcome (None while it is still running)"""
+        with self._lock:
+            state = self._states.get(app_name)
+            if state is None:
+                state = RemediationState()
+                self._states[app_name] = state
+            else:
+                self._states.move_to_end(app_name)
+            now = self.clock()
+            self._expire_attempts(state, now)
+            state.last_action_time = now
+            state.attempt_times.append(now)
+            state.last_action = action
+            state.last_outcome = 'pending' if success is None else 'success' if success else 'failed'
+            if success:
+                state.last_success_time = now
+            state.touched = time.monotonic()
+            self.version += 1
+            self._evict()
+
+    def complete(self, app_name, success):
+        """Record how an attempt recorded as pending ended; the cooldown starts only on success"""
+        with self._lock:
+            state = self._states.get(app_name)
+            if state is None:
+                return
+            self._states.move_to_end(app_name)
+            state.last_outcome = 'success' if success else 'failed'
+            if success:
+                state.last_success_time = self.clock()
+            state.touched = time.monotonic()
+            self.version += 1
+
+    def reset(self, app_name):
+        """Forget an application entirely (it was deleted)"""
+        with self._lock:
+            if self._states.pop(app_name, None) is not None:
+                self.version += 1
+
+    def snapshot(self):
+        """Per-app state in LRU order, for checkpoints"""
+        with self._lock:
+            return {app_name: state.to_dict() for app_name, state in self._states.items()}
+
+    def restore(self, states):
+        """Load states saved by snapshot(); the TTL restarts from now"""
+        with self._lock:
+            for app_name, saved in states.items():
+                state = RemediationState()
+                state.last_action_time = saved.get('last_action_time')
+                state.last_success_time = saved.get('last_success_time')
+                state.attempt_times = deque(saved.get('attempt_times', ()))
+                state.last_outcome = saved.get('last_outcome')
+                state.last_action = saved.get('last_action')
+                self._states[app_name] = state
+                self._states.move_to_end(app_name)
+            self.version += 1
+            self._evict()
+
+    def _evict(self):
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+            self.evicted += 1
+
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._states:
+            oldest = next(iter(self._states.values()))
+            if oldest.touched >= cutoff:
+                break
+            self._states.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked_apps': len(self._states),
+                'suppressed_cooldown': self.suppressed['cooldown'],
+                'suppressed_max_retries': self.suppressed['max_retries'],
+                'suppressed_total': sum(self.suppressed.values()),
+                'evicted': self.evicted
+            }
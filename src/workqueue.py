@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import heapq
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Global token-bucket rate limiter (qps tokens per second, up to burst)"""
+
+    def __init__(self, qps=10.0, burst=100):
+        self.qps = float(qps)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take one token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.qps)
+            self._last = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.qps
+
+
+class ItemExponentialBackoff:
+    """Per-item exponential backoff: base * 2^failures, capped at max_delay"""
+
+    def __init__(self, base_delay=0.5, max_delay=300.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def when(self, item):
+        with self._lock:
+            failures = self._failures.get(item, 0)
+            self._failures[item] = failures + 1
+        return min(self.base_delay * (2 ** failures), self.max_delay)
+
+    def num_requeues(self, item):
+        with self._lock:
+            return self._failures.get(item, 0)
+
+    def forget(self, item):
+        with self._lock:
+            self._failures.pop(item, None)
+
+
+class RateLimitingQueue:
+    """Keyed, deduplicating work queue.
+
+    An item that is already waiting is collapsed into a single entry, and an item
+    that is currently being processed is re-queued only once processing is done,
+    so the same key is never handled by two workers at the same time.
+    """
+
+    def __init__(self, backoff=None, bucket=None, wait_observer=None):
+        self.backoff = backoff or ItemExponentialBackoff()
+        self.bucket = bucket or TokenBucket()
+        self.wait_observer = wait_observer
+        self._queue = deque()
+        self._dirty = set()
+        self._enqueued_at = {}
+        self._processing = set()
+        self._delayed = []
+        self._delayed_seq = 0
+        self._ready_at = {}     # item -> earliest pending add_after; later heap entries are stale
+        self._cond = threading.Condition()
+        self._shutting_down = False
+
+        self.added = 0
+        self.deduplicated = 0
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queue)
+
+    def add(self, item):
+        with self._cond:
+            if self._shutting_down:
+                return
+            self.added += 1
+            if item in self._dirty:
+                self.deduplicated += 1
+                return
+            self._dirty.add(item)
+            self._enqueued_at.setdefault(item, time.monotonic())
+            if item in self._processing:
+                return
+            self._queue.append(item)
+            self._cond.notify()
+
+    def add_after(self, item, delay):
+        if delay <= 0:
+            self.add(item)
+            return
+        with self._cond:
+            if self._shutting_down:
+                return
+            ready = time.monotonic() + delay
+            earliest = self._ready_at.get(item)
+            if earliest is not None and earliest <= ready:
+                return
+            self._ready_at[item] = ready
+            self._delayed_seq += 1
+            heapq.heappush(self._delayed, (ready, self._delayed_seq, item))
+            self._cond.notify()
+
+    def add_rate_limited(self, item):
+        """Re-queue an item once its per-item backoff has elapsed"""
+        self.add_after(item, self.backoff.when(item))
+
+    def forget(self, item):
+        self.backoff.forget(item)
+
+    def num_requeues(self, item):
+        return self.backoff.num_requeues(item)
+
+    def _promote_delayed(self):
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            ready, _, item = heapq.heappop(self._delayed)
+            if self._ready_at.get(item) != ready:
+                continue
+            del self._ready_at[item]
+            self.add(item)  # Condition wraps an RLock, so re-entry is safe
+
+    def get(self, timeout=None):
+        """Block until an item is available; returns None on shutdown or timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._promote_delayed()
+                if self._queue:
+                    break
+                if self._shutting_down:
+                    return None
+                wait = None
+                if self._delayed:
+                    wait = max(self._delayed[0][0] - time.monotonic(), 0)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+            item = self._queue.popleft()
+            self._processing.add(item)
+            self._dirty.discard(item)
+            enqueued_at = self._enqueued_at.pop(item, None)
+        if self.wait_observer is not None and enqueued_at is not None:
+            self.wait_observer(time.monotonic() - enqueued_at)
+        return item
+
+    def done(self, item):
+        """Mark processing finished; re-queue if the item was added again meanwhile"""
+        with self._cond:
+            self._processing.discard(item)
+            if item in self._dirty:
+                self._queue.append(item)
+                self._cond.notify()
+
+    def shutdown(self):
+        with self._cond:
+            self._shutting_down = True
+            self._cond.notify_all()
+
+
+class WorkerPool:
+    """Pool of threads draining a RateLimitingQueue through a handler.
+
+    The handler returning False or raising re-queues the item with backoff; any
+    other result forgets the item's failure history. Workers take a token from
+    the queue's global bucket before starting each item.
+    """
+
+    def __init__(self, queue, handler, workers=4, name='remediation-worker'):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.name = name
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"⚙️  Started {self.workers} {self.name} threads")
+
+    def stop(self, timeout=None):
+        self.queue.shutdown()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                wait = self.queue.bucket.reserve()
+                if wait > 0:
+                    time.sleep(wait)
+                ok = self.handler(item)
+            except Exception as e:
+                logging.error(f"Worker failed processing {item}: {e}")
+                ok = False
+            try:
+                if ok is False:
+                    self.queue.add_rate_limited(item)
+                else:
+                    self.queue.forget(item)
+            finally:
+                self.queue.done(item)
+
+
+class AsyncRateLimitingQueue:
+    """asyncio counterpart of RateLimitingQueue with the same deduplication rules.
+
+    get() is a coroutine; add() and add_after() may be called from any thread and
+    are handed to the event loop when called from outside it.
+    """
+
+    def __init__(self, backoff=None, bucket=None, wait_observer=None):
+        self.backoff = backoff or ItemExponentialBackoff()
+        self.bucket = bucket or TokenBucket()
+        self.wait_observer = wait_observer
+        self._queue = deque()
+        self._dirty = set()
+        self._enqueued_at = {}
+        self._processing = set()
+        self._waiters = deque()
+        self._delayed = {}      # item -> TimerHandle of its earliest pending add_after
+        self._loop = None
+        self._loop_thread = None
+        self._shutting_down = False
+
+        self.added = 0
+        self.deduplicated = 0
+
+    def bind(self, loop):
+        """Attach to the event loop that will run the consumers"""
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _off_loop(self):
+        return self._loop is not None and threading.get_ident() != self._loop_thread
+
+    def add(self, item):
+        if self._off_loop():
+            self._loop.call_soon_threadsafe(self.add, item)
+            return
+        if self._shutting_down:
+            return
+        self.added += 1
+        if item in self._dirty:
+            self.deduplicated += 1
+            return
+        self._dirty.add(item)
+        self._enqueued_at.setdefault(item, time.monotonic())
+        if item in self._processing:
+            return
+        self._queue.append(item)
+        self._wake_one()
+
+    def add_after(self, item, delay):
+        if delay <= 0:
+            self.add(item)
+            return
+        if self._off_loop():
+            self._loop.call_soon_threadsafe(self.add_after, item, delay)
+            return
+        if self._shutting_down:
+            return
+        pending = self._delayed.get(item)
+        if pending is not None:
+            if pending.when() <= self._loop.time() + delay:
+                return
+            pending.cancel()
+
+        def fire():
+            del self._delayed[item]
+            self.add(item)
+
+        self._delayed[item] = self._loop.call_later(delay, fire)
+
+    def add_rate_limited(self, item):
+        self.add_after(item, self.backoff.when(item))
+
+    def forget(self, item):
+        self.backoff.forget(item)
+
+    def num_requeues(self, item):
+        return self.backoff.num_requeues(item)
+
+    def _wake_one(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def get(self):
+        """Wait for an item; returns None once the queue is shut down"""
+        while not self._queue:
+            if self._shutting_down:
+                return None
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+        item = self._queue.popleft()
+        self._processing.add(item)
+        self._dirty.discard(item)
+        enqueued_at = self._enqueued_at.pop(item, None)
+        if self.wait_observer is not None and enqueued_at is not None:
+            self.wait_observer(time.monotonic() - enqueued_at)
+        return item
+
+    def done(self, item):
+        self._processing.discard(item)
+        if item in self._dirty:
+            self._queue.append(item)
+            self._wake_one()
+
+    def shutdown(self):
+        self._shutting_down = True
+        for timer in self._delayed.values():
+            timer.cancel()
+        self._delayed.clear()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class AsyncWorkerPool:
+    """Fixed number of asyncio tasks draining an AsyncRateLimitingQueue through a coroutine handler.
+
+    Concurrency costs one task per slot rather than one thread, so thousands of
+    slow remediations can be in flight at once. Failure handling matches WorkerPool.
+    """
+
+    def __init__(self, queue, handler, concurrency=100, name='remediation-task'):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.name = name
+        self._tasks = []
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.queue.bind(loop)
+        self._tasks = [loop.create_task(self._run(), name=f"{self.name}-{i}") for i in range(self.concurrency)]
+        logging.info(f"⚙️  Started {self.concurrency} {self.name} tasks")
+
+    async def stop(self):
+        self.queue.shutdown()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            try:
+                wait = self.queue.bucket.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                ok = await self.handler(item)
+            except Exception as e:
+                logging.error(f"Worker failed processing {item}: {e}")
+                ok = False
+            try:
+                if ok is False:
+                    self.queue.add_rate_limited(item)
+                else:
+                    self.queue.forget(item)
+            finally:
+                self.queue.done(item)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+from kubernetes import client, config
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+# The job images copy these scripts next to the src modules they import
+for script_dir in ('drift-analyzer', 'emergency-rollback'):
+    sys.path.insert(0, os.path.join(ROOT, 'docker', script_dir))
+
+import kube_client
+from fake_apiserver import FakeApiServer
+
+
+@pytest.fixture
+def cluster(monkeypatch, tmp_path):
+    """Fake apiserver with the kubernetes client configured to talk to it"""
+    server = FakeApiServer(sync_delay=0.05).start()
+    default_configuration = client.Configuration.get_default_copy()
+    config.load_kube_config(config_file=server.write_kubeconfig(str(tmp_path / 'kubeconfig')))
+    monkeypatch.setenv('AUDIT_SINK', 'configmap')
+    monkeypatch.setenv('CHECKPOINT_BACKEND', 'none')
+    monkeypatch.setattr(kube_client, '_config_loaded', True)
+    monkeypatch.setattr(kube_client, '_shared_client', None)
+    yield server
+    server.stop()
+    client.Configuration.set_default(default_configuration)
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import threading
+
+import pytest
+
+from bench_end_to_end import drift, make_application, wait_for
+
+NAMESPACE = 'argocd'
+
+
+@pytest.fixture
+def runtime(cluster):
+    from async_runtime import AsyncControllerRuntime, AsyncKubeClient
+    from auto_remediation_controller import AutoRemediationController, health_response
+
+    controller = AutoRemediationController(workers=4, qps=1e6, burst=10 ** 6)
+    alerts = []
+    record_alert = controller._create_emergency_alert
+
+    def create_emergency_alert(app_name, *args, **kwargs):
+        alerts.append((app_name, threading.current_thread().name))
+        record_alert(app_name, *args, **kwargs)
+    controller._create_emergency_alert = create_emergency_alert
+    controller.alerts = alerts
+
+    async_runtime = AsyncControllerRuntime(controller, AsyncKubeClient(qps=1e6, burst=10 ** 6),
+                                           health_response, concurrency=8, health_port=0)
+    thread = threading.Thread(target=lambda: asyncio.run(async_runtime.run()), name='event-loop', daemon=True)
+    thread.start()
+    yield async_runtime
+    async_runtime.informer.stop()
+    # The informer stops after its current watch ends
+    cluster.disconnect_watchers()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def add_application(server, i, severity, **spec):
+    app = make_application(i, random.Random(i))
+    app['metadata']['labels']['drift-severity'] = severity
+    app['spec'].update(spec)
+    server.put_object('applications', app)
+    return app['metadata']['name']
+
+
+def audit_entries(server):
+    return [line for cm in server.list_objects('configmaps', NAMESPACE)
+            for line in (cm.get('data') or {}).get('entries.jsonl', '').splitlines()]
+
+
+def test_rollback_runs_and_records_alert_off_the_event_loop(cluster, runtime):
+    app_name = add_application(cluster, 1, 'high')
+    assert wait_for(lambda: runtime.informer.has_synced and len(runtime.informer) == 1, timeout=10)
+
+    cluster.update_object('applications', NAMESPACE, app_name, drift)
+
+    assert wait_for(lambda: runtime.controller.alerts, timeout=10)
+    assert runtime.controller.alerts[0][0] == app_name
+    assert runtime.controller.alerts[0][1] != 'event-loop'
+    history = cluster.get_object('applications', NAMESPACE, app_name)['status']['operationState']
+    assert history['operation']['sync']['revision'] == 'rev-0'
+
+    runtime.controller.audit_sink.flush()
+    assert any(app_name in line and 'emergency-rollback' in line for line in audit_entries(cluster))
+
+
+def test_rollback_without_previous_revision_is_recorded_as_failed(cluster, runtime):
+    app_name = add_application(cluster, 4, 'high')
+    cluster.update_object('applications', NAMESPACE, app_name,
+                          lambda app: app['status'].update(history=app['status']['history'][:1]))
+    assert wait_for(lambda: runtime.informer.has_synced and len(runtime.informer) == 1, timeout=10)
+
+    cluster.update_object('applications', NAMESPACE, app_name, drift)
+
+    state = runtime.controller.remediation_state
+    assert wait_for(lambda: state.get(app_name) and state.get(app_name).last_outcome == 'failed', timeout=10)
+    assert state.get(app_name).last_success_time is None
+    assert not runtime.controller.alerts
+
+
+def test_emergency_stop_disables_automated_sync(cluster, runtime):
+    app_name = add_application(cluster, 2, 'critical', syncPolicy={'automated': {'prune': True}})
+    assert wait_for(lambda: runtime.informer.has_synced and len(runtime.informer) == 1, timeout=10)
+
+    cluster.update_object('applications', NAMESPACE, app_name, drift)
+
+    assert wait_for(lambda: 'automated' not in cluster.get_object(
+        'applications', NAMESPACE, app_name)['spec'].get('syncPolicy', {}), timeout=10)
+    assert wait_for(lambda: runtime.controller.alerts, timeout=10)
+    assert runtime.controller.alerts[0][1] != 'event-loop'
+
+
+def test_failed_sync_is_retried_until_it_succeeds(cluster, runtime):
+    app_name = add_application(cluster, 3, 'low')
+    cluster.failing_syncs.add(app_name)
+    assert wait_for(lambda: runtime.informer.has_synced and len(runtime.informer) == 1, timeout=10)
+
+    cluster.update_object('applications', NAMESPACE, app_name, drift)
+
+    state = runtime.controller.remediation_state
+    assert wait_for(lambda: state.get(app_name) and state.get(app_name).attempts >= 2, timeout=10)
+    assert state.get(app_name).last_success_time is None
+    cluster.failing_syncs.clear()
+
+    assert wait_for(lambda: state.get(app_name).last_outcome == 'success', timeout=10)
+    assert cluster.get_object('applications', NAMESPACE, app_name)['status']['sync']['status'] == 'Synced'
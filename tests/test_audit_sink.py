@@ -0,0 +1,128 @@
+import copy
+import threading
+import time
+
+from kubernetes.client.rest import ApiException
+from types import SimpleNamespace
+
+from audit_sink import (ConfigMapSegmentAuditSink, FileSegmentAuditSink, SEGMENT_LABEL,
+                        SEGMENT_STATE_OPEN, SEGMENT_STATE_SEALED, make_audit_entry)
+
+
+class FakeCoreV1:
+    """ConfigMap CRUD with resourceVersion conflicts, enough for the segment sink"""
+
+    def __init__(self):
+        self.objects = {}
+        self.rv = 0
+        self.lock = threading.Lock()
+
+    def _store(self, body):
+        self.rv += 1
+        body = copy.deepcopy(body)
+        body['metadata']['resourceVersion'] = str(self.rv)
+        self.objects[body['metadata']['name']] = body
+
+    def _view(self, body):
+        meta = body['metadata']
+        return SimpleNamespace(
+            metadata=SimpleNamespace(name=meta['name'], labels=dict(meta['labels']),
+                                     annotations=dict(meta['annotations']),
+                                     resource_version=meta['resourceVersion']),
+            data=dict(body['data']))
+
+    def list_namespaced_config_map(self, namespace, label_selector):
+        key, _, value = label_selector.partition('=')
+        with self.lock:
+            items = [self._view(b) for b in self.objects.values()
+                     if key in b['metadata']['labels'] and (not value or b['metadata']['labels'][key] == value)]
+        return SimpleNamespace(items=items)
+
+    def create_namespaced_config_map(self, namespace, body):
+        with self.lock:
+            if body['metadata']['name'] in self.objects:
+                raise ApiException(status=409, reason='AlreadyExists')
+            self._store(body)
+
+    def replace_namespaced_config_map(self, name, namespace, body):
+        with self.lock:
+            current = self.objects.get(name)
+            if current is None:
+                raise ApiException(status=404, reason='NotFound')
+            if body['metadata'].get('resourceVersion') != current['metadata']['resourceVersion']:
+                raise ApiException(status=409, reason='Conflict')
+            self._store(body)
+
+    def delete_namespaced_config_map(self, name, namespace, body=None):
+        with self.lock:
+            current = self.objects.get(name)
+            if current is None:
+                raise ApiException(status=404, reason='NotFound')
+            expected = ((body or {}).get('preconditions') or {}).get('resourceVersion')
+            if expected and expected != current['metadata']['resourceVersion']:
+                raise ApiException(status=409, reason='Conflict')
+            del self.objects[name]
+
+    def states(self):
+        return sorted(b['metadata']['labels'][SEGMENT_LABEL] for b in self.objects.values())
+
+
+def configmap_sink(core_v1, **kwargs):
+    kwargs.setdefault('flush_interval', 0)
+    kwargs.setdefault('maintenance_interval', 0)
+    return ConfigMapSegmentAuditSink(core_v1, namespace='argocd', **kwargs)
+
+
+def test_batch_that_fills_segment_is_written_after_seal():
+    core_v1 = FakeCoreV1()
+    sink = configmap_sink(core_v1, batch_size=1, max_segment_bytes=200, max_conflict_retries=1)
+    for i in range(5):
+        sink.write(make_audit_entry(f'app-{i}', 'drift_detected', 'high'))
+        time.sleep(0.002)
+
+    assert sink.entries_written == 5
+    assert len(sink.query()) == 5
+    assert core_v1.states().count(SEGMENT_STATE_OPEN) == 1
+    assert SEGMENT_STATE_SEALED in core_v1.states()
+
+
+def test_extra_open_segments_are_sealed_on_next_write():
+    core_v1 = FakeCoreV1()
+    writers = [configmap_sink(core_v1, batch_size=1) for _ in range(2)]
+    # Both writers see no open segment and create one each
+    for sink in writers:
+        sink._create_segment('', time.time(), time.time(), 0)
+        time.sleep(0.002)
+    assert core_v1.states() == [SEGMENT_STATE_OPEN, SEGMENT_STATE_OPEN]
+
+    writers[0].write(make_audit_entry('app-1', 'drift_detected', 'high'))
+
+    assert core_v1.states() == [SEGMENT_STATE_OPEN, SEGMENT_STATE_SEALED]
+    assert [e['app'] for e in writers[1].query()] == ['app-1']
+
+
+def test_retention_expires_idle_open_segment():
+    core_v1 = FakeCoreV1()
+    sink = configmap_sink(core_v1, batch_size=1, retention_seconds=60)
+    old = make_audit_entry('app-1', 'drift_detected', 'high')
+    old['ts'] = time.time() - 3600
+    sink.write(old)
+    assert core_v1.states() == [SEGMENT_STATE_OPEN]
+
+    assert sink.enforce_retention() == 1
+    assert core_v1.states() == []
+
+
+def test_file_sink_runs_retention_and_compaction_periodically(tmp_path, monkeypatch):
+    sink = FileSegmentAuditSink(str(tmp_path), batch_size=1, flush_interval=0,
+                                maintenance_interval=0.01)
+    ran = threading.Event()
+    calls = []
+    monkeypatch.setattr(sink, 'enforce_retention', lambda: calls.append('retention'))
+    monkeypatch.setattr(sink, 'compact', lambda: (calls.append('compact'), ran.set()))
+
+    sink.write(make_audit_entry('app-1', 'drift_detected', 'high'))
+    assert ran.wait(2)
+    sink.close()
+
+    assert calls[:2] == ['retention', 'compact']
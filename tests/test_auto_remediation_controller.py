@@ -0,0 +1,135 @@
+import copy
+import random
+
+from bench_end_to_end import drift, make_application
+
+NAMESPACE = 'argocd'
+
+
+def test_restored_checkpoint_enqueues_drifted_applications(cluster, monkeypatch, tmp_path):
+    from auto_remediation_controller import AutoRemediationController
+
+    monkeypatch.setenv('CHECKPOINT_BACKEND', 'file')
+    monkeypatch.setenv('CHECKPOINT_PATH', str(tmp_path / 'checkpoint.json.z'))
+    rng = random.Random(1)
+    apps = [make_application(i, rng) for i in range(4)]
+    for app in apps[:2]:
+        drift(app)
+    for app in apps:
+        cluster.put_object('applications', app)
+
+    previous = AutoRemediationController()
+    previous.informer.relist()
+    previous.checkpointer.store.save(previous.snapshot_state())
+
+    controller = AutoRemediationController()
+    assert controller.restore_checkpoint()
+    assert controller.informer.has_synced and len(controller.informer) == 4
+
+    queued = sorted(controller.queue.get(timeout=1) for _ in range(len(controller.queue)))
+    assert queued == ['app-0', 'app-1']
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.calls = []
+
+    def send_notification(self, app_name, message, severity='medium', channels=None):
+        self.calls.append(('notification', app_name, severity, list(channels)))
+
+    def send_remediation_complete(self, app_name, action, status, duration=None, channels=None):
+        self.calls.append(('remediation_complete', app_name, status, channels))
+
+    def send_critical_alert(self, app_name, message, details=None):
+        self.calls.append(('critical_alert', app_name, message, None))
+
+
+def test_notify_and_timeout_requests_approval_instead_of_reporting_success(cluster):
+    from argocd_operations import AWAITING_APPROVAL
+    from auto_remediation_controller import AutoRemediationController
+
+    notifier = RecordingNotifier()
+    controller = AutoRemediationController(notification_handler=notifier)
+    app = make_application(0, random.Random(0))
+    app['metadata']['labels']['drift-severity'] = 'medium'
+    drift(app)
+
+    assert controller.handle_drift(app) == AWAITING_APPROVAL
+    assert notifier.calls == [('notification', 'app-0', 'medium', ['slack', 'email'])]
+    # Nothing was submitted to ArgoCD
+    assert len(controller.operations) == 0
+
+
+def test_failed_operation_is_recorded_and_requeued(cluster):
+    from auto_remediation_controller import AutoRemediationController
+
+    controller = AutoRemediationController()
+    app = make_application(0, random.Random(0))
+    app['metadata']['labels']['drift-severity'] = 'low'
+    drift(app)
+    cluster.put_object('applications', app)
+
+    pending = controller.handle_drift(app)
+    assert controller.remediation_state.get('app-0').last_outcome == 'pending'
+    assert controller.report_cache.is_remediated(controller.report_cache.get(app)[1])
+
+    controller.record_operation_outcome(pending, 'Failed')
+
+    state = controller.remediation_state.get('app-0')
+    assert (state.last_outcome, state.last_success_time) == ('failed', None)
+    report, fingerprint, cached = controller.report_cache.get(app)
+    assert not cached and not controller.report_cache.is_remediated(fingerprint)
+    assert controller.queue.get(timeout=5) == 'app-0'
+
+
+def test_rollback_without_previous_revision_is_a_failure(cluster):
+    from auto_remediation_controller import AutoRemediationController
+
+    notifier = RecordingNotifier()
+    controller = AutoRemediationController(notification_handler=notifier)
+    app = make_application(0, random.Random(0))
+    app['metadata']['labels']['drift-severity'] = 'high'
+    app['status']['history'] = app['status']['history'][:1]
+    drift(app)
+    cluster.put_object('applications', app)
+
+    assert controller.handle_drift(app) is False
+    state = controller.remediation_state.get('app-0')
+    assert (state.last_outcome, state.last_success_time) == ('failed', None)
+    assert not controller.report_cache.is_remediated(controller.report_cache.get(app)[1])
+    assert [call[2] for call in notifier.calls if call[0] != 'notification'] == ['failed']
+    assert len(controller.operations) == 0
+
+
+def test_unlabelled_applications_are_filtered_by_the_apiserver(cluster):
+    from auto_remediation_controller import AutoRemediationController
+
+    rng = random.Random(5)
+    labelled, unlabelled = make_application(0, rng), make_application(1, rng)
+    del unlabelled['metadata']['labels']['drift-severity']
+    for app in (labelled, unlabelled):
+        cluster.put_object('applications', app)
+
+    controller = AutoRemediationController()
+    controller.informer.relist()
+
+    assert [app['metadata']['name'] for app in controller.informer.list()] == ['app-0']
+
+
+def test_metadata_only_mode_fetches_the_full_application_before_analysis(cluster, monkeypatch):
+    from auto_remediation_controller import AutoRemediationController
+
+    app = make_application(0, random.Random(0))
+    drift(app)
+    cluster.put_object('applications', app)
+    controller = AutoRemediationController(metadata_only=True)
+    analyzed = []
+    monkeypatch.setattr(controller, 'handle_drift', lambda app: analyzed.append(app) or True)
+
+    # A PartialObjectMetadata event carries no status, yet still makes the app a candidate
+    controller.on_application_event('MODIFIED', {'metadata': copy.deepcopy(app['metadata'])})
+    assert controller.process_application(controller.queue.get(timeout=1))
+
+    assert len(analyzed) == 1
+    assert analyzed[0]['status']['sync']['status'] == 'OutOfSync'
+    assert analyzed[0]['status']['resources'] == app['status']['resources']
@@ -0,0 +1,130 @@
+from coordination import FakeCoordinationBackend, ShardedCoordinator
+
+APPS = [f'app-{i}' for i in range(200)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def replica(backend, clock, identity, **kwargs):
+    coordinator = ShardedCoordinator(backend, identity, lease_duration=15, renew_period=5,
+                                     clock=clock, **kwargs)
+    coordinator.changes = 0
+
+    def changed():
+        coordinator.changes += 1
+    coordinator.on_ownership_change = changed
+    return coordinator
+
+
+def owners(replicas, app):
+    return [r.identity for r in replicas if r.owns(app)]
+
+
+def test_settled_replicas_split_every_application_exactly_once():
+    clock = Clock()
+    backend = FakeCoordinationBackend(clock=clock)
+    replicas = [replica(backend, clock, f'r{i}') for i in range(3)]
+    # Staggered joins rebalance the first replicas twice before the ring settles
+    for _ in range(3):
+        for r in replicas:
+            r.tick()
+        clock.now += 5
+
+    assert all(len(owners(replicas, app)) == 1 for app in APPS)
+    assert {owners(replicas, app)[0] for app in APPS} == {'r0', 'r1', 'r2'}
+
+
+def test_joining_replica_waits_for_handoff_grace():
+    clock = Clock()
+    backend = FakeCoordinationBackend(clock=clock)
+    a = replica(backend, clock, 'a')
+    a.tick()
+    clock.now += 5
+    a.tick()
+    assert all(a.owns(app) for app in APPS)
+
+    b = replica(backend, clock, 'b')
+    b.tick()
+    moved = [app for app in APPS if b.ring.owner(app) == 'b']
+    assert moved and b.in_handoff
+    # a has not ticked yet and still acts on the moved apps; b must not
+    assert not any(b.owns(app) for app in moved)
+
+    clock.now += 2
+    a.tick()
+    assert not any(a.owns(app) for app in moved)
+    assert all(len(owners([a, b], app)) <= 1 for app in APPS)
+
+    clock.now += 3
+    changes = b.changes
+    b.tick()
+    assert not b.in_handoff
+    assert b.changes == changes + 1
+    assert all(owners([a, b], app) == ['b'] for app in moved)
+
+
+def test_expired_member_slice_is_taken_over_after_grace():
+    clock = Clock()
+    backend = FakeCoordinationBackend(clock=clock)
+    a, b = replica(backend, clock, 'a'), replica(backend, clock, 'b')
+    for _ in range(2):
+        a.tick()
+        b.tick()
+        clock.now += 5
+    b_apps = [app for app in APPS if b.owns(app)]
+    assert b_apps
+
+    # b stops renewing; its lease lapses after lease_duration
+    clock.now += 16
+    a.tick()
+    assert a.members == ('a',)
+    assert not any(a.owns(app) for app in b_apps)
+
+    clock.now += 5
+    a.tick()
+    assert all(a.owns(app) for app in APPS)
+
+
+def test_replica_that_cannot_renew_owns_nothing(monkeypatch):
+    clock = Clock()
+    backend = FakeCoordinationBackend(clock=clock)
+    a = replica(backend, clock, 'a', handoff_grace=0)
+    a.tick()
+    assert all(a.owns(app) for app in APPS)
+
+    def partitioned(*args, **kwargs):
+        raise ConnectionError('apiserver unreachable')
+    monkeypatch.setattr(backend, 'acquire', partitioned)
+    a.tick()
+    assert not any(a.owns(app) for app in APPS)
+
+
+def test_replica_resyncs_its_shard_after_renewing_again(monkeypatch):
+    clock = Clock()
+    backend = FakeCoordinationBackend(clock=clock)
+    a = replica(backend, clock, 'a', handoff_grace=0)
+    a.tick()
+
+    def partitioned(*args, **kwargs):
+        raise ConnectionError('apiserver unreachable')
+    with monkeypatch.context() as patch:
+        patch.setattr(backend, 'acquire', partitioned)
+        clock.now += 5
+        a.tick()
+    assert not any(a.owns(app) for app in APPS)
+
+    changes = a.changes
+    clock.now += 5
+    a.tick()
+    assert all(a.owns(app) for app in APPS)
+    assert a.changes == changes + 1
+    # Staying healthy does not resync again
+    clock.now += 5
+    a.tick()
+    assert a.changes == changes + 1
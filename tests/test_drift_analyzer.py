@@ -0,0 +1,159 @@
+import copy
+import random
+import time
+
+from bench_end_to_end import drift, make_application
+import drift_analyzer
+from drift_analyzer import DriftAnalyzer, DriftReportCache
+
+
+def comparable(report):
+    report = dict(report, affected_resources=sorted(
+        (resource['kind'], resource['name'], resource['namespace'], resource['status'])
+        for resource in report['affected_resources']))
+    report.pop('timestamp')
+    report.pop('analysis_metadata')
+    return report
+
+
+def test_incremental_report_matches_full_analysis_across_updates():
+    rng = random.Random(7)
+    analyzer = DriftAnalyzer()
+    incremental = DriftAnalyzer()
+    app = make_application(0, rng)
+    del app['metadata']['labels']['drift-severity']
+    app['status']['resources'] += [{'kind': 'Secret', 'name': 'creds', 'namespace': 'team-0', 'status': 'Synced'},
+                                   {'kind': 'Deployment', 'name': 'web', 'namespace': 'team-0', 'status': 'Synced'}]
+    versions = [copy.deepcopy(app)]
+    drift(app)
+    versions.append(copy.deepcopy(app))
+    app['status']['resources'].pop()
+    app['status']['health']['status'] = 'Degraded'
+    versions.append(copy.deepcopy(app))
+    app['status']['resources'] = [resource for resource in app['status']['resources'] if resource['kind'] != 'Secret']
+    versions.append(copy.deepcopy(app))
+    app['status']['resources'] = []
+    versions.append(copy.deepcopy(app))
+
+    for version in versions:
+        assert comparable(incremental.analyze_report_incremental(version)) == \
+            comparable(analyzer.analyze_report(version))
+
+
+def test_report_cache_misses_use_incremental_state():
+    analyzer = DriftAnalyzer()
+    cache = DriftReportCache(analyzer)
+    app = make_application(1, random.Random(1))
+    cache.get(app)
+    assert analyzer.get_incremental_affected_resources('app-1') == []
+    drift(app)
+    report, _, hit = cache.get(app)
+    assert not hit
+    assert analyzer.get_incremental_affected_resources('app-1') == report['affected_resources']
+
+    analyzer.forget_application('app-1')
+    assert analyzer.get_incremental_affected_resources('app-1') == []
+    assert len(analyzer._incremental_states) == 0
+
+
+def test_report_duration_includes_the_analysis(monkeypatch):
+    analyzer = DriftAnalyzer()
+    app = make_application(2, random.Random(2))
+    analyze = analyzer._analyze_drift
+
+    def slow_analysis(app):
+        time.sleep(0.05)
+        return analyze(app)
+    monkeypatch.setattr(analyzer, '_analyze_drift', slow_analysis)
+
+    assert analyzer.generate_drift_report(app)['analysis_metadata']['analysis_duration_ms'] >= 50
+    severity, details = analyzer.analyze_drift(app)
+    report = analyzer.generate_drift_report(app, severity, details)
+    assert report['analysis_metadata']['analysis_duration_ms'] >= 50
+
+
+def fleet(count, seed):
+    rng = random.Random(seed)
+    apps = [make_application(i, rng) for i in range(count)]
+    for app in apps[::3]:
+        drift(app)
+    return apps
+
+
+def test_analyze_many_matches_per_app_reports_in_order():
+    analyzer = DriftAnalyzer()
+    apps = fleet(40, 11)
+
+    reports = list(analyzer.analyze_many(iter(apps), processes=2, chunksize=4))
+
+    assert [report['application'] for report in reports] == [app['metadata']['name'] for app in apps]
+    assert [comparable(report) for report in reports] == \
+        [comparable(analyzer.analyze_report(app)) for app in apps]
+
+
+def test_analyze_many_small_batch_runs_in_process(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('a single chunk must not start a process pool')
+    monkeypatch.setattr(drift_analyzer, 'ProcessPoolExecutor', no_pool)
+    analyzer = DriftAnalyzer()
+    apps = fleet(4, 12)
+
+    reports = list(analyzer.analyze_many(apps, processes=2, chunksize=4))
+
+    assert [comparable(report) for report in reports] == \
+        [comparable(analyzer.analyze_report(app)) for app in apps]
+    assert list(analyzer.analyze_many([], processes=2)) == []
+
+
+def test_report_cache_hits_on_unchanged_content():
+    analyzer = DriftAnalyzer()
+    cache = DriftReportCache(analyzer)
+    app = make_application(3, random.Random(3))
+    drift(app)
+    report, fingerprint, hit = cache.get(app)
+    assert not hit
+
+    # Status churn the analyzer does not read maps to the same entry
+    app['status']['reconciledAt'] = '2030-01-01T00:00:00Z'
+    app['status']['operationState'] = {'phase': 'Running'}
+    cached, cached_fingerprint, hit = cache.get(copy.deepcopy(app))
+
+    assert hit and cached is report and cached_fingerprint == fingerprint
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_report_cache_changed_fingerprint_replaces_the_apps_entry():
+    analyzer = DriftAnalyzer()
+    cache = DriftReportCache(analyzer)
+    app = make_application(4, random.Random(4))
+    _, synced, _ = cache.get(app)
+    cache.mark_remediated(synced)
+
+    drift(app)
+    report, drifted, hit = cache.get(app)
+
+    assert not hit and drifted != synced
+    assert report['affected_resources']
+    assert not cache.is_remediated(drifted) and not cache.is_remediated(synced)
+    assert cache.stats()['entries'] == 1
+    assert cache.remediated_fingerprints() == {}
+    cache.mark_remediated(drifted)
+    assert cache.remediated_fingerprints() == {'app-4': drifted}
+
+
+def test_report_cache_evicts_least_recently_used():
+    analyzer = DriftAnalyzer()
+    cache = DriftReportCache(analyzer, max_entries=2)
+    apps = [make_application(i, random.Random(i)) for i in range(3)]
+    fingerprints = [cache.get(app)[1] for app in apps[:2]]
+    for fingerprint in fingerprints:
+        cache.mark_remediated(fingerprint)
+    assert cache.get(apps[0])[2]
+
+    cache.get(apps[2])
+
+    assert cache.stats()['entries'] == 2
+    assert cache.get(apps[0])[2]
+    assert not cache.is_remediated(fingerprints[1])
+    assert cache.remediated_fingerprints() == {'app-0': fingerprints[0]}
+    assert not cache.get(apps[1])[2]
@@ -0,0 +1,43 @@
+import random
+
+from drift_trends import MINUTES_PER_DAY, DriftTrendStore
+
+
+def expire_per_minute(bits, window_minutes, last_minute, minute):
+    """Reference: clear every expired minute slot one at a time"""
+    for expired in range(last_minute + 1, minute + 1):
+        slot = expired % window_minutes
+        bits[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+
+
+def test_advance_matches_per_minute_expiry():
+    rng = random.Random(7)
+    for window_minutes in (7 * MINUTES_PER_DAY, 60, 13):
+        store = DriftTrendStore(window_minutes=window_minutes, flap_threshold=2)
+        now = 1_000_000 * 60
+        store.record_drift('app', now)
+        series = store._series['app']
+        for _ in range(500):
+            series.bits = bytearray(rng.getrandbits(8) for _ in series.bits)
+            if window_minutes % 8:
+                series.bits[-1] &= (1 << (window_minutes % 8)) - 1
+            series.window_count = sum(bin(b).count('1') for b in series.bits)
+            elapsed = rng.choice([1, 2, 7, 8, 9, rng.randrange(1, window_minutes)])
+            expected = bytearray(series.bits)
+            expire_per_minute(expected, window_minutes, series.last_minute, series.last_minute + elapsed)
+
+            store._advance(series, series.last_minute + elapsed)
+
+            assert series.bits == expected
+            assert series.window_count == sum(bin(b).count('1') for b in expected)
+
+
+def test_drifts_expire_after_window():
+    store = DriftTrendStore()
+    start = 1_700_000_000
+    for day in range(3):
+        store.record_drift('app', start + day * 86400)
+        store.record_resolved('app', start + day * 86400 + 60)
+    assert store.trend('app', start + 3 * 86400)['drifts_in_window'] == 3
+    assert store.trend('app', start + 7 * 86400 + 30)['drifts_in_window'] == 2
+    assert store.trend('app', start + 20 * 86400)['drifts_in_window'] == 0
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+import emergency_rollback
+from emergency_rollback import execute_kubernetes_rollback, index_replicasets_by_owner, plan_deployment_rollback
+
+NAMESPACE = 'shop'
+REVISION = emergency_rollback.REVISION_ANNOTATION
+
+
+def deployment(name, revision):
+    return client.V1Deployment(metadata=client.V1ObjectMeta(
+        name=name, namespace=NAMESPACE, uid=f'uid-{name}', annotations={REVISION: str(revision)}))
+
+
+def replicaset(owner, revision, image, controller=True):
+    return client.V1ReplicaSet(
+        metadata=client.V1ObjectMeta(
+            name=f'{owner}-{revision}', namespace=NAMESPACE, annotations={REVISION: str(revision)},
+            owner_references=[client.V1OwnerReference(api_version='apps/v1', kind='Deployment', name=owner,
+                                                      uid=f'uid-{owner}', controller=controller)]),
+        spec=client.V1ReplicaSetSpec(
+            selector=client.V1LabelSelector(match_labels={'app': owner}),
+            template=client.V1PodTemplateSpec(
+                metadata=client.V1ObjectMeta(labels={'app': owner, 'pod-template-hash': f'h{revision}'}),
+                spec=client.V1PodSpec(containers=[client.V1Container(name=owner, image=image)]))))
+
+
+class FakeAppsV1Api:
+    def __init__(self, deployments, replicasets, failing=()):
+        self.deployments = deployments
+        self.replicasets = replicasets
+        self.failing = set(failing)
+        self.patches = {}
+
+    def list_namespaced_deployment(self, namespace):
+        return client.V1DeploymentList(items=self.deployments)
+
+    def list_namespaced_replica_set(self, namespace):
+        return client.V1ReplicaSetList(items=self.replicasets)
+
+    def patch_namespaced_deployment(self, name, namespace, body, _request_timeout=None):
+        if name in self.failing:
+            raise ApiException(status=422, reason='Unprocessable Entity')
+        self.patches[name] = (body, _request_timeout)
+
+
+def test_replicasets_are_indexed_by_controller_owner_newest_first():
+    replicasets = [replicaset('web', 1, 'web:1'), replicaset('web', 3, 'web:3'), replicaset('web', 2, 'web:2'),
+                   replicaset('api', 1, 'api:1'), replicaset('orphan', 1, 'x', controller=False)]
+
+    index = index_replicasets_by_owner(replicasets)
+
+    assert sorted(index) == ['uid-api', 'uid-web']
+    assert [rs.metadata.name for rs in index['uid-web']] == ['web-3', 'web-2', 'web-1']
+
+
+def test_plan_picks_the_newest_revision_before_the_current_one():
+    owned = index_replicasets_by_owner([replicaset('web', r, f'web:{r}') for r in (1, 2, 3, 4)])['uid-web']
+
+    previous, current = plan_deployment_rollback(deployment('web', 3), owned)
+
+    assert (previous.metadata.name, current) == ('web-2', 3)
+    assert plan_deployment_rollback(deployment('web', 1), owned) == (None, 1)
+
+
+def test_rollback_patches_previous_templates_and_reports_each_deployment(monkeypatch):
+    apps = FakeAppsV1Api(
+        deployments=[deployment('web', 2), deployment('api', 3), deployment('new', 1), deployment('bad', 2)],
+        replicasets=[replicaset('web', 1, 'web:1'), replicaset('web', 2, 'web:2'),
+                     replicaset('api', 2, 'api:2'), replicaset('api', 3, 'api:3'),
+                     replicaset('new', 1, 'new:1'),
+                     replicaset('bad', 1, 'bad:1'), replicaset('bad', 2, 'bad:2')],
+        failing={'bad'})
+    monkeypatch.setattr(emergency_rollback, 'client', SimpleNamespace(AppsV1Api=lambda api_client: apps))
+    monkeypatch.setattr(emergency_rollback, 'get_api_client', client.ApiClient)
+
+    summary = execute_kubernetes_rollback(NAMESPACE, max_parallel=2, timeout_seconds=3)
+
+    assert (summary['total'], summary['rolled_back'], summary['skipped'], summary['failed']) == (4, 2, 1, 1)
+    results = {result['name']: result for result in summary['results']}
+    assert (results['web']['from_revision'], results['web']['to_revision']) == (2, 1)
+    assert (results['new']['status'], results['new']['reason']) == ('skipped', 'no previous revision')
+    assert results['bad']['status'] == 'failed' and 'Unprocessable Entity' in results['bad']['error']
+
+    assert sorted(apps.patches) == ['api', 'web']
+    body, timeout = apps.patches['web']
+    assert timeout == 3
+    assert body[0]['op'] == 'replace' and body[0]['path'] == '/spec/template'
+    template = body[0]['value']
+    assert template['metadata']['labels'] == {'app': 'web'}
+    assert template['spec']['containers'][0]['image'] == 'web:1'
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from bench_fleet_scoring import make_fleet
+from drift_analyzer import DriftAnalyzer
+from fleet_scoring import score_fleet, score_fleet_scalar
+
+pytest.importorskip('numpy')
+
+
+def test_vectorized_scores_match_scalar_path():
+    analyzer = DriftAnalyzer()
+    apps = make_fleet(500, 15, seed=3)
+    # Flapping apps carry a trend adjustment into the risk score
+    now = time.time()
+    for app in apps[:20]:
+        for episode in range(6):
+            started = now - 3600 + episode * 600
+            analyzer.trends.record_drift(app['metadata']['name'], started)
+            analyzer.trends.record_resolved(app['metadata']['name'], started + 60)
+    assert analyzer.trends.risk_adjustment(apps[0]['metadata']['name']) > 0
+    assert any(not app['status']['resources'] for app in apps)
+
+    assert score_fleet(analyzer, apps) == score_fleet_scalar(analyzer, apps)
+
+
+@pytest.mark.parametrize('size', [0, 1])
+def test_vectorized_scores_match_scalar_path_for_tiny_fleets(size):
+    analyzer = DriftAnalyzer()
+    for seed in range(20):
+        apps = make_fleet(size, 15, seed=seed)
+        assert score_fleet(analyzer, apps) == score_fleet_scalar(analyzer, apps)
+
+
+def test_single_app_without_resources():
+    analyzer = DriftAnalyzer()
+    app = make_fleet(1, 0)[0]
+    app['status']['health']['status'] = 'Degraded'
+
+    assert score_fleet(analyzer, [app]) == score_fleet_scalar(analyzer, [app])
@@ -0,0 +1,93 @@
+import json
+
+from informer import ApplicationInformer
+
+
+def application(name, resource_version):
+    return {'metadata': {'name': name, 'resourceVersion': resource_version}}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.data = payload
+        self.released = False
+
+    def stream(self, amt=None, decode_content=True):
+        # Split mid-line so the informer has to reassemble events across chunks
+        yield self.data[:7]
+        yield self.data[7:]
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeCustomObjectsApi:
+    """Scripted LIST responses and WATCH event streams; stops the informer once out of watches"""
+
+    def __init__(self, lists, watches):
+        self.lists = list(lists)
+        self.watches = list(watches)
+        self.calls = []
+        self.informer = None
+
+    def list_namespaced_custom_object(self, watch=False, _preload_content=True, **kwargs):
+        self.calls.append(dict(kwargs, watch=watch))
+        if not watch:
+            resource_version, items = self.lists.pop(0)
+            return FakeResponse(json.dumps({'metadata': {'resourceVersion': resource_version},
+                                            'items': items}).encode())
+        if not self.watches:
+            self.informer.stop()
+            return FakeResponse(b'')
+        return FakeResponse(b''.join(json.dumps(event).encode() + b'\n' for event in self.watches.pop(0)))
+
+    def watch_calls(self):
+        return [call for call in self.calls if call['watch']]
+
+
+def run_informer(api, **kwargs):
+    informer = ApplicationInformer(api, 'argocd', **kwargs)
+    api.informer = informer
+    events = []
+    informer.add_event_handler(lambda event_type, app: events.append((event_type, app['metadata']['name'])))
+    informer.run()
+    return informer, events
+
+
+def test_watch_resumes_from_last_resource_version():
+    api = FakeCustomObjectsApi(
+        lists=[('10', [application('app-a', '9')])],
+        watches=[[{'type': 'MODIFIED', 'object': application('app-a', '11')}],
+                 [{'type': 'BOOKMARK', 'object': application('', '15')},
+                  {'type': 'ADDED', 'object': application('app-b', '16')}]])
+
+    informer, events = run_informer(api)
+
+    assert informer.relist_count == 1
+    assert [call['resource_version'] for call in api.watch_calls()] == ['10', '11', '16']
+    assert events == [('ADDED', 'app-a'), ('MODIFIED', 'app-a'), ('ADDED', 'app-b')]
+    assert informer.get('app-a')['metadata']['resourceVersion'] == '11'
+    assert len(informer) == 2
+
+
+def test_gone_watch_relists_and_replays_the_differences():
+    api = FakeCustomObjectsApi(
+        lists=[('10', [application('app-a', '9'), application('app-b', '8'), application('app-c', '7')]),
+               ('20', [application('app-a', '9'), application('app-b', '18'), application('app-d', '19')])],
+        watches=[[{'type': 'ERROR', 'object': {'code': 410, 'message': 'too old resource version'}}]])
+
+    informer, events = run_informer(api)
+
+    assert informer.relist_count == 2
+    assert [call['resource_version'] for call in api.watch_calls()] == ['10', '20']
+    assert events[3:] == [('MODIFIED', 'app-b'), ('ADDED', 'app-d'), ('DELETED', 'app-c')]
+    assert sorted(app['metadata']['name'] for app in informer.list()) == ['app-a', 'app-b', 'app-d']
+
+
+def test_label_selector_is_sent_with_list_and_watch():
+    api = FakeCustomObjectsApi(lists=[('10', [])], watches=[[]])
+
+    run_informer(api, label_selector='drift-severity')
+
+    assert [call['watch'] for call in api.calls] == [False, True, True]
+    assert all(call['label_selector'] == 'drift-severity' for call in api.calls)
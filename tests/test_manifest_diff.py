@@ -0,0 +1,202 @@
+import base64
+import copy
+
+import pytest
+
+from drift_analyzer import DriftAnalyzer
+from manifest_diff import diff_object, diff_resources, resource_key
+
+from analyze_drift import KIND_CHECKERS
+
+DESIRED_DEPLOYMENT = {
+    'apiVersion': 'apps/v1',
+    'kind': 'Deployment',
+    'metadata': {'name': 'web', 'namespace': 'shop'},
+    'spec': {
+        'selector': {'matchLabels': {'app': 'web'}},
+        'template': {
+            'metadata': {'labels': {'app': 'web'}},
+            'spec': {'containers': [{'name': 'web', 'image': 'nginx:1.25',
+                                     'ports': [{'containerPort': 80}]}]}
+        }
+    }
+}
+
+
+def live_deployment():
+    """DESIRED_DEPLOYMENT as the apiserver returns it after apply"""
+    live = copy.deepcopy(DESIRED_DEPLOYMENT)
+    live['metadata'].update({
+        'uid': 'abc', 'resourceVersion': '42', 'generation': 1,
+        'creationTimestamp': '2024-01-01T00:00:00Z',
+        'labels': {'app.kubernetes.io/instance': 'shop'},
+        'annotations': {'deployment.kubernetes.io/revision': '1'}
+    })
+    live['spec'].update({
+        'replicas': 1, 'revisionHistoryLimit': 10, 'progressDeadlineSeconds': 600,
+        'strategy': {'type': 'RollingUpdate', 'rollingUpdate': {'maxSurge': '25%', 'maxUnavailable': '25%'}}
+    })
+    pod = live['spec']['template']['spec']
+    pod.update({'restartPolicy': 'Always', 'dnsPolicy': 'ClusterFirst', 'terminationGracePeriodSeconds': 30,
+                'schedulerName': 'default-scheduler', 'securityContext': {}, 'enableServiceLinks': True})
+    pod['containers'][0].update({'imagePullPolicy': 'IfNotPresent', 'resources': {},
+                                 'terminationMessagePath': '/dev/termination-log',
+                                 'terminationMessagePolicy': 'File'})
+    pod['containers'][0]['ports'][0]['protocol'] = 'TCP'
+    live['status'] = {'replicas': 1}
+    return live
+
+
+def test_server_defaults_are_not_drift():
+    assert diff_object(DESIRED_DEPLOYMENT, live_deployment()) == []
+
+
+POD_TEMPLATE = {'metadata': {'labels': {'app': 'web'}},
+                'spec': {'containers': [{'name': 'web', 'image': 'busybox:1.36'}]}}
+
+
+def live_pod_template(restart_policy='Always'):
+    template = copy.deepcopy(POD_TEMPLATE)
+    template['metadata']['creationTimestamp'] = None
+    template['spec'].update({'restartPolicy': restart_policy, 'dnsPolicy': 'ClusterFirst',
+                             'terminationGracePeriodSeconds': 30, 'schedulerName': 'default-scheduler',
+                             'securityContext': {}})
+    template['spec']['containers'][0].update({'imagePullPolicy': 'IfNotPresent', 'resources': {},
+                                              'terminationMessagePath': '/dev/termination-log',
+                                              'terminationMessagePolicy': 'File'})
+    return template
+
+
+def applied(kind, api_version, manifest, **fields):
+    """(desired, live) for one manifest; live adds server metadata and the given fields ('__' nests)"""
+    desired = {'apiVersion': api_version, 'kind': kind, 'metadata': {'name': 'web', 'namespace': 'shop'},
+               **manifest}
+    live = copy.deepcopy(desired)
+    live['metadata'].update({'uid': 'abc', 'resourceVersion': '7', 'creationTimestamp': '2024-01-01T00:00:00Z',
+                             'labels': {'app.kubernetes.io/instance': 'shop'}})
+    for path, value in fields.items():
+        node = live
+        *parents, leaf = path.split('__')
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return desired, live
+
+
+CLAIM_TEMPLATE = {'metadata': {'name': 'data'},
+                  'spec': {'accessModes': ['ReadWriteOnce'], 'resources': {'requests': {'storage': '1Gi'}}}}
+JOB_SPEC = {'template': dict(POD_TEMPLATE, spec=dict(POD_TEMPLATE['spec'], restartPolicy='Never'))}
+
+APPLIED = {
+    'Deployment': (DESIRED_DEPLOYMENT, live_deployment()),
+    'Service': applied(
+        'Service', 'v1', {'spec': {'type': 'NodePort', 'selector': {'app': 'web'}, 'ports': [{'port': 80}]}},
+        spec={'type': 'NodePort', 'selector': {'app': 'web'},
+              'ports': [{'port': 80, 'targetPort': 80, 'protocol': 'TCP', 'nodePort': 31234}],
+              'clusterIP': '10.0.0.7', 'clusterIPs': ['10.0.0.7'], 'ipFamilies': ['IPv4'],
+              'ipFamilyPolicy': 'SingleStack', 'sessionAffinity': 'None',
+              'externalTrafficPolicy': 'Cluster', 'internalTrafficPolicy': 'Cluster'}),
+    'Secret': applied('Secret', 'v1', {'data': {'mode': 'ZmFzdA=='}}, type='Opaque'),
+    'ServiceAccount': applied('ServiceAccount', 'v1', {}, secrets=[{'name': 'web-token-x7k2p'}]),
+    'Role': applied('Role', 'rbac.authorization.k8s.io/v1',
+                    {'rules': [{'apiGroups': [''], 'resources': ['pods'], 'verbs': ['get']}]}),
+    'RoleBinding': applied(
+        'RoleBinding', 'rbac.authorization.k8s.io/v1',
+        {'roleRef': {'apiGroup': 'rbac.authorization.k8s.io', 'kind': 'Role', 'name': 'web'},
+         'subjects': [{'kind': 'ServiceAccount', 'name': 'web', 'namespace': 'shop'}]}),
+    'Ingress': applied(
+        'Ingress', 'networking.k8s.io/v1', {'spec': {'rules': [{'host': 'shop.example.com'}]}},
+        spec={'ingressClassName': 'nginx', 'rules': [{'host': 'shop.example.com'}]},
+        status={'loadBalancer': {}}),
+    'StatefulSet': applied(
+        'StatefulSet', 'apps/v1',
+        {'spec': {'serviceName': 'web', 'selector': {'matchLabels': {'app': 'web'}}, 'template': POD_TEMPLATE,
+         'volumeClaimTemplates': [CLAIM_TEMPLATE]}},
+        spec={'serviceName': 'web', 'selector': {'matchLabels': {'app': 'web'}},
+              'template': live_pod_template(), 'replicas': 1, 'revisionHistoryLimit': 10,
+              'podManagementPolicy': 'OrderedReady',
+              'updateStrategy': {'type': 'RollingUpdate', 'rollingUpdate': {'partition': 0}},
+              'persistentVolumeClaimRetentionPolicy': {'whenDeleted': 'Retain', 'whenScaled': 'Retain'},
+              'volumeClaimTemplates': [{
+                  'apiVersion': 'v1', 'kind': 'PersistentVolumeClaim',
+                  'metadata': {'name': 'data', 'creationTimestamp': None},
+                  'spec': dict(CLAIM_TEMPLATE['spec'], volumeMode='Filesystem'),
+                  'status': {'phase': 'Pending'}}]}),
+    'ConfigMap': applied('ConfigMap', 'v1', {'data': {'mode': 'fast'}}),
+    'PersistentVolumeClaim': applied(
+        'PersistentVolumeClaim', 'v1', {'spec': CLAIM_TEMPLATE['spec']},
+        spec=dict(CLAIM_TEMPLATE['spec'], volumeMode='Filesystem', storageClassName='standard',
+                  volumeName='pvc-0f6b'),
+        metadata__annotations={'pv.kubernetes.io/bind-completed': 'yes',
+                               'volume.kubernetes.io/storage-provisioner': 'rancher.io/local-path'},
+        status={'phase': 'Bound'}),
+    'Job': applied(
+        'Job', 'batch/v1', {'spec': JOB_SPEC},
+        spec={'backoffLimit': 6, 'completions': 1, 'parallelism': 1, 'completionMode': 'NonIndexed',
+              'suspend': False, 'selector': {'matchLabels': {'batch.kubernetes.io/controller-uid': 'abc'}},
+              'template': live_pod_template('Never')},
+        metadata__annotations={'batch.kubernetes.io/job-tracking': ''}),
+    'CronJob': applied(
+        'CronJob', 'batch/v1', {'spec': {'schedule': '*/5 * * * *', 'jobTemplate': {'spec': JOB_SPEC}}},
+        spec={'schedule': '*/5 * * * *', 'concurrencyPolicy': 'Allow', 'suspend': False,
+              'successfulJobsHistoryLimit': 3, 'failedJobsHistoryLimit': 1,
+              'jobTemplate': {'metadata': {'creationTimestamp': None},
+                              'spec': {'template': live_pod_template('Never')}}}),
+}
+def test_every_scanned_kind_has_a_no_drift_case():
+    assert set(APPLIED) == set(KIND_CHECKERS)
+
+
+@pytest.mark.parametrize('kind', sorted(APPLIED))
+def test_server_populated_fields_are_not_drift(kind):
+    desired, live = APPLIED[kind]
+    assert diff_object(desired, live) == []
+
+
+def test_assigned_field_is_compared_when_the_manifest_sets_it():
+    desired, live = APPLIED['PersistentVolumeClaim']
+    desired = copy.deepcopy(desired)
+    desired['spec']['storageClassName'] = 'fast'
+
+    assert diff_object(desired, live) == [{'path': 'spec.storageClassName', 'op': 'changed',
+                                           'desired': 'fast', 'live': 'standard'}]
+
+
+def test_live_only_field_is_reported():
+    live = live_deployment()
+    live['spec']['template']['spec']['hostNetwork'] = True
+
+    assert diff_object(DESIRED_DEPLOYMENT, live) == [{
+        'path': 'spec.template.spec.hostNetwork', 'op': 'added', 'desired': None, 'live': True}]
+
+
+def test_secret_string_data_matches_encoded_data():
+    desired = {'apiVersion': 'v1', 'kind': 'Secret', 'metadata': {'name': 'db', 'namespace': 'shop'},
+               'data': {'user': base64.b64encode(b'old').decode()},
+               'stringData': {'user': 'admin', 'password': 's3cret'}}
+    live = {'apiVersion': 'v1', 'kind': 'Secret', 'type': 'Opaque',
+            'metadata': {'name': 'db', 'namespace': 'shop'},
+            'data': {'user': base64.b64encode(b'admin').decode(),
+                     'password': base64.b64encode(b's3cret').decode()}}
+    assert diff_object(desired, live) == []
+
+    live['data']['password'] = base64.b64encode(b'changed').decode()
+    assert diff_object(desired, live) == [{'path': 'data.password', 'op': 'changed'}]
+
+
+def test_field_drift_is_classified_by_kind():
+    live = live_deployment()
+    live['spec']['template']['spec']['hostNetwork'] = True
+    labelled = live_deployment()
+    labelled['metadata']['labels']['team'] = 'payments'
+    labelled['metadata']['name'] = 'api'
+    desired_api = copy.deepcopy(DESIRED_DEPLOYMENT)
+    desired_api['metadata']['name'] = 'api'
+
+    drifts = diff_resources({resource_key(DESIRED_DEPLOYMENT): DESIRED_DEPLOYMENT,
+                             resource_key(desired_api): desired_api},
+                            {resource_key(live): live, resource_key(labelled): labelled})
+    severity, _, affected = DriftAnalyzer().analyze_field_drift(drifts)
+
+    assert severity == 'high'
+    assert {entry['name']: entry['severity'] for entry in affected} == {'web': 'high', 'api': 'low'}
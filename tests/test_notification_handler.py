@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from metrics import NOTIFICATION_SENDS_SAVED
+from notification_handler import DeliveryPipeline, NotificationCoalescer, NotificationHandler
+
+
+class StubWebhook:
+    """Local Slack-style webhook: records requests and the client port of each connection"""
+
+    def __init__(self):
+        self.requests = []
+        self.ports = set()
+        self.status = 200
+        self.delay = 0.0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                stub.ports.add(self.client_address[1])
+                stub.requests.append(json.loads(body))
+                time.sleep(stub.delay)
+                self.send_response(stub.status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hooks/slack'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def webhook():
+    stub = StubWebhook()
+    yield stub
+    stub.close()
+
+
+def make_handler(webhook, **kwargs):
+    handler = NotificationHandler(**kwargs)
+    handler.channels['slack']['webhook_url'] = webhook.url
+    return handler
+
+
+def test_deliveries_reuse_pooled_connections(webhook):
+    handler = make_handler(webhook, workers=2, pool_size=2)
+    futures = [handler.send_notification(f'app-{i}', 'drift', severity='low', channels=['slack'])['slack']
+               for i in range(20)]
+    assert [future.result(timeout=5) for future in futures] == [True] * 20
+    handler.close()
+    assert len(webhook.requests) == 20
+    # Two workers sharing one keep-alive pool open at most two connections
+    assert len(webhook.ports) <= 2
+
+
+def test_futures_report_delivery_outcome(webhook):
+    handler = make_handler(webhook)
+    assert handler.send_remediation_complete('app', 'auto_sync', 'success', channels=['slack'])['slack'] \
+        .result(timeout=5) is True
+    webhook.status = 500
+    assert handler.send_notification('app', 'drift', channels=['slack'])['slack'].result(timeout=5) is False
+    handler.close()
+
+
+def test_remediation_complete_goes_to_every_configured_channel(webhook):
+    handler = make_handler(webhook)
+    futures = handler.send_remediation_complete('app', 'immediate_rollback', 'success',
+                                                channels=['slack', 'email', 'pagerduty'])
+    assert sorted(futures) == ['email', 'pagerduty', 'slack']
+    assert all(future.result(timeout=5) is True for future in futures.values())
+    handler.close()
+
+
+def test_slow_webhook_times_out_without_blocking_the_caller(webhook):
+    webhook.delay = 1.0
+    handler = make_handler(webhook, request_timeout=(0.5, 0.1))
+    started = time.perf_counter()
+    future = handler.send_notification('app', 'drift', channels=['slack'])['slack']
+    assert time.perf_counter() - started < 0.1
+    with pytest.raises(requests.exceptions.Timeout):
+        future.result(timeout=5)
+    handler.close()
+
+
+def test_full_queue_fails_the_future_instead_of_blocking():
+    pipeline = DeliveryPipeline(workers=1, queue_size=1, enqueue_timeout=0.05)
+    release = threading.Event()
+    running = pipeline.submit(release.wait)
+    time.sleep(0.05)  # the worker has taken the first job
+    queued = pipeline.submit(lambda: 'queued')
+    rejected = pipeline.submit(lambda: 'rejected')
+    with pytest.raises(RuntimeError, match='queue full'):
+        rejected.result(timeout=1)
+    assert pipeline.dropped == 1
+    release.set()
+    assert running.result(timeout=1) is True
+    assert queued.result(timeout=1) == 'queued'
+    pipeline.shutdown()
+
+
+def test_digest_is_capped_by_rendered_size():
+    handler = NotificationHandler(async_delivery=False)
+    coalescer = NotificationCoalescer(handler, max_apps_listed=500, max_digest_bytes=2000)
+    items = [handler._notification_data(f'application-with-a-long-name-{i:04d}', 'x' * 5000, 'low')
+             for i in range(300)]
+    for channel in ('slack', 'email'):
+        digest = coalescer._build_digest('low', channel, items)
+        rendered = handler.templates['drift_digest'][channel](digest)
+        assert len(rendered.encode()) <= 2000
+        assert digest['apps']
+        assert len(digest['apps']) + digest['omitted'] == 300
+
+
+def test_async_notifier_folds_notifications_into_one_digest(webhook):
+    from async_runtime import AsyncNotifier
+
+    handler = make_handler(webhook, async_delivery=False, coalesce_window_seconds=0.2)
+    notifier = AsyncNotifier(handler)
+    saved = NOTIFICATION_SENDS_SAVED._default.value
+
+    async def notify():
+        started = time.perf_counter()
+        futures = [await notifier.send_notification(f'app-{i}', 'drift', 'low', channels=['slack'])
+                   for i in range(5)]
+        # Callers are not held for the coalescing window
+        assert time.perf_counter() - started < 0.1
+        results = await asyncio.gather(*(asyncio.wrap_future(f['slack']) for f in futures))
+        await notifier.close()
+        return results
+
+    assert asyncio.run(notify()) == [True] * 5
+    assert len(webhook.requests) == 1
+    assert handler.coalescer.stats()['sends_saved'] == 4
+    assert NOTIFICATION_SENDS_SAVED._default.value == saved + 4
@@ -0,0 +1,59 @@
+import os
+import shutil
+
+from metrics import POLICY_RELOADS
+from remediation_policy import DEFAULT_POLICY_PATH, RemediationPolicyEngine
+
+
+def reloads(result):
+    return POLICY_RELOADS.labels(result).value
+
+
+def replace_file(path, text):
+    """Swap the file in atomically, as a ConfigMap volume update does"""
+    staged = f'{path}.new'
+    with open(staged, 'w') as f:
+        f.write(text)
+    os.replace(staged, path)
+
+
+def edited_policies(path, old, new):
+    with open(path) as f:
+        text = f.read()
+    assert old in text
+    return text.replace(old, new, 1)
+
+
+def test_changed_policy_file_is_reloaded_and_applied(tmp_path):
+    path = str(tmp_path / 'policies.yaml')
+    shutil.copy(DEFAULT_POLICY_PATH, path)
+    engine = RemediationPolicyEngine(path, poll_interval=0)
+    assert engine.resolve('high')['action'] == 'immediate_rollback'
+    assert not engine.reload()
+    succeeded, failed = reloads('success'), reloads('failed')
+
+    replace_file(path, edited_policies(path, 'action: immediate_rollback', 'action: emergency_stop'))
+
+    assert engine.reload()
+    assert engine.resolve('high')['action'] == 'emergency_stop'
+    assert engine.reloads == 1
+    assert (reloads('success'), reloads('failed')) == (succeeded + 1, failed)
+
+
+def test_invalid_policy_file_keeps_the_last_good_policies(tmp_path):
+    path = str(tmp_path / 'policies.yaml')
+    shutil.copy(DEFAULT_POLICY_PATH, path)
+    engine = RemediationPolicyEngine(path, poll_interval=0)
+    version = engine.table.version
+    succeeded, failed = reloads('success'), reloads('failed')
+
+    replace_file(path, edited_policies(path, 'action: immediate_rollback', 'action: reboot_cluster'))
+    assert not engine.reload()
+    # Reported once per change of the file, not on every poll
+    assert not engine.reload()
+    replace_file(path, 'remediation_matrix: [unterminated\n')
+    assert not engine.reload()
+
+    assert engine.table.version == version
+    assert engine.resolve('high')['action'] == 'immediate_rollback'
+    assert (reloads('success'), reloads('failed')) == (succeeded, failed + 2)
@@ -0,0 +1,71 @@
+from remediation_state import RemediationStateTracker
+
+POLICY = {'cooldown_minutes': 5, 'max_retries': 3}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_failed_attempt_does_not_start_cooldown():
+    clock = FakeClock()
+    tracker = RemediationStateTracker(clock=clock)
+    tracker.record('app', 'auto_sync', False)
+    clock.now += 0.5
+    assert tracker.check('app', POLICY) == (True, None, 0)
+
+
+def test_cooldown_runs_from_last_success():
+    clock = FakeClock()
+    tracker = RemediationStateTracker(clock=clock)
+    tracker.record('app', 'auto_sync', True)
+    clock.now += 60
+    allowed, reason, retry_after = tracker.check('app', POLICY)
+    assert (allowed, reason) == (False, 'cooldown')
+    assert retry_after == 240
+    clock.now += 240
+    assert tracker.check('app', POLICY)[0]
+
+
+def test_flapping_app_runs_out_of_retries_until_they_age_out():
+    clock = FakeClock()
+    tracker = RemediationStateTracker(attempt_window_seconds=3600, clock=clock)
+    # drift -> sync -> drift: every attempt succeeds and the app keeps coming back
+    for _ in range(3):
+        assert tracker.check('app', POLICY)[0]
+        tracker.record('app', 'auto_sync', True)
+        clock.now += 301
+    allowed, reason, retry_after = tracker.check('app', POLICY)
+    assert (allowed, reason) == (False, 'max_retries')
+    clock.now += retry_after
+    assert tracker.check('app', POLICY)[0]
+
+
+def test_snapshot_round_trip_keeps_attempt_history():
+    clock = FakeClock()
+    tracker = RemediationStateTracker(clock=clock)
+    tracker.record('app', 'auto_sync', True)
+    tracker.record('app', 'auto_sync', False)
+    restored = RemediationStateTracker(clock=clock)
+    restored.restore(tracker.snapshot())
+    state = restored.get('app')
+    assert state.attempts == 2
+    assert state.last_success_time == clock.now
+    assert state.last_outcome == 'failed'
+
+
+def test_pending_attempt_counts_but_cooldown_waits_for_success():
+    clock = FakeClock()
+    tracker = RemediationStateTracker(clock=clock)
+    tracker.record('app', 'auto_sync', None)
+    assert tracker.get('app').attempts == 1
+    assert tracker.check('app', POLICY)[0]
+
+    clock.now += 30
+    tracker.complete('app', True)
+    assert tracker.get('app').last_outcome == 'success'
+    assert tracker.check('app', POLICY)[:2] == (False, 'cooldown')
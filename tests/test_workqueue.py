@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from workqueue import AsyncRateLimitingQueue, RateLimitingQueue, TokenBucket
+
+
+def test_add_after_keeps_only_the_earliest_entry_per_item():
+    queue = RateLimitingQueue(bucket=TokenBucket(qps=1e6, burst=10 ** 6))
+    for _ in range(100):
+        queue.add_after('app', 0.2)
+    queue.add_after('app', 0.05)
+    queue.add_after('app', 0.3)
+    assert len(queue._delayed) == 2
+
+    started = time.monotonic()
+    assert queue.get(timeout=1) == 'app'
+    assert time.monotonic() - started < 0.15
+    queue.done('app')
+    # The superseded 0.2s entry is stale and does not queue the item again
+    assert queue.get(timeout=0.3) is None
+    assert queue._delayed == [] and queue._ready_at == {}
+
+
+def test_async_add_after_keeps_only_the_earliest_timer_per_item():
+    async def run():
+        queue = AsyncRateLimitingQueue(bucket=TokenBucket(qps=1e6, burst=10 ** 6))
+        queue.bind(asyncio.get_running_loop())
+        for _ in range(100):
+            queue.add_after('app', 0.2)
+        queue.add_after('app', 0.05)
+        queue.add_after('app', 0.3)
+        assert len(queue._delayed) == 1
+
+        assert await asyncio.wait_for(queue.get(), 0.15) == 'app'
+        queue.done('app')
+        await asyncio.sleep(0.3)
+        assert len(queue) == 0
+        queue.shutdown()
+    asyncio.run(run())